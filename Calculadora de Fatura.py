@@ -5,6 +5,9 @@ import json
 import os
 from datetime import datetime
 
+from fatura_relatorio import ResumoTexto
+from fatura_instrumentacao import Medidor
+
 class Pessoa:
     def __init__(self, nome):
         self.nome = nome
@@ -122,6 +125,7 @@ class FaturaAvancadaApp:
         self.result_area.configure(yscrollcommand=result_scrollbar.set)
         
         self.result_area.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.resumo = ResumoTexto(self.result_area)
         result_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         
         # Resumo dos totais
@@ -162,8 +166,7 @@ class FaturaAvancadaApp:
         
         # Processar despesas
         total_processado = 0.0
-        resultado = f"Despesas de {nome_pessoa}:\n"
-        resultado += "-" * 40 + "\n"
+        partes = [f"Despesas de {nome_pessoa}:", "-" * 40]
         
         for linha in linhas:
             linha = linha.strip()
@@ -185,30 +188,18 @@ class FaturaAvancadaApp:
                 pessoa.adicionar_despesa(descricao, valor_float)
                 total_processado += valor_float
                 
-                resultado += f"{descricao}: R$ {valor_float:.2f}\n"
+                partes.append(f"{descricao}: R$ {valor_float:.2f}")
             else:
-                resultado += f"{linha}: Formato inválido\n"
+                partes.append(f"{linha}: Formato inválido")
                 
         # Exibir resultados
-        resultado += "-" * 40 + "\n"
-        resultado += f"Subtotal para {nome_pessoa}: R$ {total_processado:.2f}\n\n"
-        
-        # Calcular total geral
-        total_geral = sum(p.total() for p in self.pessoas.values())
-        resultado += "Resumo por pessoa:\n"
-        resultado += "-" * 40 + "\n"
-        
-        for nome, p in self.pessoas.items():
-            resultado += f"{nome}: R$ {p.total():.2f}\n"
-            
-        resultado += "-" * 40 + "\n"
-        resultado += f"TOTAL GERAL: R$ {total_geral:.2f}"
+        partes.append("-" * 40)
+        partes.append(f"Subtotal para {nome_pessoa}: R$ {total_processado:.2f}\n\n")
         
-        # Atualizar interface
-        self.result_area.config(state="normal")
-        self.result_area.delete("1.0", tk.END)
-        self.result_area.insert("1.0", resultado)
-        self.result_area.config(state="disabled")
+        # Calcular total geral e atualizar interface (o resumo por pessoa vem depois das despesas)
+        totais = [(nome, p.total()) for nome, p in self.pessoas.items()]
+        total_geral = sum(total for _, total in totais)
+        self.resumo.exibir(totais, total_geral, "\n".join(partes))
         
         self.total_label.config(text=f"Total Geral: R$ {total_geral:.2f}")
         
@@ -231,9 +222,7 @@ class FaturaAvancadaApp:
             self.historico = []
             self.arquivo_atual = None
             self.text_area.delete("1.0", tk.END)
-            self.result_area.config(state="normal")
-            self.result_area.delete("1.0", tk.END)
-            self.result_area.config(state="disabled")
+            self.resumo.limpar()
             self.total_label.config(text="Total: R$ 0,00")
             self.status_var.set("Novo arquivo criado")
             
@@ -260,21 +249,9 @@ class FaturaAvancadaApp:
                 self.arquivo_atual = filename
                 
                 # Atualizar interface
-                total_geral = sum(p.total() for p in self.pessoas.values())
-                resultado = "Arquivo carregado com sucesso!\n\n"
-                resultado += "Resumo por pessoa:\n"
-                resultado += "-" * 40 + "\n"
-                
-                for nome, p in self.pessoas.items():
-                    resultado += f"{nome}: R$ {p.total():.2f}\n"
-                    
-                resultado += "-" * 40 + "\n"
-                resultado += f"TOTAL GERAL: R$ {total_geral:.2f}"
-                
-                self.result_area.config(state="normal")
-                self.result_area.delete("1.0", tk.END)
-                self.result_area.insert("1.0", resultado)
-                self.result_area.config(state="disabled")
+                totais = [(nome, p.total()) for nome, p in self.pessoas.items()]
+                total_geral = sum(total for _, total in totais)
+                self.resumo.exibir(totais, total_geral, "Arquivo carregado com sucesso!\n\n")
                 
                 self.total_label.config(text=f"Total Geral: R$ {total_geral:.2f}")
                 self.status_var.set(f"Arquivo aberto: {os.path.basename(filename)}")
@@ -347,6 +324,10 @@ class FaturaAvancadaApp:
                 messagebox.showerror("Erro", f"Erro ao exportar resultados: {str(e)}")
 
 if __name__ == "__main__":
+    # FATURA_MEDIR=1 / FATURA_PERFIL=<método>: mede a latência dos handlers (ver fatura_instrumentacao)
+    medidor = Medidor.do_ambiente()
+    if medidor is not None:
+        medidor.instrumentar(FaturaAvancadaApp)
     root = tk.Tk()
     app = FaturaAvancadaApp(root)
     root.mainloop()
\ No newline at end of file
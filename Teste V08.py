@@ -1,31 +1,66 @@
+import time
+
+# Referência do tempo até a primeira tela (--medir-inicio), tomada antes dos demais imports
+INICIO = time.perf_counter()
+
 import tkinter as tk
-from tkinter import ttk, filedialog, messagebox, simpledialog
-import re
-import json
+from tkinter import ttk
+import importlib
 import os
-from datetime import datetime
+import queue
+import sys
+import threading
+from bisect import bisect_left, insort
+
+from fatura_engine import (Pessoas, OperacaoCancelada, AnaliseIncremental, analisar_linhas, extrair_centavos,
+                           total_geral, copiar_pessoas, carregar_arquivo, marca_do_diario, salvar_arquivo)
+from fatura_diario import Diario, aplicar_operacao, reaplicar_diario
+from fatura_relatorio import ResumoTexto
+from fatura_instrumentacao import Medidor
 
 
-class Pessoa:
+class ModuloSobDemanda:
+    # Módulo importado só no primeiro uso de um atributo: diálogos, SQLite, importação, busca e
+    # exportação não são necessários para abrir a janela
     def __init__(self, nome):
         self.nome = nome
-        # Cada despesa é armazenada como: {"raw_line": <texto digitado>, "valor": <valor numérico>}
-        self.despesas = []
-        self.pago = 0.0
-
-    def adicionar_despesa(self, raw_line, valor):
-        self.despesas.append({"raw_line": raw_line, "valor": valor})
-
-    def total(self):
-        return sum(item["valor"] for item in self.despesas)
-
-    def to_dict(self):
-        return {
-            "nome": self.nome,
-            "despesas": [{"raw_line": d["raw_line"], "valor": d["valor"]} for d in self.despesas],
-            "total": self.total(),
-            "pago": self.pago
-        }
+        self.modulo = None
+
+    def __getattr__(self, atributo):
+        if self.modulo is None:
+            self.modulo = importlib.import_module(self.nome)
+        return getattr(self.modulo, atributo)
+
+
+filedialog = ModuloSobDemanda("tkinter.filedialog")
+messagebox = ModuloSobDemanda("tkinter.messagebox")
+simpledialog = ModuloSobDemanda("tkinter.simpledialog")
+fatura_sqlite = ModuloSobDemanda("fatura_sqlite")
+importadores = ModuloSobDemanda("fatura_importadores")
+busca = ModuloSobDemanda("fatura_busca")
+exportacao = ModuloSobDemanda("fatura_exportacao")
+
+
+# Intervalo do salvamento automático (sincroniza o diário em disco) e quantas operações
+# no diário disparam a gravação de um novo instantâneo do arquivo
+INTERVALO_AUTOSAVE_MS = 5000
+OPERACOES_PARA_COMPACTAR = 500
+# Faturas com mais linhas que isso são processadas em fatias de tempo, sem travar a janela
+LINHAS_PROCESSAMENTO_SINCRONO = 5000
+LINHAS_POR_BLOCO = 1000
+ORCAMENTO_FATIA_S = 0.02
+# Intervalo entre as varreduras da caixa de entrada
+INTERVALO_CAIXA_ENTRADA_MS = 10000
+# Espera após a última tecla antes de filtrar o histórico
+ESPERA_FILTRO_MS = 150
+
+
+def formatar_bytes(quantidade):
+    for unidade in ("B", "KB", "MB"):
+        if quantidade < 1024:
+            return f"{quantidade:.0f} {unidade}" if unidade == "B" else f"{quantidade:.1f} {unidade}"
+        quantidade /= 1024
+    return f"{quantidade:.1f} GB"
 
 
 class FaturaAvancadaApp:
@@ -60,11 +95,54 @@ class FaturaAvancadaApp:
         self.aplicar_tema(self.tema_claro)
 
         # Dados – self.pessoas guarda os objetos; self.historico_order guarda a ordem de exibição na aba Histório
-        self.pessoas = {}
+        self.pessoas = Pessoas()
         self.historico_order = []  # Lista com nomes (strings) na ordem desejada na aba Histórico
         self.arquivo_atual = None
+        # Banco SQLite aberto (None quando o arquivo atual é JSON)
+        self.armazenamento = None
+        # Diário de operações do arquivo atual (None enquanto o arquivo não foi salvo/aberto)
+        self.diario = None
+
+        # Atualização das abas: as alterações só marcam as visões como "sujas" e um único
+        # passe em after_idle redesenha cada visão suja uma vez
+        self.visoes_sujas = set()
+        self.renderizacao_agendada = None
+        # Valores exibidos em cada Treeview (iid -> values), para aplicar só as diferenças
+        self.linhas_exibidas = {}
+        # Ordenação por clique no cabeçalho: str(tree) -> (coluna, decrescente), e a última ordem
+        # calculada: str(tree) -> (coluna, [(chave, iid)] em ordem, {iid: chave})
+        self.ordenacao = {}
+        self.ordens_em_cache = {}
+        self.titulos_colunas = {}
+        # Abertura/salvamento em segundo plano: as threads devolvem os resultados por esta fila,
+        # que é lida na thread do Tk via root.after
+        self.fila_tarefas = queue.Queue()
+        self.tarefas_ativas = 0
+        # Abrindo arquivo ou processando uma fatura grande: as ações de edição ficam bloqueadas
+        self.ocupado = False
+        # Estado do processamento em fatias de uma fatura grande (None quando não há)
+        self.processamento = None
+        self.salvando = False
+        # Fechamento pedido durante um salvamento (veja ao_fechar)
+        self.fechar_apos_salvar = False
+        self.cancelar_carga_evento = None
+        # Pasta observada (CaixaDeEntrada) e a próxima varredura agendada
+        self.caixa_entrada = None
+        self.caixa_entrada_agendada = None
+        # Índice da aba Busca: criado na primeira busca (indexado em fatias) e depois mantido
+        # a cada operação; consulta_pendente é a busca feita enquanto a indexação não terminou
+        self.indice_busca = None
+        self.indexacao_agendada = None
+        self.consulta_pendente = None
+        # Filtro do histórico: nome -> nome sem acentos/maiúsculas, o último filtro aplicado
+        # (texto normalizado, nomes encontrados) e o filtro agendado enquanto o usuário digita
+        self.nomes_normalizados = {}
+        self.filtro_anterior = None
+        self.filtro_agendado = None
 
         self.criar_interface()
+        self.root.protocol("WM_DELETE_WINDOW", self.ao_fechar)
+        self.root.after(INTERVALO_AUTOSAVE_MS, self.autosalvar)
 
     def aplicar_tema(self, tema):
         self.bg_color = tema["bg_color"]
@@ -107,6 +185,14 @@ class FaturaAvancadaApp:
         ttk.Button(toolbar_frame, text="Novo", command=self.novo_arquivo, style="Secondary.TButton").pack(side=tk.LEFT, padx=2)
         ttk.Button(toolbar_frame, text="Abrir", command=self.abrir_arquivo, style="Secondary.TButton").pack(side=tk.LEFT, padx=2)
         ttk.Button(toolbar_frame, text="Salvar", command=self.salvar_arquivo, style="Secondary.TButton").pack(side=tk.LEFT, padx=2)
+        ttk.Button(toolbar_frame, text="Importar Extrato", command=self.importar_extrato, style="Secondary.TButton").pack(side=tk.LEFT, padx=2)
+        ttk.Button(toolbar_frame, text="Importar Pasta", command=self.importar_pasta, style="Secondary.TButton").pack(side=tk.LEFT, padx=2)
+        self.caixa_entrada_button = ttk.Button(toolbar_frame, text="Observar Pasta", command=self.alternar_caixa_entrada,
+                                               style="Secondary.TButton")
+        self.caixa_entrada_button.pack(side=tk.LEFT, padx=2)
+        self.cancelar_button = ttk.Button(toolbar_frame, text="Cancelar", command=self.cancelar_operacao,
+                                          style="Secondary.TButton", state="disabled")
+        self.cancelar_button.pack(side=tk.LEFT, padx=2)
 
         # Botões de tema
         tema_frame = ttk.Frame(toolbar_frame)
@@ -127,15 +213,17 @@ class FaturaAvancadaApp:
         main_tab = ttk.Frame(self.notebook)
         self.notebook.add(main_tab, text="Faturas")
 
-        # Aba Histórico (apenas pessoa e total)
-        history_tab = ttk.Frame(self.notebook)
-        self.notebook.add(history_tab, text="Histórico")
-        self.criar_aba_historico(history_tab)
-
-        # Aba Pagamentos (permanece inalterada)
-        pagamento_tab = ttk.Frame(self.notebook)
-        self.notebook.add(pagamento_tab, text="Pagamentos")
-        self.criar_aba_pagamentos(pagamento_tab)
+        # As demais abas só ganham conteúdo na primeira vez que são selecionadas (construir_aba):
+        # Histórico (apenas pessoa e total), Pagamentos e Busca (texto completo nas despesas)
+        self.abas = {}
+        self.abas_construidas = set()
+        for aba, titulo, construtor in (("historico", "Histórico", self.criar_aba_historico),
+                                        ("pagamentos", "Pagamentos", self.criar_aba_pagamentos),
+                                        ("busca", "Busca", self.criar_aba_busca)):
+            frame = ttk.Frame(self.notebook)
+            self.notebook.add(frame, text=titulo)
+            self.abas[aba] = (frame, construtor)
+        self.notebook.bind("<<NotebookTabChanged>>", self.on_aba_selecionada)
 
         # Área de entrada na aba Faturas – coluna esquerda
         left_frame = ttk.Frame(main_tab, padding="5")
@@ -156,12 +244,18 @@ class FaturaAvancadaApp:
         self.pessoa_entry = ttk.Entry(pessoa_frame, width=20)
         self.pessoa_entry.pack(side=tk.LEFT, padx=5)
         self.pessoa_entry.insert(0, "Geral")
+        # Subtotal do texto digitado, atualizado enquanto o usuário edita
+        self.subtotal_label = ttk.Label(pessoa_frame, text="Subtotal: R$ 0.00")
+        self.subtotal_label.pack(side=tk.LEFT, padx=5)
+        self.instalar_analise_incremental()
 
         button_frame = ttk.Frame(left_frame)
         button_frame.pack(fill=tk.X, pady=10)
         ttk.Button(button_frame, text="Processar Fatura",
                    command=self.processar_faturas, style="Primary.TButton").pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="Limpar", command=self.limpar_texto, style="Secondary.TButton").pack(side=tk.LEFT, padx=5)
+        # Progresso do processamento de faturas grandes (só aparece durante o processamento)
+        self.progresso_bar = ttk.Progressbar(button_frame, mode="determinate", length=200)
 
         # Área de resultados na aba Faturas – coluna direita
         right_frame = ttk.Frame(main_tab, padding="5")
@@ -174,12 +268,14 @@ class FaturaAvancadaApp:
         result_scrollbar = ttk.Scrollbar(result_frame, orient="vertical", command=self.result_area.yview)
         self.result_area.configure(yscrollcommand=result_scrollbar.set)
         self.result_area.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.resumo = ResumoTexto(self.result_area)
         result_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         self.total_label = ttk.Label(right_frame, text="Total: R$ 0,00", style="Result.TLabel")
         self.total_label.pack(anchor=tk.W, pady=10)
         result_button_frame = ttk.Frame(right_frame)
         result_button_frame.pack(fill=tk.X, pady=5)
         ttk.Button(result_button_frame, text="Exportar Resultados", command=self.exportar_resultados).pack(side=tk.LEFT, padx=5)
+        ttk.Button(result_button_frame, text="Exportar por Pessoa", command=self.exportar_por_pessoa).pack(side=tk.LEFT, padx=5)
 
         self.status_var = tk.StringVar()
         self.status_var.set("Pronto")
@@ -192,17 +288,19 @@ class FaturaAvancadaApp:
         filter_frame.pack(fill=tk.X, pady=5)
         ttk.Label(filter_frame, text="Filtrar por pessoa:").pack(side=tk.LEFT, padx=(0, 5))
         self.filtro_pessoa_var = tk.StringVar()
-        self.filtro_pessoa_combobox = ttk.Combobox(filter_frame, textvariable=self.filtro_pessoa_var, state="readonly", width=20)
+        self.filtro_pessoa_combobox = ttk.Combobox(filter_frame, textvariable=self.filtro_pessoa_var, width=20)
         self.filtro_pessoa_combobox.pack(side=tk.LEFT, padx=5)
-        ttk.Button(filter_frame, text="Aplicar Filtro", command=self.filtrar_historico).pack(side=tk.LEFT, padx=5)
+        # Filtra enquanto digita (com espera) e na hora ao escolher um nome ou apertar Enter
+        self.filtro_pessoa_var.trace_add("write", lambda *args: self.agendar_filtro())
+        self.filtro_pessoa_combobox.bind("<<ComboboxSelected>>", lambda event: self.filtrar_historico())
+        self.filtro_pessoa_combobox.bind("<Return>", lambda event: self.filtrar_historico())
         ttk.Button(filter_frame, text="Limpar Filtro", command=self.limpar_filtro).pack(side=tk.LEFT, padx=5)
 
         table_frame = ttk.Frame(parent_frame)
         table_frame.pack(fill=tk.BOTH, expand=True, pady=5)
         columns = ("pessoa", "total")
         self.history_tree = ttk.Treeview(table_frame, columns=columns, show="headings", selectmode="browse")
-        self.history_tree.heading("pessoa", text="Pessoa")
-        self.history_tree.heading("total", text="Total")
+        self.configurar_ordenacao(self.history_tree, "historico", {"pessoa": "Pessoa", "total": "Total"})
         self.history_tree.column("pessoa", width=150)
         self.history_tree.column("total", width=100, anchor=tk.E)
         scrollbar = ttk.Scrollbar(table_frame, orient="vertical", command=self.history_tree.yview)
@@ -230,6 +328,7 @@ class FaturaAvancadaApp:
         item = self.history_tree.identify_row(event.y)
         if item:
             self.dragging_item = item
+            self.arrastou = False
 
     def on_history_motion(self, event):
         if not hasattr(self, "dragging_item"):
@@ -239,46 +338,276 @@ class FaturaAvancadaApp:
         if target_item and target_item != self.dragging_item:
             target_index = self.history_tree.index(target_item)
             self.history_tree.move(self.dragging_item, "", target_index)
+            self.arrastou = True
 
     def on_history_button_release(self, event):
         # Ao soltar o botão, atualiza a ordem baseada nos iids dos itens
+        if not getattr(self, "arrastou", False):
+            # Foi só um clique: não há ordem nova para registrar
+            self.dragging_item = None
+            return
+        self.arrastou = False
         new_order = list(self.history_tree.get_children())
-        self.historico_order = new_order
+        if self.filtro_anterior is not None:
+            # Com filtro, só os nomes visíveis foram reordenados: eles ocupam as mesmas posições
+            # na ordem completa e os ocultos ficam onde estavam
+            visiveis = set(new_order)
+            reordenados = iter(new_order)
+            new_order = [next(reordenados) if nome in visiveis else nome for nome in self.historico_order]
+        # Arrastar numa lista ordenada por coluna grava a ordem exibida como a nova ordem manual
+        self.ordenacao.pop(str(self.history_tree), None)
+        self.atualizar_cabecalhos(self.history_tree)
+        self.executar_operacao({"op": "ordem", "ordem": new_order})
         self.dragging_item = None
         self.status_var.set("Ordem do histórico atualizada.")
 
     def criar_aba_pagamentos(self, parent_frame):
         columns = ("pessoa", "fatura", "pago", "falta")
         self.pagamento_tree = ttk.Treeview(parent_frame, columns=columns, show="headings", selectmode="browse")
-        self.pagamento_tree.heading("pessoa", text="Pessoa")
-        self.pagamento_tree.heading("fatura", text="Fatura")
-        self.pagamento_tree.heading("pago", text="Pago")
-        self.pagamento_tree.heading("falta", text="Falta")
+        self.configurar_ordenacao(self.pagamento_tree, "pagamentos",
+                                  {"pessoa": "Pessoa", "fatura": "Fatura", "pago": "Pago", "falta": "Falta"})
         self.pagamento_tree.column("pessoa", width=150)
         self.pagamento_tree.column("fatura", width=100, anchor=tk.E)
         self.pagamento_tree.column("pago", width=100, anchor=tk.E)
         self.pagamento_tree.column("falta", width=100, anchor=tk.E)
         self.pagamento_tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
         self.pagamento_tree.bind("<Double-1>", self.editar_pagamento)
-        self.atualizar_pagamentos()
+
+    def criar_aba_busca(self, parent_frame):
+        busca_frame = ttk.Frame(parent_frame)
+        busca_frame.pack(fill=tk.X, pady=5)
+        ttk.Label(busca_frame, text="Buscar nas despesas:").pack(side=tk.LEFT, padx=(0, 5))
+        self.busca_var = tk.StringVar()
+        busca_entry = ttk.Entry(busca_frame, textvariable=self.busca_var, width=40)
+        busca_entry.pack(side=tk.LEFT, padx=5)
+        busca_entry.bind("<Return>", lambda event: self.buscar_despesas())
+        ttk.Button(busca_frame, text="Buscar", command=self.buscar_despesas).pack(side=tk.LEFT, padx=5)
+        ttk.Label(busca_frame, text="Ex.: netflix, uber >20, mercado 100..500").pack(side=tk.LEFT, padx=5)
+        self.busca_resumo_label = ttk.Label(parent_frame, text="")
+        self.busca_resumo_label.pack(anchor=tk.W, pady=5)
+
+        resultados_frame = ttk.Frame(parent_frame)
+        resultados_frame.pack(fill=tk.BOTH, expand=True, pady=5)
+        self.busca_tree = ttk.Treeview(resultados_frame, columns=("pessoa", "linha", "valor"), show="headings")
+        self.busca_tree.heading("pessoa", text="Pessoa")
+        self.busca_tree.heading("linha", text="Linha")
+        self.busca_tree.heading("valor", text="Valor")
+        self.busca_tree.column("pessoa", width=120)
+        self.busca_tree.column("linha", width=400)
+        self.busca_tree.column("valor", width=100, anchor=tk.E)
+        scrollbar = ttk.Scrollbar(resultados_frame, orient="vertical", command=self.busca_tree.yview)
+        self.busca_tree.configure(yscrollcommand=scrollbar.set)
+        self.busca_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.pack(side=tk.LEFT, fill=tk.Y)
+        # Total por pessoa (facetas) da busca atual
+        self.busca_pessoas_tree = ttk.Treeview(resultados_frame, columns=("pessoa", "itens", "total"), show="headings")
+        self.busca_pessoas_tree.heading("pessoa", text="Pessoa")
+        self.busca_pessoas_tree.heading("itens", text="Itens")
+        self.busca_pessoas_tree.heading("total", text="Total")
+        self.busca_pessoas_tree.column("pessoa", width=120)
+        self.busca_pessoas_tree.column("itens", width=60, anchor=tk.E)
+        self.busca_pessoas_tree.column("total", width=100, anchor=tk.E)
+        self.busca_pessoas_tree.pack(side=tk.LEFT, fill=tk.Y, padx=(10, 0))
+
+    def buscar_despesas(self):
+        consulta = self.busca_var.get().strip()
+        if not consulta:
+            return
+        if self.indice_busca is None:
+            # Primeira busca: indexa todas as linhas em fatias e busca quando terminar
+            self.indice_busca = busca.IndiceBusca()
+            self.indice_busca.sincronizar(self.pessoas)
+            self.consulta_pendente = consulta
+            self.indexar_fatia()
+            return
+        if self.indexacao_agendada is not None:
+            self.consulta_pendente = consulta
+            return
+        inicio = time.perf_counter()
+        resultado = self.indice_busca.buscar(consulta)
+        self.exibir_busca(resultado, time.perf_counter() - inicio)
+
+    def indexar_fatia(self):
+        self.indexacao_agendada = None
+        indice = self.indice_busca
+        if indice is None:
+            return
+        limite = time.perf_counter() + ORCAMENTO_FATIA_S
+        pronto = False
+        while not pronto and time.perf_counter() < limite:
+            pronto = indice.indexar(LINHAS_POR_BLOCO)
+        if not pronto:
+            self.status_var.set(f"Indexando despesas para a busca: {indice.linhas_indexadas()} linhas...")
+            self.indexacao_agendada = self.root.after(1, self.indexar_fatia)
+            return
+        self.status_var.set("Índice de busca pronto.")
+        consulta, self.consulta_pendente = self.consulta_pendente, None
+        if consulta:
+            inicio = time.perf_counter()
+            self.exibir_busca(indice.buscar(consulta), time.perf_counter() - inicio)
+
+    def descartar_indice_busca(self):
+        # Outro arquivo foi aberto/criado: o índice é refeito na próxima busca
+        if self.indexacao_agendada is not None:
+            self.root.after_cancel(self.indexacao_agendada)
+            self.indexacao_agendada = None
+        self.indice_busca = None
+        self.consulta_pendente = None
+
+    def exibir_busca(self, resultado, duracao):
+        self.sincronizar_tree(self.busca_tree, [
+            (str(numero), (pessoa.nome, linha, f"R$ {centavos / 100:.2f}"))
+            for numero, (pessoa, _, linha, centavos) in enumerate(resultado.linhas)])
+        self.sincronizar_tree(self.busca_pessoas_tree, [
+            (nome, (nome, quantidade, f"R$ {centavos / 100:.2f}"))
+            for nome, (quantidade, centavos) in resultado.por_pessoa.items()])
+        exibidas = f" (exibindo {len(resultado.linhas)})" if len(resultado.linhas) < resultado.quantidade else ""
+        self.busca_resumo_label.config(
+            text=f"{resultado.quantidade} linha(s){exibidas}, {len(resultado.por_pessoa)} pessoa(s), "
+                 f"total R$ {resultado.centavos / 100:.2f} - {duracao * 1000:.1f} ms")
+
+    def executar_operacao(self, operacao):
+        # Toda alteração dos dados passa por aqui: aplica, registra no diário e agenda o redesenho
+        aplicar_operacao(self.pessoas, self.historico_order, operacao)
+        if self.diario is not None:
+            self.diario.registrar(operacao)
+        if self.indice_busca is not None:
+            # Só as pessoas tocadas pela operação são reindexadas (na próxima busca)
+            nomes = [operacao[chave] for chave in ("pessoa", "novo_nome") if chave in operacao]
+            nomes.extend(operacao.get("pessoas", ()))
+            self.indice_busca.sincronizar(self.pessoas, nomes)
+        self.agendar_atualizacao()
+
+    def agendar_atualizacao(self, *visoes):
+        # Marca as visões ("historico", "resultados", "pagamentos") para redesenho; sem argumentos marca todas
+        self.visoes_sujas.update(visoes or ("historico", "resultados", "pagamentos"))
+        if self.renderizacao_agendada is None:
+            self.renderizacao_agendada = self.root.after_idle(self.renderizar_visoes)
+
+    def renderizar_visoes(self):
+        # Abas ainda não construídas são desenhadas quando forem abertas (construir_aba)
+        self.renderizacao_agendada = None
+        sujas, self.visoes_sujas = self.visoes_sujas, set()
+        if "historico" in sujas and "historico" in self.abas_construidas:
+            self.atualizar_historico()
+        if "resultados" in sujas:
+            self.atualizar_resultados()
+        if "pagamentos" in sujas and "pagamentos" in self.abas_construidas:
+            self.atualizar_pagamentos()
+
+    def on_aba_selecionada(self, event):
+        selecionada = self.notebook.select()
+        for aba, (frame, _) in self.abas.items():
+            if str(frame) == selecionada:
+                self.construir_aba(aba)
+
+    def construir_aba(self, aba):
+        if aba in self.abas_construidas:
+            return
+        frame, construtor = self.abas[aba]
+        self.abas_construidas.add(aba)
+        construtor(frame)
+        if aba in ("historico", "pagamentos"):
+            self.agendar_atualizacao(aba)
+
+    def sincronizar_tree(self, tree, linhas):
+        # Deixa a Treeview igual a `linhas` ([(iid, values), ...]) aplicando só as inserções,
+        # alterações, remoções e movimentações necessárias, em vez de recriar todas as linhas
+        exibidas = self.linhas_exibidas.setdefault(str(tree), {})
+        desejadas = dict(linhas)
+        removidas = [iid for iid in exibidas if iid not in desejadas]
+        if removidas:
+            tree.delete(*removidas)
+            for iid in removidas:
+                del exibidas[iid]
+        for iid, valores in linhas:
+            if iid not in exibidas:
+                tree.insert("", tk.END, iid=iid, values=valores)
+            elif exibidas[iid] != valores:
+                tree.item(iid, values=valores)
+            exibidas[iid] = valores
+        # Reordena tudo numa única chamada (uma nova ordenação move quase todas as linhas)
+        ordem = tuple(iid for iid, _ in linhas)
+        if tree.get_children() != ordem:
+            tree.set_children("", *ordem)
+
+    def configurar_ordenacao(self, tree, visao, titulos):
+        # Cabeçalhos clicáveis: crescente, decrescente e de volta à ordem normal
+        self.titulos_colunas[str(tree)] = titulos
+        for coluna, titulo in titulos.items():
+            tree.heading(coluna, text=titulo, command=lambda c=coluna: self.ordenar_por(tree, visao, c))
+
+    def ordenar_por(self, tree, visao, coluna):
+        atual = self.ordenacao.get(str(tree))
+        if atual is None or atual[0] != coluna:
+            self.ordenacao[str(tree)] = (coluna, False)
+        elif not atual[1]:
+            self.ordenacao[str(tree)] = (coluna, True)
+        else:
+            del self.ordenacao[str(tree)]
+        self.atualizar_cabecalhos(tree)
+        self.agendar_atualizacao(visao)
+
+    def atualizar_cabecalhos(self, tree):
+        coluna_ordenada, decrescente = self.ordenacao.get(str(tree), (None, False))
+        for coluna, titulo in self.titulos_colunas[str(tree)].items():
+            seta = (" ▼" if decrescente else " ▲") if coluna == coluna_ordenada else ""
+            tree.heading(coluna, text=titulo + seta)
+
+    def ordenar_linhas(self, tree, linhas, chaves):
+        # Aplica a ordenação escolhida em `linhas` ([(iid, values)]) usando `chaves` ({iid: tupla com
+        # uma chave por coluna}: números em centavos, não os textos "R$ ..."). A ordem anterior fica
+        # em cache; se poucas chaves mudaram, só essas linhas são removidas e reinseridas.
+        ordenacao = self.ordenacao.get(str(tree))
+        if ordenacao is None:
+            self.ordens_em_cache.pop(str(tree), None)
+            return linhas
+        coluna, decrescente = ordenacao
+        posicao = tree["columns"].index(coluna)
+        novas = {iid: chaves[iid][posicao] for iid, _ in linhas}
+        cache = self.ordens_em_cache.get(str(tree))
+        ordenada = None
+        if cache is not None and cache[0] == coluna:
+            ordenada, antigas = cache[1], cache[2]
+            mudadas = [iid for iid in antigas if novas.get(iid, antigas) != antigas[iid]]
+            novos = [iid for iid in novas if iid not in antigas]
+            if len(mudadas) + len(novos) <= len(novas) // 8:
+                for iid in mudadas:
+                    del ordenada[bisect_left(ordenada, (antigas[iid], iid))]
+                for iid in mudadas + novos:
+                    if iid in novas:
+                        insort(ordenada, (novas[iid], iid))
+            else:
+                ordenada = None
+        if ordenada is None:
+            ordenada = sorted((chave, iid) for iid, chave in novas.items())
+        self.ordens_em_cache[str(tree)] = (coluna, ordenada, novas)
+        valores = dict(linhas)
+        return [(iid, valores[iid]) for _, iid in (reversed(ordenada) if decrescente else ordenada)]
 
     def atualizar_pagosthis(self):  # Temporary function name not used; see atualizar_pagamentos
         pass
 
     def atualizar_pagamentos(self):
-        for item in self.pagamento_tree.get_children():
-            self.pagamento_tree.delete(item)
+        linhas = []
+        chaves = {}
         for nome, pessoa in self.pessoas.items():
             total_fatura = pessoa.total()
             valor_pago = pessoa.pago
             falta = total_fatura - valor_pago
-            self.pagamento_tree.insert("", tk.END,
-                                       values=(nome,
-                                               f"R$ {total_fatura:.2f}",
-                                               f"R$ {valor_pago:.2f}",
-                                               f"R$ {falta:.2f}"))
+            linhas.append((nome, (nome,
+                                  f"R$ {total_fatura:.2f}",
+                                  f"R$ {valor_pago:.2f}",
+                                  f"R$ {falta:.2f}")))
+            if str(self.pagamento_tree) in self.ordenacao:
+                total_centavos = pessoa.total_centavos()
+                pago_centavos = round(valor_pago * 100)
+                chaves[nome] = (self.chave_nome(nome), total_centavos, pago_centavos, total_centavos - pago_centavos)
+        self.sincronizar_tree(self.pagamento_tree, self.ordenar_linhas(self.pagamento_tree, linhas, chaves))
 
     def editar_pagamento(self, event):
+        if self.edicao_bloqueada():
+            return
         selected_item = self.pagamento_tree.focus()
         if not selected_item:
             return
@@ -293,23 +622,22 @@ class FaturaAvancadaApp:
         def salvar_edicao():
             try:
                 novo_pago = float(entry_pago.get().replace(",", "."))
-                if nome in self.pessoas:
-                    self.pessoas[nome].pago = novo_pago
-                self.atualizar_pagamentos()
+                self.executar_operacao({"op": "pagamento", "pessoa": nome, "pago": novo_pago})
                 edit_win.destroy()
             except ValueError:
                 messagebox.showerror("Erro", "Valor inválido para o pagamento.")
         ttk.Button(edit_win, text="Salvar", command=salvar_edicao).pack(side=tk.LEFT, padx=5, pady=5)
 
     def carregar_contas_fatura(self):
+        if self.edicao_bloqueada():
+            return
         selected_item = self.history_tree.selection()
         if not selected_item:
             messagebox.showinfo("Informação", "Selecione um item no histórico.")
             return
         pessoa_nome = selected_item[0]  # Como usamos o iid como o nome da pessoa
         if pessoa_nome in self.pessoas:
-            linhas = [d["raw_line"] for d in self.pessoas[pessoa_nome].despesas]
-            texto = "\n".join(linhas)
+            texto = "\n".join(self.pessoas[pessoa_nome].linhas)
             self.text_area.delete("1.0", tk.END)
             self.text_area.insert("1.0", texto)
             self.pessoa_entry.delete(0, tk.END)
@@ -320,6 +648,8 @@ class FaturaAvancadaApp:
             messagebox.showerror("Erro", "Pessoa não encontrada.")
 
     def adicionar_pessoa(self):
+        if self.edicao_bloqueada():
+            return
         novo_nome = simpledialog.askstring("Adicionar Pessoa", "Digite o nome da nova pessoa:")
         if not novo_nome or novo_nome.strip() == "":
             messagebox.showerror("Erro", "Nome inválido.")
@@ -328,81 +658,225 @@ class FaturaAvancadaApp:
         if novo_nome in self.pessoas:
             messagebox.showerror("Erro", "Pessoa já existe.")
             return
-        self.pessoas[novo_nome] = Pessoa(novo_nome)
-        # Adiciona o nome ao final da ordem do histórico
-        self.historico_order.append(novo_nome)
-        self.atualizar_historico()
-        self.atualizar_pagamentos()
+        # Adiciona a pessoa ao final da ordem do histórico
+        self.executar_operacao({"op": "adicionar_pessoa", "pessoa": novo_nome})
         self.status_var.set(f"Pessoa '{novo_nome}' adicionada com sucesso.")
 
     def processar_faturas(self):
-        texto = self.text_area.get("1.0", tk.END).strip()
-        linhas = texto.splitlines()
+        if self.edicao_bloqueada():
+            return
         nome_pessoa = self.pessoa_entry.get().strip()
         if not nome_pessoa:
             messagebox.showerror("Erro", "Por favor, insira o nome da pessoa.")
             return
-        if not texto:
+        if not self.text_area.search(r"\S", "1.0", tk.END, regexp=True):
             messagebox.showerror("Erro", "Por favor, insira os itens da fatura.")
             return
-        if nome_pessoa not in self.pessoas:
-            self.pessoas[nome_pessoa] = Pessoa(nome_pessoa)
-            # Se for nova, adiciona na ordem do histórico
-            self.historico_order.append(nome_pessoa)
+        total_linhas = int(self.text_area.index("end-1c").split(".")[0])
+        if self.analise_valida:
+            # As linhas já foram analisadas durante a digitação
+            self.concluir_processamento(nome_pessoa, self.analise.itens(), total_linhas)
+            return
+        if total_linhas > LINHAS_PROCESSAMENTO_SINCRONO:
+            self.iniciar_processamento_em_fatias(nome_pessoa, total_linhas)
+            return
+        linhas = self.text_area.get("1.0", tk.END).strip().splitlines()
+        self.concluir_processamento(nome_pessoa, analisar_linhas(linhas), len(linhas))
+
+    def instalar_analise_incremental(self):
+        # Intercepta insert/delete/replace do Text (renomeando o comando Tcl do widget) para saber
+        # quais linhas mudaram; só essas são analisadas de novo e o subtotal é mantido por linha
+        self.analise = AnaliseIncremental()
+        self.analise_valida = True
+        self.text_area_original = self.text_area._w + "_original"
+        self.root.tk.call("rename", self.text_area._w, self.text_area_original)
+        self.root.tk.createcommand(self.text_area._w, self.interceptar_text_area)
+        self.text_area.tag_configure("linha_invalida", background="#f8d7da")
+        self.text_area.bind("<<Modified>>", self.on_text_modified)
+
+    def linha_do_indice(self, indice):
+        return int(str(self.root.tk.call(self.text_area_original, "index", indice)).split(".")[0])
+
+    def interceptar_text_area(self, *args):
+        original = self.text_area_original
+        chamar = self.root.tk.call
+        if (not args or args[0] not in ("insert", "delete", "replace")
+                or str(chamar(original, "cget", "-state")) != "normal"):
+            return chamar((original,) + args)
+        if args[0] == "delete" and len(args) > 3:
+            # Vários intervalos de uma vez (raro): reanalisa o texto inteiro
+            resultado = chamar((original,) + args)
+            self.reanalisar_linhas(1, len(self.analise.linhas))
+            return resultado
+        total_antes = self.linha_do_indice("end-1c")
+        inicio = min(self.linha_do_indice(args[1]), total_antes)
+        if args[0] == "insert":
+            fim = inicio
         else:
-            # Para atualização, redefine as faturas
-            self.pessoas[nome_pessoa].despesas = []
-        pessoa = self.pessoas[nome_pessoa]
-        total_processado = 0.0
-        for linha in linhas:
-            linha = linha.strip()
-            if not linha:
-                continue
-            match = re.search(r"([\d.]+,\d{2})$", linha)
-            if match:
-                valor_str = match.group(1)
-                try:
-                    valor_float = float(valor_str.replace(".", "").replace(",", "."))
-                except ValueError:
-                    continue
-                total_processado += valor_float
-                pessoa.adicionar_despesa(raw_line=linha, valor=valor_float)
-        self.atualizar_historico()
-        self.atualizar_resultados()
-        self.status_var.set(f"Processado com sucesso: {len(linhas)} itens para {nome_pessoa}")
+            fim = min(self.linha_do_indice(args[2] if len(args) > 2 else f"{args[1]}+1c"), total_antes)
+        resultado = chamar((original,) + args)
+        total_depois = self.linha_do_indice("end-1c")
+        self.reanalisar_linhas(inicio, fim - inicio + 1, fim - inicio + 1 + total_depois - total_antes)
+        return resultado
+
+    def reanalisar_linhas(self, inicio, quantidade_antes, quantidade_depois=None):
+        # Reanalisa as linhas [inicio, inicio + quantidade_depois) (base 1), que substituíram quantidade_antes linhas
+        if quantidade_depois is None:
+            quantidade_depois = self.linha_do_indice("end-1c") - inicio + 1
+            self.analise = AnaliseIncremental()
+            self.analise_valida = True
+        if self.linha_do_indice("end-1c") == 1 and not self.text_area.get("1.0", "1.end").strip():
+            # Texto vazio: recomeça a análise (mesmo depois de uma colagem grande)
+            self.analise = AnaliseIncremental()
+            self.analise_valida = True
+            self.text_area.tag_remove("linha_invalida", "1.0", tk.END)
+            return
+        if not self.analise_valida:
+            return
+        if quantidade_depois > LINHAS_PROCESSAMENTO_SINCRONO:
+            # Colagem muito grande: não analisa a cada tecla; processar_faturas usa o modo em fatias
+            self.analise_valida = False
+            return
+        fim = inicio + quantidade_depois - 1
+        texto = self.text_area.get(f"{inicio}.0", f"{fim}.end")
+        novas = self.analise.substituir(inicio - 1, quantidade_antes, texto.split("\n"))
+        self.text_area.tag_remove("linha_invalida", f"{inicio}.0", f"{fim}.end")
+        for deslocamento, (linha, centavos) in enumerate(novas):
+            if linha and centavos is None:
+                numero = inicio + deslocamento
+                self.text_area.tag_add("linha_invalida", f"{numero}.0", f"{numero}.end")
+
+    def on_text_modified(self, event):
+        if not self.text_area.edit_modified():
+            return
+        self.text_area.edit_modified(False)
+        if self.analise_valida:
+            self.subtotal_label.config(text=f"Subtotal: R$ {self.analise.centavos / 100:.2f}")
+        else:
+            self.subtotal_label.config(text="Subtotal: (texto grande, use Processar Fatura)")
+
+    def concluir_processamento(self, nome_pessoa, itens, quantidade_linhas):
+        # Pessoa nova entra no final da ordem do histórico; pessoa existente tem as faturas redefinidas
+        self.executar_operacao({"op": "processar", "pessoa": nome_pessoa, "linhas": itens})
+        self.status_var.set(f"Processado com sucesso: {quantidade_linhas} itens para {nome_pessoa}")
+
+    def iniciar_processamento_em_fatias(self, nome_pessoa, total_linhas):
+        # Lê e analisa o texto em blocos de linhas, cada fatia limitada a ORCAMENTO_FATIA_S
+        # e agendada com after(), atualizando o progresso e o total parcial entre as fatias
+        self.processamento = {"pessoa": nome_pessoa, "proxima": 1, "total": total_linhas,
+                              "itens": [], "centavos": 0, "cancelado": False}
+        self.bloquear_edicao(True)
+        self.progresso_bar.config(maximum=total_linhas, value=0)
+        self.progresso_bar.pack(side=tk.LEFT, padx=5)
+        self.status_var.set(f"Processando {total_linhas} linhas para {nome_pessoa}...")
+        self.root.after(0, self.processar_fatia)
+
+    def processar_fatia(self):
+        estado = self.processamento
+        if estado["cancelado"]:
+            self.encerrar_processamento_em_fatias()
+            self.status_var.set(f"Processamento cancelado para {estado['pessoa']}.")
+            return
+        limite = time.perf_counter() + ORCAMENTO_FATIA_S
+        while estado["proxima"] <= estado["total"] and time.perf_counter() < limite:
+            fim = estado["proxima"] + LINHAS_POR_BLOCO
+            bloco = self.text_area.get(f"{estado['proxima']}.0", f"{fim}.0").splitlines()
+            itens = analisar_linhas(bloco)
+            estado["itens"].extend(itens)
+            estado["centavos"] += sum(centavos for _, centavos in itens)
+            estado["proxima"] = fim
+        if estado["proxima"] <= estado["total"]:
+            feitas = estado["proxima"] - 1
+            self.progresso_bar.config(value=feitas)
+            self.status_var.set(f"Processando {estado['pessoa']}: {feitas} de {estado['total']} linhas "
+                                f"({feitas * 100 // estado['total']}%) - parcial R$ {estado['centavos'] / 100:.2f}")
+            self.root.after(1, self.processar_fatia)
+            return
+        self.encerrar_processamento_em_fatias()
+        self.concluir_processamento(estado["pessoa"], estado["itens"], estado["total"])
+
+    def encerrar_processamento_em_fatias(self):
+        self.processamento = None
+        self.progresso_bar.pack_forget()
+        self.bloquear_edicao(False)
 
     def limpar_texto(self):
+        if self.edicao_bloqueada():
+            return
         self.text_area.delete("1.0", tk.END)
 
-    def filtrar_historico(self):
-        # Se houver filtro, exibe somente os nomes que contenham o filtro (caso-insensitivo)
-        filtro = self.filtro_pessoa_var.get()
-        self.history_tree.delete(*self.history_tree.get_children())
-        if filtro and filtro != "Todos":
-            ordem = [nome for nome in self.historico_order if filtro.lower() in nome.lower()]
+    def agendar_filtro(self):
+        # Cada tecla reinicia a espera: só o texto final é filtrado
+        if self.filtro_agendado is not None:
+            self.root.after_cancel(self.filtro_agendado)
+        self.filtro_agendado = self.root.after(ESPERA_FILTRO_MS, self.filtrar_historico)
+
+    def filtrar_historico(self, informar=True):
+        # Exibe somente os nomes que contenham o filtro, sem diferenciar maiúsculas e acentos
+        # ("joao" encontra "João")
+        if self.filtro_agendado is not None:
+            self.root.after_cancel(self.filtro_agendado)
+            self.filtro_agendado = None
+        filtro = self.filtro_pessoa_var.get().strip()
+        if not filtro or filtro == "Todos":
+            self.filtro_anterior = None
+            self.exibir_historico(self.historico_order)
+            return
+        normalizar = busca.normalizar
+        chave = normalizar(filtro)
+        if self.filtro_anterior is not None and chave.startswith(self.filtro_anterior[0]):
+            # O texto só cresceu: basta estreitar o resultado anterior
+            candidatos = self.filtro_anterior[1]
         else:
-            ordem = self.historico_order
-        for pessoa in ordem:
-            if pessoa in self.pessoas:
-                total_format = f"R$ {self.pessoas[pessoa].total():.2f}"
-                self.history_tree.insert("", tk.END, iid=pessoa, values=(pessoa, total_format))
-        self.status_var.set(f"Histórico filtrado por: {filtro if filtro else 'Todos'}")
+            candidatos = self.historico_order
+        nomes_normalizados = self.nomes_normalizados
+        ordem = [nome for nome in candidatos if chave in (nomes_normalizados.get(nome) or normalizar(nome))]
+        self.filtro_anterior = (chave, ordem)
+        self.exibir_historico(ordem)
+        if informar:
+            self.status_var.set(f"Histórico filtrado por: {filtro} ({len(ordem)} de {len(self.historico_order)})")
 
     def limpar_filtro(self):
         self.filtro_pessoa_var.set("")
-        self.atualizar_historico()
+        self.filtrar_historico()
+        self.status_var.set("Histórico atualizado")
+
+    def atualizar_indice_nomes(self):
+        # Mantém nomes_normalizados e a lista do combobox iguais aos nomes do histórico,
+        # normalizando só os nomes novos
+        nomes = self.nomes_normalizados
+        if len(nomes) == len(self.historico_order) and all(nome in nomes for nome in self.historico_order):
+            return
+        normalizar = busca.normalizar
+        self.nomes_normalizados = {nome: nomes.get(nome) or normalizar(nome) for nome in self.historico_order}
+        self.filtro_pessoa_combobox["values"] = self.historico_order
+
+    def linhas_historico(self, ordem):
+        # Linhas (iid, values) da aba Histórico; o iid é o nome da pessoa
+        return [(pessoa, (pessoa, f"R$ {self.pessoas[pessoa].total():.2f}"))
+                for pessoa in ordem if pessoa in self.pessoas]
+
+    def exibir_historico(self, ordem):
+        linhas = self.linhas_historico(ordem)
+        chaves = {}
+        if str(self.history_tree) in self.ordenacao:
+            chaves = {nome: (self.chave_nome(nome), self.pessoas[nome].total_centavos()) for nome, _ in linhas}
+        self.sincronizar_tree(self.history_tree, self.ordenar_linhas(self.history_tree, linhas, chaves))
+
+    def chave_nome(self, nome):
+        # Ordem alfabética sem diferenciar maiúsculas e acentos
+        chave = self.nomes_normalizados.get(nome)
+        return chave if chave is not None else busca.normalizar(nome)
 
     def atualizar_historico(self):
-        self.history_tree.delete(*self.history_tree.get_children())
-        for pessoa in self.historico_order:
-            if pessoa in self.pessoas:
-                total_format = f"R$ {self.pessoas[pessoa].total():.2f}"
-                self.history_tree.insert("", tk.END, iid=pessoa, values=(pessoa, total_format))
-        self.status_var.set("Histórico atualizado")
-        self.atualizar_resultados()
-        self.atualizar_pagamentos()
+        self.atualizar_indice_nomes()
+        # Os dados mudaram: o filtro atual (se houver) é refeito sobre a lista completa
+        self.filtro_anterior = None
+        self.filtrar_historico(informar=False)
 
     def ver_detalhes_historico(self):
+        if self.edicao_bloqueada():
+            return
         selected_item = self.history_tree.selection()
         if not selected_item:
             messagebox.showinfo("Informação", "Selecione um item do histórico para ver detalhes.")
@@ -436,9 +910,7 @@ class FaturaAvancadaApp:
                             bg=self.input_bg, fg=self.text_color)
         scrollbar = ttk.Scrollbar(text_frame, orient="vertical", command=text_area.yview)
         text_area.configure(yscrollcommand=scrollbar.set)
-        despesa_text = ""
-        for d in self.pessoas[registro["pessoa"]].despesas:
-            despesa_text += d["raw_line"] + "\n"
+        despesa_text = "".join(linha + "\n" for linha in self.pessoas[registro["pessoa"]].linhas)
         text_area.insert(tk.END, despesa_text)
         text_area.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
@@ -455,36 +927,33 @@ class FaturaAvancadaApp:
                     messagebox.showerror("Erro", f"Já existe uma pessoa com o nome '{novo_nome}'.")
                     return
                 # Altera o nome na estrutura de dados e na ordem do histórico
-                pessoa_obj = self.pessoas.pop(old_nome)
-                pessoa_obj.nome = novo_nome
-                self.pessoas[novo_nome] = pessoa_obj
-                index = self.historico_order.index(old_nome)
-                self.historico_order[index] = novo_nome
+                self.executar_operacao({"op": "renomear", "pessoa": old_nome, "novo_nome": novo_nome})
                 registro["pessoa"] = novo_nome
             novo_texto = text_area.get("1.0", tk.END).strip()
-            novas_despesas = []
-            total_novo = 0.0
+            pessoa = self.pessoas[registro["pessoa"]]
+            # Linhas que o usuário não mexeu mantêm o valor guardado; só as editadas passam pelo
+            # parser de processar_faturas (uma linha importada pode não ser relida com o mesmo valor)
+            guardadas = {}
+            for linha, centavos in zip(pessoa.linhas, pessoa.centavos):
+                guardadas.setdefault(linha, []).append(centavos)
+            itens = []
             for linha in novo_texto.splitlines():
                 linha = linha.strip()
-                if not linha:
-                    continue
-                match = re.search(r'([\d.,]+)$', linha)
-                if not match:
-                    continue
-                try:
-                    valor_float = float(match.group(1).replace(".", "").replace(",", "."))
-                except ValueError:
-                    continue
-                novas_despesas.append({"raw_line": linha, "valor": valor_float})
-                total_novo += valor_float
-            self.pessoas[registro["pessoa"]].despesas = novas_despesas
-            self.atualizar_historico()
-            self.atualizar_resultados()
+                if guardadas.get(linha):
+                    itens.append([linha, guardadas[linha].pop(0)])
+                elif linha:
+                    centavos = extrair_centavos(linha)
+                    if centavos is not None:
+                        itens.append([linha, centavos])
+            if [linha for linha, _ in itens] != pessoa.linhas or [c for _, c in itens] != pessoa.centavos.tolist():
+                self.executar_operacao({"op": "processar", "pessoa": registro["pessoa"], "linhas": itens})
             detalhes_win.destroy()
 
         detalhes_win.protocol("WM_DELETE_WINDOW", on_close)
 
     def deletar_pessoa(self):
+        if self.edicao_bloqueada():
+            return
         selected_item = self.history_tree.selection()
         if not selected_item:
             messagebox.showinfo("Informação", "Selecione um item do histórico para deletar a pessoa.")
@@ -492,106 +961,446 @@ class FaturaAvancadaApp:
         pessoa_nome = selected_item[0]
         confirm = messagebox.askyesno("Confirmação", f"Tem certeza que deseja deletar a pessoa '{pessoa_nome}' e todos os seus registros?")
         if confirm:
-            if pessoa_nome in self.pessoas:
-                del self.pessoas[pessoa_nome]
-            if pessoa_nome in self.historico_order:
-                self.historico_order.remove(pessoa_nome)
-            self.atualizar_historico()
-            self.atualizar_pagamentos()
-            self.atualizar_resultados()
+            self.executar_operacao({"op": "deletar_pessoa", "pessoa": pessoa_nome})
             self.status_var.set(f"Pessoa '{pessoa_nome}' deletada com sucesso.")
 
     def atualizar_resultados(self):
-        resultado = ""
-        if self.pessoas:
-            resultado += "Resumo por pessoa:\n"
-            resultado += "-" * 40 + "\n"
-            for nome, p in self.pessoas.items():
-                resultado += f"{nome}: R$ {p.total():.2f}\n"
-            total_geral = sum(p.total() for p in self.pessoas.values())
-            resultado += "-" * 40 + "\n"
-            resultado += f"TOTAL GERAL: R$ {total_geral:.2f}"
-        else:
-            resultado = "Sem resultados."
-            total_geral = 0.0
-        self.result_area.config(state="normal")
-        self.result_area.delete("1.0", tk.END)
-        self.result_area.insert("1.0", resultado)
-        self.result_area.config(state="disabled")
-        self.total_label.config(text=f"Total Geral: R$ {total_geral:.2f}")
-        self.root.update_idletasks()
+        # Só as linhas das pessoas cujo total mudou são reescritas
+        self.resumo.exibir([(nome, p.total()) for nome, p in self.pessoas.items()], total_geral(self.pessoas))
+        self.total_label.config(text=f"Total Geral: R$ {total_geral(self.pessoas):.2f}")
 
     def novo_arquivo(self):
+        if self.edicao_bloqueada():
+            return
+        if self.salvando:
+            self.status_var.set("Aguarde o salvamento em andamento terminar.")
+            return
         if messagebox.askyesno("Novo", "Deseja criar um novo arquivo? Os dados não salvos serão perdidos."):
-            self.pessoas = {}
+            self.pessoas = Pessoas()
             self.historico_order = []
             self.arquivo_atual = None
+            self.descartar_indice_busca()
+            self.fechar_armazenamento()
+            self.fechar_diario()
             self.text_area.delete("1.0", tk.END)
-            self.result_area.config(state="normal")
-            self.result_area.delete("1.0", tk.END)
-            self.result_area.config(state="disabled")
+            self.resumo.limpar()
             self.total_label.config(text="Total: R$ 0,00")
             self.status_var.set("Novo arquivo criado")
-            self.atualizar_historico()
+            self.agendar_atualizacao()
+
+    def executar_em_segundo_plano(self, tarefa, ao_concluir, ao_falhar, ao_cancelar=None):
+        # Executa tarefa() numa thread; ao_concluir/ao_falhar/ao_cancelar rodam depois na thread do Tk
+        def devolver(funcao, *args):
+            def callback():
+                self.tarefas_ativas -= 1
+                if funcao:
+                    funcao(*args)
+            self.fila_tarefas.put(callback)
+
+        def trabalho():
+            try:
+                resultado = tarefa()
+            except OperacaoCancelada:
+                devolver(ao_cancelar)
+            except Exception as e:
+                devolver(ao_falhar, e)
+            else:
+                devolver(ao_concluir, resultado)
+
+        self.tarefas_ativas += 1
+        threading.Thread(target=trabalho, daemon=True).start()
+        if self.tarefas_ativas == 1:
+            self.root.after(50, self.processar_fila_tarefas)
+
+    def processar_fila_tarefas(self):
+        while True:
+            try:
+                callback = self.fila_tarefas.get_nowait()
+            except queue.Empty:
+                break
+            callback()
+        if self.tarefas_ativas:
+            self.root.after(50, self.processar_fila_tarefas)
+
+    def criar_progresso(self, descricao):
+        # Retorna um callback progresso(feitos, total) que pode ser chamado da thread de trabalho
+        def progresso(feitos, total):
+            porcentagem = feitos * 100 // total if total else 100
+            texto = f"{descricao}: {formatar_bytes(feitos)} de {formatar_bytes(total)} ({porcentagem}%)"
+            self.fila_tarefas.put(lambda: self.status_var.set(texto))
+        return progresso
+
+    def bloquear_edicao(self, bloquear):
+        self.ocupado = bloquear
+        self.text_area.config(state="disabled" if bloquear else "normal")
+        self.cancelar_button.config(state="normal" if bloquear else "disabled")
+
+    def edicao_bloqueada(self):
+        # Enquanto um arquivo é aberto ou uma fatura grande é processada, as ações que alteram os dados ficam bloqueadas
+        if self.ocupado:
+            self.status_var.set("Aguarde a operação em andamento terminar ou clique em Cancelar.")
+        return self.ocupado
+
+    def cancelar_operacao(self):
+        if self.processamento is not None:
+            self.processamento["cancelado"] = True
+            self.status_var.set("Cancelando processamento...")
+        elif self.ocupado and self.cancelar_carga_evento is not None:
+            self.cancelar_carga_evento.set()
+            self.status_var.set("Cancelando...")
 
     def abrir_arquivo(self):
+        if self.edicao_bloqueada():
+            return
+        if self.salvando:
+            self.status_var.set("Aguarde o salvamento em andamento terminar.")
+            return
         filename = filedialog.askopenfilename(
             title="Abrir Arquivo",
-            filetypes=[("Arquivos JSON", "*.json"), ("Todos os Arquivos", "*.*")]
+            filetypes=[("Arquivos JSON", "*.json"), ("JSON comprimido", "*.gz *.xz"),
+                       ("Banco SQLite", "*.db *.sqlite *.sqlite3"),
+                       ("Todos os Arquivos", "*.*")]
+        )
+        if filename:
+            self.abrir_caminho(filename)
+
+    def abrir_caminho(self, filename):
+        # Também usado para o arquivo passado na linha de comando, que começa a ser lido
+        # enquanto a janela ainda está sendo desenhada
+        cancelar = threading.Event()
+        self.cancelar_carga_evento = cancelar
+        self.bloquear_edicao(True)
+        progresso = self.criar_progresso(f"Abrindo {os.path.basename(filename)}")
+        self.executar_em_segundo_plano(
+            lambda: self.ler_arquivo(filename, progresso, cancelar),
+            lambda resultado: self.concluir_abertura(filename, resultado),
+            self.falha_abertura,
+            self.abertura_cancelada)
+
+    @staticmethod
+    def ler_arquivo(filename, progresso, cancelar):
+        # Roda na thread de trabalho; retorna (pessoas, ordem, armazenamento SQLite ou None,
+        # quantidade de operações recuperadas do diário, marca do diário no arquivo)
+        armazenamento = None
+        try:
+            if fatura_sqlite.eh_arquivo_sqlite(filename):
+                armazenamento = fatura_sqlite.ArmazenamentoSQLite(filename)
+                pessoas, ordem = armazenamento.carregar()
+                marca = armazenamento.marca_do_diario()
+            else:
+                pessoas, ordem = carregar_arquivo(filename, progresso, cancelar)
+                marca = marca_do_diario(filename)
+            recuperadas = reaplicar_diario(filename, pessoas, ordem, marca)
+        except BaseException:
+            # A conexão só passa para o app se a abertura terminar
+            if armazenamento is not None:
+                armazenamento.fechar()
+            raise
+        return pessoas, ordem, armazenamento, recuperadas, marca
+
+    def fechar_diario(self):
+        if self.diario is not None:
+            self.diario.fechar()
+            self.diario = None
+
+    def fechar_armazenamento(self):
+        if self.armazenamento is not None:
+            self.armazenamento.fechar()
+            self.armazenamento = None
+
+    def concluir_abertura(self, filename, resultado):
+        self.bloquear_edicao(False)
+        self.fechar_armazenamento()
+        self.fechar_diario()
+        self.pessoas, self.historico_order, self.armazenamento, recuperadas, marca = resultado
+        self.descartar_indice_busca()
+        self.arquivo_atual = filename
+        self.diario = Diario(filename, marca=marca)
+        status = f"Arquivo aberto: {os.path.basename(filename)} ({formatar_bytes(os.path.getsize(filename))})"
+        if recuperadas:
+            status += f" - {recuperadas} alteração(ões) não salva(s) recuperada(s) do diário"
+        self.status_var.set(status)
+        self.agendar_atualizacao()
+
+    def falha_abertura(self, erro):
+        self.bloquear_edicao(False)
+        self.status_var.set("Pronto")
+        messagebox.showerror("Erro", f"Erro ao abrir o arquivo: {str(erro)}")
+
+    def abertura_cancelada(self):
+        self.bloquear_edicao(False)
+        self.status_var.set("Abertura do arquivo cancelada.")
+
+    def importar_extrato(self):
+        # Lê o extrato numa thread, sem passar pelo campo de texto; as despesas são
+        # acrescentadas à pessoa informada em "Nome da pessoa"
+        if self.edicao_bloqueada():
+            return
+        nome_pessoa = self.pessoa_entry.get().strip()
+        if not nome_pessoa:
+            messagebox.showerror("Erro", "Por favor, insira o nome da pessoa.")
+            return
+        filename = filedialog.askopenfilename(
+            title="Importar Extrato",
+            filetypes=[("Extratos", "*.csv *.ofx *.qfx *.txt"), ("Arquivos CSV", "*.csv"),
+                       ("Arquivos OFX", "*.ofx *.qfx"), ("Todos os Arquivos", "*.*")]
         )
         if filename:
+            cancelar = threading.Event()
+            self.cancelar_carga_evento = cancelar
+            self.bloquear_edicao(True)
+            progresso = self.criar_progresso(f"Importando {os.path.basename(filename)}")
+            self.executar_em_segundo_plano(
+                lambda: list(importadores.ler_transacoes(filename, progresso=progresso, cancelar=cancelar)),
+                lambda itens: self.concluir_importacao(nome_pessoa, filename, itens),
+                self.falha_importacao,
+                self.importacao_cancelada)
+
+    def concluir_importacao(self, nome_pessoa, filename, itens):
+        self.bloquear_edicao(False)
+        self.executar_operacao({"op": "importar", "pessoa": nome_pessoa, "linhas": itens})
+        total = sum(centavos for _, centavos in itens)
+        self.status_var.set(f"Importado {os.path.basename(filename)}: {len(itens)} itens para {nome_pessoa} "
+                            f"(R$ {total / 100:.2f})")
+
+    def importar_pasta(self):
+        # Lê todos os extratos de uma pasta em paralelo; cada arquivo vai para a pessoa do
+        # mapeamento.txt da pasta ou do prefixo do nome do arquivo
+        if self.edicao_bloqueada():
+            return
+        pasta = filedialog.askdirectory(title="Importar Pasta de Extratos")
+        if pasta:
+            cancelar = threading.Event()
+            self.cancelar_carga_evento = cancelar
+            self.bloquear_edicao(True)
+            progresso = self.criar_progresso(f"Importando {os.path.basename(pasta)}")
+            self.executar_em_segundo_plano(
+                lambda: importadores.importar_pasta(pasta, progresso=progresso, cancelar=cancelar),
+                lambda resultado: self.concluir_importacao_pasta(pasta, resultado),
+                self.falha_importacao,
+                self.importacao_cancelada)
+
+    def concluir_importacao_pasta(self, pasta, resultado):
+        self.bloquear_edicao(False)
+        por_pessoa, arquivos = resultado
+        if not por_pessoa:
+            self.status_var.set(f"Nenhum extrato encontrado em {os.path.basename(pasta)}.")
+            return
+        # Todas as pessoas entram numa única operação (um registro no diário e um redesenho)
+        self.executar_operacao({"op": "importar_pasta", "pessoas": por_pessoa})
+        itens = sum(len(linhas) for linhas in por_pessoa.values())
+        self.status_var.set(f"Importados {arquivos} arquivo(s) de {os.path.basename(pasta)}: "
+                            f"{itens} itens para {len(por_pessoa)} pessoa(s)")
+
+    def alternar_caixa_entrada(self):
+        # Liga/desliga a observação de uma pasta: extratos novos ou alterados são importados
+        # automaticamente a cada INTERVALO_CAIXA_ENTRADA_MS
+        if self.caixa_entrada is not None:
+            self.parar_caixa_entrada()
+            self.status_var.set("Observação da pasta encerrada.")
+            return
+        pasta = filedialog.askdirectory(title="Observar Pasta de Extratos")
+        if not pasta:
+            return
+        try:
+            self.caixa_entrada = importadores.CaixaDeEntrada(pasta)
+        except Exception as e:
+            messagebox.showerror("Erro", f"Erro ao ler o índice da pasta: {str(e)}")
+            return
+        self.caixa_entrada_button.config(text="Parar Observação")
+        self.status_var.set(f"Observando a pasta {os.path.basename(pasta)}")
+        self.verificar_caixa_entrada()
+
+    def parar_caixa_entrada(self):
+        if self.caixa_entrada_agendada is not None:
+            self.root.after_cancel(self.caixa_entrada_agendada)
+            self.caixa_entrada_agendada = None
+        if self.caixa_entrada is not None:
             try:
-                with open(filename, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                self.pessoas = {}
-                self.historico_order = []
-                for pessoa_data in data.get("pessoas", []):
-                    nome = pessoa_data["nome"]
-                    pessoa = Pessoa(nome)
-                    for despesa in pessoa_data.get("despesas", []):
-                        pessoa.adicionar_despesa(raw_line=despesa["raw_line"], valor=despesa["valor"])
-                    pessoa.pago = pessoa_data.get("pago", 0.0)
-                    self.pessoas[nome] = pessoa
-                    self.historico_order.append(nome)
-                self.arquivo_atual = filename
-                total_geral = sum(p.total() for p in self.pessoas.values())
-                resultado = "Arquivo carregado com sucesso!\n\n"
-                resultado += "Resumo por pessoa:\n"
-                resultado += "-" * 40 + "\n"
-                for nome, p in self.pessoas.items():
-                    resultado += f"{nome}: R$ {p.total():.2f}\n"
-                resultado += "-" * 40 + "\n"
-                resultado += f"TOTAL GERAL: R$ {total_geral:.2f}"
-                self.result_area.config(state="normal")
-                self.result_area.delete("1.0", tk.END)
-                self.result_area.insert("1.0", resultado)
-                self.result_area.config(state="disabled")
-                self.total_label.config(text=f"Total Geral: R$ {total_geral:.2f}")
-                self.status_var.set(f"Arquivo aberto: {os.path.basename(filename)}")
-                self.atualizar_historico()
-            except Exception as e:
-                messagebox.showerror("Erro", f"Erro ao abrir o arquivo: {str(e)}")
+                self.caixa_entrada.gravar_indice()
+            except OSError:
+                pass
+            self.caixa_entrada = None
+        self.caixa_entrada_button.config(text="Observar Pasta")
+
+    def verificar_caixa_entrada(self):
+        self.caixa_entrada_agendada = None
+        caixa = self.caixa_entrada
+        if caixa is None:
+            return
+        if self.ocupado:
+            self.agendar_caixa_entrada()
+            return
+        # Varredura, hash e leitura dos arquivos rodam na thread; os dados só são alterados na conclusão
+        inicio = time.perf_counter()
+        self.executar_em_segundo_plano(
+            caixa.verificar,
+            lambda verificados: self.concluir_caixa_entrada(caixa, verificados, inicio),
+            lambda erro: self.falha_caixa_entrada(caixa, erro))
+
+    def agendar_caixa_entrada(self):
+        self.caixa_entrada_agendada = self.root.after(INTERVALO_CAIXA_ENTRADA_MS, self.verificar_caixa_entrada)
+
+    def concluir_caixa_entrada(self, caixa, verificados, inicio):
+        if caixa is not self.caixa_entrada:
+            return
+        if self.ocupado:
+            # Um arquivo está sendo aberto: descarta o resultado (não marcado no índice) e tenta de novo
+            self.agendar_caixa_entrada()
+            return
+        por_pessoa = {}
+        importados = 0
+        for _, pessoa, _, itens in verificados:
+            if itens:
+                por_pessoa.setdefault(pessoa, []).extend(itens)
+                importados += 1
+        if por_pessoa:
+            # Mesmo caminho das demais alterações: executar_operacao aplica, registra no diário e redesenha
+            self.executar_operacao({"op": "importar_pasta", "pessoas": por_pessoa})
+        # Só entram no índice da pasta (em disco) os extratos que já estão no diário; sem arquivo
+        # aberto, eles esperam o primeiro salvamento (veja concluir_salvamento)
+        if self.diario is not None:
+            self.diario.sincronizar()
+        caixa.marcar(verificados, duravel=self.diario is not None)
+        if importados:
+            itens = sum(len(linhas) for linhas in por_pessoa.values())
+            self.status_var.set(f"Caixa de entrada: {importados} arquivo(s) importado(s), {itens} itens "
+                                f"em {time.perf_counter() - inicio:.2f} s")
+        self.agendar_caixa_entrada()
+
+    def falha_caixa_entrada(self, caixa, erro):
+        if caixa is not self.caixa_entrada:
+            return
+        self.status_var.set(f"Caixa de entrada: erro na varredura ({erro})")
+        self.agendar_caixa_entrada()
+
+    def falha_importacao(self, erro):
+        self.bloquear_edicao(False)
+        self.status_var.set("Pronto")
+        messagebox.showerror("Erro", f"Erro ao importar o extrato: {str(erro)}")
+
+    def importacao_cancelada(self):
+        self.bloquear_edicao(False)
+        self.status_var.set("Importação cancelada.")
 
     def salvar_arquivo(self):
+        if self.edicao_bloqueada():
+            return
+        if self.salvando:
+            self.status_var.set("Aguarde o salvamento em andamento terminar.")
+            return
         if not self.arquivo_atual:
             filename = filedialog.asksaveasfilename(
                 title="Salvar Como",
                 defaultextension=".json",
-                filetypes=[("Arquivos JSON", "*.json"), ("Todos os Arquivos", "*.*")]
+                filetypes=[("Arquivos JSON", "*.json"), ("JSON comprimido", "*.gz *.xz"),
+                           ("Banco SQLite", "*.db *.sqlite *.sqlite3"),
+                           ("Todos os Arquivos", "*.*")]
             )
             if not filename:
                 return
             self.arquivo_atual = filename
-        try:
-            data = {
-                "pessoas": [p.to_dict() for p in self.pessoas.values()],
-                "data_salvamento": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            }
-            with open(self.arquivo_atual, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-            self.status_var.set(f"Arquivo salvo: {os.path.basename(self.arquivo_atual)}")
-        except Exception as e:
-            messagebox.showerror("Erro", f"Erro ao salvar o arquivo: {str(e)}")
+            if fatura_sqlite.eh_arquivo_sqlite(filename):
+                try:
+                    self.armazenamento = fatura_sqlite.ArmazenamentoSQLite(filename)
+                    # A confirmação de sobrescrever já foi feita no diálogo
+                    self.armazenamento.substituir_conteudo()
+                except Exception as e:
+                    self.arquivo_atual = None
+                    messagebox.showerror("Erro", f"Erro ao salvar o arquivo: {str(e)}")
+                    return
+        self.iniciar_salvamento()
+
+    def iniciar_salvamento(self):
+        # Grava um instantâneo completo de arquivo_atual; o diário é compactado quando a gravação termina
+        destino = self.arquivo_atual
+        self.salvando = True
+        posicao = self.diario.posicao() if self.diario is not None else None
+        # O instantâneo leva a marca da última operação do diário que ele inclui: se o programa
+        # cair antes da compactação, essas operações não são reaplicadas ao abrir
+        marca = posicao[2] if posicao is not None else None
+        # Arquivos da caixa de entrada aplicados antes deste salvamento e ainda fora do índice em disco
+        caixa = self.caixa_entrada
+        importados = (caixa, dict(caixa.nao_gravados)) if caixa is not None and caixa.nao_gravados else None
+        if self.armazenamento is not None:
+            # SQLite: o plano com só as linhas alteradas é montado aqui e gravado na thread
+            armazenamento = self.armazenamento
+            plano = armazenamento.preparar_salvamento(self.pessoas, self.historico_order)
+            self.executar_em_segundo_plano(
+                lambda: armazenamento.executar(plano, marca),
+                lambda gravadas: self.concluir_salvamento(destino, posicao, f"{gravadas} registro(s) gravado(s)",
+                                                          importados),
+                self.falha_salvamento)
+            return
+        # A thread grava uma cópia dos dados, então a edição pode continuar durante o salvamento
+        copia = copiar_pessoas(self.pessoas)
+        progresso = self.criar_progresso(f"Salvando {os.path.basename(destino)}")
+        self.executar_em_segundo_plano(
+            lambda: salvar_arquivo(destino, copia, progresso, marca),
+            lambda gravados: self.concluir_salvamento(destino, posicao, formatar_bytes(gravados), importados),
+            self.falha_salvamento)
+
+    def concluir_salvamento(self, destino, posicao, detalhe, importados=None):
+        self.salvando = False
+        if importados is not None:
+            # Agora esses extratos estão no arquivo: podem ir para o índice da pasta
+            caixa, entradas = importados
+            caixa.confirmar(entradas)
+        if self.diario is not None and posicao is not None:
+            self.diario.compactar(posicao)
+        elif self.diario is None and destino == self.arquivo_atual:
+            # Primeiro salvamento deste arquivo: a partir de agora as alterações vão para o diário
+            self.diario = Diario(destino, novo=True)
+        self.status_var.set(f"Arquivo salvo: {os.path.basename(destino)} ({detalhe})")
+        if self.fechar_apos_salvar:
+            self.ao_fechar()
+
+    def autosalvar(self):
+        # Sincroniza o diário em disco e, quando ele cresce demais, grava um novo instantâneo
+        if self.diario is not None:
+            self.diario.sincronizar()
+            if (self.diario.operacoes >= OPERACOES_PARA_COMPACTAR
+                    and not self.salvando and not self.ocupado):
+                self.iniciar_salvamento()
+        self.root.after(INTERVALO_AUTOSAVE_MS, self.autosalvar)
+
+    def ao_fechar(self):
+        if self.salvando:
+            # A thread de salvamento é daemon: fechar agora cortaria a gravação (e a compactação
+            # do diário) no meio. O app fecha quando o salvamento terminar.
+            self.fechar_apos_salvar = True
+            self.status_var.set("Aguardando o salvamento terminar para fechar...")
+            return
+        self.parar_caixa_entrada()
+        self.fechar_diario()
+        self.fechar_armazenamento()
+        self.root.destroy()
+
+    def medir_primeira_tela(self, inicio, fechar=False):
+        # Tempo desde `inicio` (perf_counter no topo do módulo) até a janela ser exposta e os
+        # desenhos pendentes terminarem; com fechar=True o app fecha depois de informar
+        medido = []
+
+        def exposta(event):
+            if event.widget is not self.root or medido:
+                return
+            self.root.update_idletasks()
+            medido.append(time.perf_counter() - inicio)
+            texto = f"Primeira tela em {medido[0] * 1000:.0f} ms"
+            self.status_var.set(texto)
+            print(texto, file=sys.stderr)
+            if fechar:
+                self.root.after_idle(self.ao_fechar)
+
+        self.root.bind("<Expose>", exposta, add="+")
+
+    def falha_salvamento(self, erro):
+        self.salvando = False
+        self.status_var.set("Pronto")
+        messagebox.showerror("Erro", f"Erro ao salvar o arquivo: {str(erro)}")
+        if self.fechar_apos_salvar:
+            # As alterações continuam no diário
+            self.ao_fechar()
 
     def exportar_resultados(self):
         if not self.pessoas:
@@ -600,31 +1409,62 @@ class FaturaAvancadaApp:
         filename = filedialog.asksaveasfilename(
             title="Exportar Resultados",
             defaultextension=".txt",
-            filetypes=[("Arquivos de Texto", "*.txt"), ("Todos os Arquivos", "*.*")]
+            filetypes=[("Arquivos de Texto", "*.txt"), ("CSV", "*.csv"), ("JSON Lines", "*.jsonl"),
+                       ("Todos os Arquivos", "*.*")]
         )
         if filename:
-            try:
-                with open(filename, 'w', encoding='utf-8') as f:
-                    f.write("RELATÓRIO DE DESPESAS\n")
-                    f.write("=" * 50 + "\n")
-                    f.write(f"Data: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}\n\n")
-                    for nome, pessoa in self.pessoas.items():
-                        f.write(f"Despesas de {nome}:\n")
-                        f.write("-" * 50 + "\n")
-                        for despesa in pessoa.despesas:
-                            f.write(f"{despesa['raw_line']}\n")
-                        f.write("-" * 50 + "\n")
-                        f.write(f"TOTAL: R$ {pessoa.total():.2f}\n\n")
-                    total_geral = sum(p.total() for p in self.pessoas.values())
-                    f.write("=" * 50 + "\n")
-                    f.write(f"TOTAL GERAL: R$ {total_geral:.2f}\n")
-                self.status_var.set(f"Resultados exportados para: {os.path.basename(filename)}")
-                messagebox.showinfo("Sucesso", "Resultados exportados com sucesso!")
-            except Exception as e:
-                messagebox.showerror("Erro", f"Erro ao exportar resultados: {str(e)}")
+            # O formato vem da extensão; a thread grava uma cópia dos dados, então a edição continua
+            copia = copiar_pessoas(self.pessoas)
+            progresso = self.criar_progresso_exportacao(os.path.basename(filename))
+            self.executar_em_segundo_plano(
+                lambda: exportacao.exportar(filename, copia, progresso=progresso),
+                lambda pessoas: self.concluir_exportacao(os.path.basename(filename), pessoas),
+                self.falha_exportacao)
+
+    def exportar_por_pessoa(self):
+        if not self.pessoas:
+            messagebox.showinfo("Informação", "Não há resultados para exportar.")
+            return
+        pasta = filedialog.askdirectory(title="Exportar um Relatório por Pessoa")
+        if pasta:
+            copia = copiar_pessoas(self.pessoas)
+            progresso = self.criar_progresso_exportacao(os.path.basename(pasta))
+            self.executar_em_segundo_plano(
+                lambda: exportacao.exportar_por_pessoa(pasta, copia, progresso=progresso),
+                lambda arquivos: self.concluir_exportacao(os.path.basename(pasta), arquivos),
+                self.falha_exportacao)
+
+    def criar_progresso_exportacao(self, destino):
+        # Como criar_progresso, mas contando pessoas em vez de bytes
+        def progresso(feitas, total):
+            texto = f"Exportando para {destino}: {feitas} de {total} pessoa(s)"
+            self.fila_tarefas.put(lambda: self.status_var.set(texto))
+        return progresso
+
+    def concluir_exportacao(self, destino, pessoas):
+        self.status_var.set(f"Resultados exportados para: {destino} ({pessoas} pessoa(s))")
+        messagebox.showinfo("Sucesso", "Resultados exportados com sucesso!")
+
+    def falha_exportacao(self, erro):
+        self.status_var.set("Falha ao exportar resultados.")
+        messagebox.showerror("Erro", f"Erro ao exportar resultados: {str(erro)}")
 
 
 if __name__ == "__main__":
+    # FATURA_MEDIR=1 / FATURA_PERFIL=<método>: mede a latência dos handlers (ver fatura_instrumentacao)
+    medidor = Medidor.do_ambiente()
+    if medidor is not None:
+        medidor.instrumentar(FaturaAvancadaApp)
+    # Uso: "Teste V08.py" [--medir-inicio] [arquivo]
+    #   --medir-inicio  mostra o tempo até a primeira tela e fecha o app
+    argumentos = sys.argv[1:]
+    medir_inicio = "--medir-inicio" in argumentos
+    arquivos = [argumento for argumento in argumentos if argumento != "--medir-inicio"]
     root = tk.Tk()
     app = FaturaAvancadaApp(root)
+    if arquivos:
+        # A leitura começa na thread de trabalho enquanto a janela é desenhada
+        app.abrir_caminho(arquivos[0])
+    if medir_inicio or medidor is not None:
+        app.medir_primeira_tela(INICIO, fechar=medir_inicio)
     root.mainloop()
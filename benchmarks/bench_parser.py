@@ -0,0 +1,111 @@
+"""Compara o parser de valores atual com o caminho antigo (regex + replace + float).
+
+As linhas geradas misturam o formato simples ("NETFLIX.COM 55,90") com os marcadores
+que extrair_centavos reconhece: prefixo "R$", sinal antes ou depois do valor, crédito
+("C"/"CR"), débito ("D") e parcela depois do valor, em qualquer ordem. O regex antigo
+não reconhece esses marcadores: as linhas com eles ficam de fora do total dele.
+
+Uso:
+    python benchmarks/bench_parser.py [quantidade_de_linhas]
+"""
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fatura_engine import extrair_centavos  # noqa: E402
+
+
+PADRAO_ANTIGO = re.compile(r"([\d.]+,\d{2})$")
+
+DESCRICOES = ["SUPERMERCADO EXTRA", "POSTO SHELL", "NETFLIX.COM", "UBER *TRIP", "FARMACIA PAGUE MENOS",
+              "AMAZON MARKETPLACE", "RESTAURANTE SABOR CASEIRO", "PADARIA PAO QUENTE", "MAGAZINE LUIZA"]
+
+
+def gerar_linha(rnd):
+    centavos = rnd.randint(100, 500000)
+    valor = f"{centavos // 100:,}".replace(",", ".") + f",{centavos % 100:02d}"
+    sorteio = rnd.random()
+    if sorteio < 0.08:
+        valor = f"R$ {valor}"
+    elif sorteio < 0.12:
+        valor = f"R$ -{valor}"
+    elif sorteio < 0.18:
+        valor = f"-{valor}"
+    elif sorteio < 0.20:
+        valor = f"{valor}-"
+    elif sorteio < 0.23:
+        valor = f"{valor} C"
+    elif sorteio < 0.26:
+        valor = f"{valor}CR"
+    elif sorteio < 0.28:
+        valor = f"{valor} D"
+    if rnd.random() < 0.1:
+        marcador = valor[-1].isalpha()
+        valor += f" {rnd.randint(1, 10):02d}/10"
+        if rnd.random() < 0.2 and not marcador:
+            valor += " C"
+    return f"{rnd.choice(DESCRICOES)} {valor}"
+
+
+def gerar_arquivo(caminho, quantidade, semente=42):
+    rnd = random.Random(semente)
+    with open(caminho, "w", encoding="utf-8") as f:
+        for _ in range(quantidade):
+            f.write(gerar_linha(rnd) + "\n")
+
+
+def caminho_antigo(linhas):
+    total = 0.0
+    reconhecidas = 0
+    for linha in linhas:
+        match = PADRAO_ANTIGO.search(linha)
+        if match:
+            total += float(match.group(1).replace(".", "").replace(",", "."))
+            reconhecidas += 1
+    return round(total * 100), reconhecidas
+
+
+def caminho_novo(linhas):
+    total = 0
+    reconhecidas = 0
+    for linha in linhas:
+        centavos = extrair_centavos(linha)
+        if centavos is not None:
+            total += centavos
+            reconhecidas += 1
+    return total, reconhecidas
+
+
+def medir(funcao, linhas, repeticoes=3):
+    melhor = None
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao(linhas)
+        decorrido = time.perf_counter() - inicio
+        melhor = decorrido if melhor is None else min(melhor, decorrido)
+    return melhor, resultado
+
+
+def main():
+    quantidade = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = os.path.join(pasta, "fatura.txt")
+        gerar_arquivo(caminho, quantidade)
+        with open(caminho, encoding="utf-8") as f:
+            linhas = f.read().splitlines()
+
+    t_antigo, (total_antigo, reconhecidas_antigo) = medir(caminho_antigo, linhas)
+    t_novo, (total_novo, reconhecidas_novo) = medir(caminho_novo, linhas)
+    print(f"linhas: {quantidade}")
+    print(f"regex + replace: {t_antigo:.3f} s  (total {total_antigo}, {reconhecidas_antigo} linhas reconhecidas)")
+    print(f"extrair_centavos: {t_novo:.3f} s  (total {total_novo}, {reconhecidas_novo} linhas reconhecidas)")
+    print(f"ganho: {t_antigo / t_novo:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
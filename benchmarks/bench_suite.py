@@ -0,0 +1,246 @@
+"""Benchmarks do motor e da interface com uma família sintética (benchmarks/gerador.py).
+
+Mede a análise das linhas (etapa de processar_faturas), Pessoa.total, salvar e
+abrir arquivos (ida e volta, com e sem compressão), abrir arquivos no formato
+antigo (sem índice), exportar_resultados, o
+redesenho das Treeviews e do resumo com o Tk escondido e o tempo até a primeira
+tela de um processo novo (--medir-inicio). Sem display (servidor
+de CI), rode com xvfb-run; se o Tk não abrir, os testes de interface são
+registrados como pulados.
+
+Os resultados vão para um JSON (melhor tempo de cada medida, parâmetros,
+versão do código) que pode ser comparado com o de outra versão:
+
+    python benchmarks/bench_suite.py --pessoas 200 --linhas 2000 --saida atual.json
+    python benchmarks/bench_suite.py --pessoas 200 --linhas 2000 --comparar atual.json
+"""
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fatura_engine import (Pessoa, analisar_linhas, carregar_arquivo, copiar_pessoas, pessoas_to_dict,  # noqa: E402
+                           salvar_arquivo)
+from fatura_exportacao import exportar, exportar_por_pessoa  # noqa: E402
+from gerador import gerar_familia, gerar_linhas  # noqa: E402
+
+
+def medir(funcao, repeticoes, preparar=None):
+    # Melhor tempo de `repeticoes` execuções; preparar() roda antes de cada uma, fora da medida
+    melhor = None
+    for _ in range(repeticoes):
+        if preparar is not None:
+            preparar()
+        inicio = time.perf_counter()
+        funcao()
+        decorrido = time.perf_counter() - inicio
+        melhor = decorrido if melhor is None else min(melhor, decorrido)
+    return melhor
+
+
+def bench_motor(familia, args, pasta):
+    resultados = {}
+    linhas = gerar_linhas(args.pessoas * args.linhas, random.Random(7))
+    resultados["analisar_linhas"] = medir(lambda: analisar_linhas(linhas), args.repeticoes)
+
+    def processar():
+        pessoa = Pessoa("Benchmark")
+        for inicio in range(0, len(linhas), args.linhas):
+            for linha, centavos in analisar_linhas(linhas[inicio:inicio + args.linhas]):
+                pessoa.adicionar_despesa_centavos(linha, centavos)
+    resultados["processar_faturas"] = medir(processar, args.repeticoes)
+
+    def totais():
+        for _ in range(100):
+            for pessoa in familia.values():
+                pessoa.total()
+            familia.total_geral()
+    resultados["pessoa_total_x100"] = medir(totais, args.repeticoes)
+
+    for extensao in (".json", ".json.gz", ".json.xz"):
+        caminho = os.path.join(pasta, "familia" + extensao)
+        resultados[f"salvar{extensao}"] = medir(lambda: salvar_arquivo(caminho, familia), args.repeticoes)
+        resultados[f"abrir{extensao}"] = medir(lambda: carregar_arquivo(caminho), args.repeticoes)
+
+        def abrir_tudo():
+            # Abre e lê as despesas de todas as pessoas (o carregamento sob demanda não conta)
+            pessoas, _ = carregar_arquivo(caminho)
+            for pessoa in pessoas.values():
+                pessoa.linhas
+        resultados[f"abrir_completo{extensao}"] = medir(abrir_tudo, args.repeticoes)
+
+    # Formato da v2.1 sem índice (json.dump com indent=2), lido em fluxo pessoa a pessoa. Em
+    # "uma_pessoa" todas as despesas ficam num único registro, bem maior que o bloco de leitura
+    todos = Pessoa("Todos")
+    for pessoa in familia.values():
+        for linha, centavos in zip(pessoa.linhas, pessoa.centavos):
+            todos.adicionar_despesa_centavos(linha, centavos)
+    for nome, dados in (("abrir_legado", pessoas_to_dict(familia)),
+                        ("abrir_legado_uma_pessoa", {"pessoas": [todos.to_dict()]})):
+        caminho = os.path.join(pasta, nome + ".json")
+        with open(caminho, "w", encoding="utf-8") as f:
+            json.dump(dados, f, ensure_ascii=False, indent=2)
+        resultados[nome] = medir(lambda: carregar_arquivo(caminho), args.repeticoes)
+
+    for formato in ("txt", "csv", "jsonl"):
+        caminho = os.path.join(pasta, "exportado." + formato)
+        resultados[f"exportar_{formato}"] = medir(lambda: exportar(caminho, familia), args.repeticoes)
+    resultados["exportar_por_pessoa"] = medir(
+        lambda: exportar_por_pessoa(os.path.join(pasta, "por_pessoa"), familia), args.repeticoes)
+    return resultados
+
+
+def bench_interface(familia, args):
+    # Redesenho das abas com a janela escondida; retorna ({medida: segundos}, motivo se pulado)
+    try:
+        import tkinter as tk
+        root = tk.Tk()
+    except Exception as e:
+        return {}, f"Tk indisponível ({e})"
+    root.withdraw()
+    try:
+        spec = importlib.util.spec_from_file_location("teste_v08", os.path.join(RAIZ, "Teste V08.py"))
+        modulo = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(modulo)
+        app = modulo.FaturaAvancadaApp(root)
+        # As abas são construídas na primeira seleção; aqui são montadas antes de medir
+        app.construir_aba("historico")
+        app.construir_aba("pagamentos")
+        app.pessoas = copiar_pessoas(familia)
+        app.historico_order = list(app.pessoas)
+        resultados = {}
+
+        def redesenhar():
+            app.atualizar_historico()
+            app.atualizar_pagamentos()
+            app.atualizar_resultados()
+            root.update_idletasks()
+
+        def esvaziar():
+            for tree in (app.history_tree, app.pagamento_tree):
+                tree.delete(*tree.get_children())
+            app.linhas_exibidas.clear()
+            app.ordens_em_cache.clear()
+            app.resumo.limpar()
+
+        resultados["tk_primeira_exibicao"] = medir(redesenhar, args.repeticoes, esvaziar)
+        pessoa = next(iter(app.pessoas.values()))
+        resultados["tk_atualizar_uma_pessoa"] = medir(
+            redesenhar, args.repeticoes, lambda: pessoa.adicionar_despesa_centavos("BENCHMARK 1,00", 100))
+        app.ordenacao[str(app.pagamento_tree)] = ("falta", True)
+        resultados["tk_ordenar_falta"] = medir(app.atualizar_pagamentos, args.repeticoes, app.ordens_em_cache.clear)
+    finally:
+        root.destroy()
+    resultados["tk_primeira_tela"] = primeira_tela(args.repeticoes)
+    return resultados, None
+
+
+def primeira_tela(repeticoes):
+    # Melhor tempo até a primeira tela de um processo novo ("Teste V08.py" --medir-inicio)
+    melhor = None
+    for _ in range(repeticoes):
+        saida = subprocess.run([sys.executable, os.path.join(RAIZ, "Teste V08.py"), "--medir-inicio"],
+                               cwd=RAIZ, capture_output=True, text=True, timeout=60)
+        encontrado = re.search(r"Primeira tela em (\d+) ms", saida.stderr)
+        if encontrado is None:
+            raise RuntimeError(f"tempo da primeira tela não informado: {saida.stderr.strip()}")
+        segundos = int(encontrado.group(1)) / 1000
+        melhor = segundos if melhor is None else min(melhor, segundos)
+    return melhor
+
+
+def versao_do_codigo():
+    try:
+        saida = subprocess.run(["git", "describe", "--always", "--dirty"], cwd=RAIZ,
+                               capture_output=True, text=True, timeout=10)
+        return saida.stdout.strip() or "desconhecida"
+    except (OSError, subprocess.SubprocessError):
+        return "desconhecida"
+
+
+def comparar(atual, caminho_base, tolerancia):
+    # Imprime base x atual e retorna quantas medidas ficaram mais lentas que a tolerância
+    with open(caminho_base, encoding="utf-8") as f:
+        base = json.load(f)
+    if base.get("parametros") != atual["parametros"]:
+        print(f"Aviso: parâmetros diferentes da base ({base.get('parametros')})")
+    regressoes = 0
+    print(f"{'medida':<28}{'base (s)':>12}{'atual (s)':>12}{'razão':>9}")
+    for nome, segundos in atual["resultados"].items():
+        anterior = base.get("resultados", {}).get(nome)
+        if anterior is None:
+            print(f"{nome:<28}{'-':>12}{segundos:>12.4f}")
+            continue
+        razao = segundos / anterior if anterior else float("inf")
+        marca = ""
+        if razao > 1 + tolerancia:
+            marca = "  REGRESSÃO"
+            regressoes += 1
+        print(f"{nome:<28}{anterior:>12.4f}{segundos:>12.4f}{razao:>8.2f}x{marca}")
+    return regressoes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks da Calculadora de Faturas")
+    parser.add_argument("--pessoas", type=int, default=100, help="pessoas na família sintética")
+    parser.add_argument("--linhas", type=int, default=1000, help="linhas de fatura por pessoa")
+    parser.add_argument("--repeticoes", type=int, default=3, help="execuções por medida (vale a melhor)")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--sem-tk", action="store_true", help="não mede a interface")
+    parser.add_argument("--saida", default="benchmark.json", help="arquivo JSON com os resultados")
+    parser.add_argument("--comparar", metavar="BASE", help="JSON de outra execução para comparar")
+    parser.add_argument("--tolerancia", type=float, default=0.10,
+                        help="fração de lentidão aceita antes de acusar regressão (padrão: 0.10)")
+    args = parser.parse_args(argv)
+
+    inicio = time.perf_counter()
+    familia = gerar_familia(args.pessoas, args.linhas, args.semente)
+    print(f"Família: {args.pessoas} pessoa(s) x {args.linhas} linha(s) "
+          f"gerada em {time.perf_counter() - inicio:.2f} s")
+    with tempfile.TemporaryDirectory() as pasta:
+        resultados = bench_motor(familia, args, pasta)
+    pulados = {}
+    if args.sem_tk:
+        pulados["interface"] = "--sem-tk"
+    else:
+        interface, motivo = bench_interface(familia, args)
+        resultados.update(interface)
+        if motivo:
+            pulados["interface"] = motivo
+
+    atual = {
+        "versao": versao_do_codigo(),
+        "data": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "parametros": {"pessoas": args.pessoas, "linhas": args.linhas, "repeticoes": args.repeticoes,
+                       "semente": args.semente},
+        "resultados": {nome: round(segundos, 6) for nome, segundos in resultados.items()},
+        "pulados": pulados,
+    }
+    with open(args.saida, "w", encoding="utf-8") as f:
+        json.dump(atual, f, ensure_ascii=False, indent=2)
+    for nome, motivo in pulados.items():
+        print(f"{nome}: pulado - {motivo}")
+    print(f"Resultados gravados em {args.saida}")
+    if args.comparar:
+        return 1 if comparar(atual, args.comparar, args.tolerancia) else 0
+    for nome, segundos in atual["resultados"].items():
+        print(f"{nome:<28}{segundos:>10.4f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,69 @@
+"""Famílias sintéticas para os benchmarks: N pessoas x M linhas de fatura.
+
+As linhas imitam extratos de cartão: data, estabelecimento, às vezes parcela
+("03/10") e valor em reais no formato brasileiro ("1.234,56"), com valores
+concentrados em compras pequenas e alguns gastos altos. Cerca de 1% das
+linhas não tem valor (cabeçalhos, anotações), como num texto colado do banco.
+A semente fixa deixa os dados iguais entre execuções e versões.
+"""
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fatura_engine import Pessoa, Pessoas, analisar_linhas, processar_linhas_centavos  # noqa: E402
+
+
+NOMES = ["Ana", "João", "Maria", "José", "Antônio", "Francisca", "Luiz", "Adriana", "Carlos", "Juliana",
+         "Paulo", "Márcia", "Pedro", "Fernanda", "Lucas", "Patrícia", "Gabriel", "Aline", "Rafael", "Sônia"]
+SOBRENOMES = ["Silva", "Santos", "Oliveira", "Souza", "Lima", "Pereira", "Ferreira", "Costa", "Rodrigues",
+              "Almeida", "Nascimento", "Araújo", "Melo", "Barbosa", "Ribeiro", "Conceição"]
+ESTABELECIMENTOS = ["SUPERMERCADO EXTRA", "POSTO SHELL", "NETFLIX.COM", "UBER *TRIP", "IFOOD *RESTAURANTE",
+                    "FARMACIA PAGUE MENOS", "AMAZON MARKETPLACE", "PADARIA PAO QUENTE", "MAGAZINE LUIZA",
+                    "DROGASIL", "RESTAURANTE SABOR CASEIRO", "SPOTIFY", "CASAS BAHIA", "MERCADOLIVRE*LOJA",
+                    "LOJAS AMERICANAS", "CINEMARK", "SMART FIT", "ASSAI ATACADISTA", "99 *POP", "PAG*CONFEITARIA"]
+ANOTACOES = ["Pagamento recebido - obrigado", "Fatura de referência", "Lançamentos internacionais", ""]
+
+
+def formatar_reais(centavos):
+    # 123456 -> "1.234,56"
+    return f"{centavos // 100:,}".replace(",", ".") + f",{centavos % 100:02d}"
+
+
+def gerar_linhas(quantidade, rnd):
+    linhas = []
+    for _ in range(quantidade):
+        if rnd.random() < 0.01:
+            linhas.append(rnd.choice(ANOTACOES))
+            continue
+        # Log-normal: mediana perto de R$ 60, cauda até alguns milhares de reais
+        centavos = min(max(int(rnd.lognormvariate(8.7, 1.1)), 100), 2_500_000)
+        data = f"{rnd.randint(1, 28):02d}/{rnd.randint(1, 12):02d}"
+        parcela = f" {rnd.randint(1, 10):02d}/10" if rnd.random() < 0.1 else ""
+        linhas.append(f"{data} {rnd.choice(ESTABELECIMENTOS)}{parcela} {formatar_reais(centavos)}")
+    return linhas
+
+
+def gerar_nomes(quantidade, rnd):
+    nomes = []
+    usados = set()
+    while len(nomes) < quantidade:
+        nome = f"{rnd.choice(NOMES)} {rnd.choice(SOBRENOMES)}"
+        if nome in usados:
+            nome = f"{nome} {len(nomes)}"
+        usados.add(nome)
+        nomes.append(nome)
+    return nomes
+
+
+def gerar_familia(pessoas, linhas, semente=42):
+    # Pessoas com `linhas` linhas de fatura cada (as linhas sem valor são descartadas, como no app)
+    rnd = random.Random(semente)
+    familia = Pessoas()
+    for nome in gerar_nomes(pessoas, rnd):
+        pessoa = Pessoa(nome)
+        processar_linhas_centavos(pessoa, analisar_linhas(gerar_linhas(linhas, rnd)))
+        pessoa.pago = round(rnd.random() * pessoa.total(), 2)
+        familia[nome] = pessoa
+    return familia
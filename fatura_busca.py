@@ -0,0 +1,298 @@
+"""Busca em texto completo sobre as linhas de despesa de todas as pessoas.
+
+IndiceBusca é um índice invertido (token -> pessoa -> linhas) mantido de forma
+incremental: cada pessoa guarda a revisão e quantas linhas já foram indexadas,
+então inclusões no final só indexam as linhas novas e edições reindexam apenas
+a pessoa alterada.
+
+Consulta: palavras (cada uma casa como prefixo, sem diferenciar acentos e
+maiúsculas) combinadas com E, e filtros de valor como ">100", "<=50,00" ou
+"10..20". O resultado traz as linhas encontradas e o total por pessoa.
+"""
+import re
+import unicodedata
+from bisect import bisect_left, bisect_right, insort
+from itertools import accumulate
+
+from fatura_engine import centavos_do_campo
+
+
+_TOKEN = re.compile(r"\w+")
+_FILTRO_VALOR = re.compile(r"^(>=|<=|>|<)(.+)$")
+# Acima disso, os tokens novos entram no vocabulário ordenando tudo de novo em vez de um a um
+_TOKENS_PARA_REORDENAR = 64
+# Quantos resultados de _prefixo ficam guardados entre buscas
+_PREFIXOS_GUARDADOS = 256
+
+
+def normalizar(texto):
+    # Minúsculas e sem acentos ("Pão" -> "pao")
+    if texto.isascii():
+        return texto.lower()
+    return "".join(c for c in unicodedata.normalize("NFKD", texto) if not unicodedata.combining(c)).lower()
+
+
+def tokens(texto):
+    return _TOKEN.findall(normalizar(texto))
+
+
+def analisar_consulta(consulta):
+    # Retorna (termos, mínimo, máximo); mínimo/máximo em centavos ou None
+    termos = []
+    minimo = maximo = None
+    for parte in consulta.split():
+        filtro = _FILTRO_VALOR.match(parte)
+        if filtro:
+            valor = centavos_do_campo(filtro.group(2))
+            if valor is not None:
+                operador = filtro.group(1)
+                if operador[0] == ">":
+                    minimo = valor + (operador == ">")
+                else:
+                    maximo = valor - (operador == "<")
+                continue
+        if ".." in parte:
+            inicio, _, fim = parte.partition("..")
+            valor_inicio = centavos_do_campo(inicio) if inicio else None
+            valor_fim = centavos_do_campo(fim) if fim else None
+            if (inicio or fim) and (not inicio or valor_inicio is not None) and (not fim or valor_fim is not None):
+                minimo = valor_inicio if inicio else minimo
+                maximo = valor_fim if fim else maximo
+                continue
+        termos.extend(tokens(parte))
+    return termos, minimo, maximo
+
+
+class ResultadoBusca:
+    def __init__(self):
+        # [(pessoa, índice da linha, linha, centavos)] limitado a `limite`
+        self.linhas = []
+        # Quantidade total de linhas encontradas (pode passar do limite)
+        self.quantidade = 0
+        # Nome da pessoa -> [quantidade, centavos]
+        self.por_pessoa = {}
+        self.centavos = 0
+
+
+class IndiceBusca:
+    def __init__(self):
+        # token -> {pessoa: [índices das linhas, soma dos centavos dessas linhas, valores em ordem]}.
+        # A quantidade e a soma já dão o total por pessoa de uma busca de um termo só; os valores em
+        # ordem (preenchidos na primeira busca com filtro de valor, veja _ordenados) respondem ao
+        # filtro por bisect
+        self.postagens = {}
+        # pessoa -> entrada com todas as linhas indexadas (range), no mesmo formato das postagens:
+        # responde por bisect às buscas só com filtro de valor
+        self.valores = {}
+        # termo -> resultado de _prefixo e (termos,) -> interseção deles; descartados quando o
+        # índice muda
+        self.prefixos = {}
+        # Tokens em ordem, para a busca por prefixo; pode conter tokens que já saíram de postagens
+        self.vocabulario = []
+        self.tokens_novos = []
+        # pessoa -> tokens presentes nas suas linhas (para remover a pessoa do índice)
+        self.tokens_por_pessoa = {}
+        # pessoa -> (revisao, linhas já indexadas)
+        self.estado = {}
+        # Pessoas com linhas ainda não indexadas (dict usado como conjunto ordenado)
+        self.pendentes = {}
+
+    def sincronizar(self, pessoas, nomes=None):
+        # Marca para indexação as pessoas com esses nomes (None: todas) e tira do índice as que
+        # não existem mais. O trabalho em si é feito por indexar().
+        vivas = set(pessoas.values())
+        for pessoa in [p for p in self.estado if p not in vivas]:
+            self.remover(pessoa)
+        for pessoa in [p for p in self.pendentes if p not in vivas]:
+            del self.pendentes[pessoa]
+        alvo = pessoas.values() if nomes is None else (pessoas[n] for n in nomes if n in pessoas)
+        for pessoa in alvo:
+            self.pendentes[pessoa] = None
+
+    def remover(self, pessoa):
+        self.prefixos.clear()
+        self.valores.pop(pessoa, None)
+        for token in self.tokens_por_pessoa.pop(pessoa, ()):
+            postagem = self.postagens[token]
+            del postagem[pessoa]
+            if not postagem:
+                del self.postagens[token]
+        self.estado.pop(pessoa, None)
+
+    def indexar(self, limite_linhas=None):
+        # Indexa as linhas pendentes (no máximo limite_linhas); retorna True quando não sobra nada
+        restante = limite_linhas
+        while self.pendentes:
+            pessoa = next(iter(self.pendentes))
+            revisao, feitas = self.estado.get(pessoa, (None, 0))
+            if revisao != pessoa.revisao:
+                # Linhas existentes mudaram: reindexa a pessoa inteira
+                self.remover(pessoa)
+                feitas = 0
+            linhas = pessoa.linhas
+            centavos = pessoa.centavos
+            fim = len(linhas) if restante is None else min(len(linhas), feitas + restante)
+            tokens_pessoa = self.tokens_por_pessoa.setdefault(pessoa, set())
+            for indice in range(feitas, fim):
+                valor = centavos[indice]
+                for token in set(tokens(linhas[indice])):
+                    postagem = self.postagens.get(token)
+                    if postagem is None:
+                        postagem = self.postagens[token] = {}
+                        self.tokens_novos.append(token)
+                    entrada = postagem.get(pessoa)
+                    if entrada is None:
+                        postagem[pessoa] = [[indice], valor, None]
+                        tokens_pessoa.add(token)
+                    else:
+                        entrada[0].append(indice)
+                        entrada[1] += valor
+            self.estado[pessoa] = (pessoa.revisao, fim)
+            if fim > feitas:
+                self.prefixos.clear()
+            entrada = self.valores.get(pessoa)
+            if entrada is None or len(entrada[0]) != fim:
+                entrada = self.valores[pessoa] = [range(fim), None, None]
+            if fim == len(linhas):
+                # Pessoa completa: os valores em ordem já ficam prontos para os filtros de valor
+                self._ordenados(entrada, centavos)
+            if restante is not None:
+                restante -= fim - feitas
+            if fim == len(linhas):
+                del self.pendentes[pessoa]
+            if restante is not None and restante <= 0:
+                break
+        return not self.pendentes
+
+    def linhas_indexadas(self):
+        return sum(feitas for _, feitas in self.estado.values())
+
+    def _atualizar_vocabulario(self):
+        # Feito só na busca, para que a indexação em fatias não reordene o vocabulário a cada fatia
+        if len(self.tokens_novos) > _TOKENS_PARA_REORDENAR or len(self.vocabulario) > 2 * len(self.postagens) + 1024:
+            self.vocabulario = sorted(self.postagens)
+        else:
+            for token in self.tokens_novos:
+                indice = bisect_left(self.vocabulario, token)
+                if indice == len(self.vocabulario) or self.vocabulario[indice] != token:
+                    insort(self.vocabulario, token, indice)
+        self.tokens_novos = []
+
+    def _prefixo(self, termo):
+        # {pessoa: entrada} das linhas com algum token que começa com termo. Quando só um token
+        # casa na pessoa, a entrada é a própria postagem (não alterar); a união de vários tokens
+        # vira uma entrada nova, com a soma por calcular (None). Prefixos curtos unem muitas
+        # postagens, então o resultado fica guardado até o índice mudar
+        encontrados = self.prefixos.get(termo)
+        if encontrados is not None:
+            return encontrados
+        if len(self.prefixos) >= _PREFIXOS_GUARDADOS:
+            self.prefixos.clear()
+        encontrados = self.prefixos[termo] = {}
+        unidas = {}
+        vocabulario = self.vocabulario
+        indice = bisect_left(vocabulario, termo)
+        while indice < len(vocabulario) and vocabulario[indice].startswith(termo):
+            for pessoa, entrada in self.postagens.get(vocabulario[indice], {}).items():
+                anterior = encontrados.get(pessoa)
+                if anterior is None:
+                    encontrados[pessoa] = entrada
+                elif pessoa in unidas:
+                    unidas[pessoa].update(entrada[0])
+                else:
+                    unidas[pessoa] = set(anterior[0])
+                    unidas[pessoa].update(entrada[0])
+            indice += 1
+        for pessoa, conjunto in unidas.items():
+            encontrados[pessoa] = [sorted(conjunto), None, None]
+        return encontrados
+
+    @staticmethod
+    def _intersecao(candidatos, encontrados):
+        # Linhas de candidatos que também estão em encontrados, pessoa a pessoa
+        resultado = {}
+        for pessoa, entrada in candidatos.items():
+            outra = encontrados.get(pessoa)
+            if outra is None:
+                continue
+            if entrada[0] == outra[0]:
+                # Tokens que sempre aparecem juntos ("uber trip"): a entrada serve inteira
+                resultado[pessoa] = entrada
+                continue
+            menor, maior = sorted((entrada[0], outra[0]), key=len)
+            comuns = set(maior).intersection(menor)
+            if comuns:
+                resultado[pessoa] = [sorted(comuns), None, None]
+        return resultado
+
+    @staticmethod
+    def _ordenados(entrada, centavos):
+        # (quantidade, índices das linhas da entrada em ordem de valor, valores nessa ordem, somas
+        # acumuladas), guardados na entrada até ela crescer
+        indices = entrada[0]
+        ordenados = entrada[2]
+        if ordenados is None or ordenados[0] != len(indices):
+            ordem = sorted(indices, key=centavos.__getitem__)
+            valores = [centavos[i] for i in ordem]
+            ordenados = entrada[2] = (len(indices), ordem, valores, list(accumulate(valores, initial=0)))
+        return ordenados
+
+    def _filtrar(self, resultado, pessoa, entrada, minimo, maximo, limite):
+        # Acrescenta as linhas da entrada com valor entre minimo e maximo, por busca binária
+        _, ordem, valores, acumulados = self._ordenados(entrada, pessoa.centavos)
+        inicio = bisect_left(valores, minimo)
+        fim = bisect_right(valores, maximo)
+        if inicio == fim:
+            return
+        indices = sorted(ordem[inicio:fim]) if len(resultado.linhas) < limite else ()
+        self._acrescentar(resultado, pessoa, indices, fim - inicio, acumulados[fim] - acumulados[inicio], limite)
+
+    def buscar(self, consulta, limite=500):
+        self.indexar()
+        if self.tokens_novos:
+            self._atualizar_vocabulario()
+        termos, minimo, maximo = analisar_consulta(consulta)
+        resultado = ResultadoBusca()
+        if not termos and minimo is None and maximo is None:
+            return resultado
+        filtrar = minimo is not None or maximo is not None
+        minimo = -float("inf") if minimo is None else minimo
+        maximo = float("inf") if maximo is None else maximo
+        if not termos:
+            # Só filtro de valor: todas as linhas de todas as pessoas são candidatas
+            for pessoa in self.estado:
+                self._filtrar(resultado, pessoa, self.valores[pessoa], minimo, maximo, limite)
+            return resultado
+        chave = tuple(sorted(set(termos)))
+        candidatos = self.prefixos.get(chave)
+        if candidatos is None:
+            # A interseção começa pelo termo com menos linhas encontradas
+            por_termo = sorted((self._prefixo(termo) for termo in chave),
+                               key=lambda encontrados: sum(len(e[0]) for e in encontrados.values()))
+            candidatos = por_termo[0]
+            for encontrados in por_termo[1:]:
+                if not candidatos:
+                    break
+                candidatos = self._intersecao(candidatos, encontrados)
+            self.prefixos[chave] = candidatos
+        for pessoa, entrada in candidatos.items():
+            if filtrar:
+                self._filtrar(resultado, pessoa, entrada, minimo, maximo, limite)
+                continue
+            soma = entrada[1]
+            if soma is None:
+                soma = entrada[1] = sum(map(pessoa.centavos.__getitem__, entrada[0]))
+            self._acrescentar(resultado, pessoa, entrada[0], len(entrada[0]), soma, limite)
+        return resultado
+
+    @staticmethod
+    def _acrescentar(resultado, pessoa, indices, quantidade, soma, limite):
+        # Soma a pessoa ao resultado; só as primeiras `limite` linhas são montadas para exibição
+        resultado.por_pessoa[pessoa.nome] = [quantidade, soma]
+        resultado.quantidade += quantidade
+        resultado.centavos += soma
+        faltam = limite - len(resultado.linhas)
+        if faltam > 0:
+            linhas = pessoa.linhas
+            centavos = pessoa.centavos
+            resultado.linhas.extend((pessoa, i, linhas[i], centavos[i]) for i in indices[:faltam])
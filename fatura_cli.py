@@ -0,0 +1,71 @@
+"""Processamento de faturas em lote, sem interface gráfica.
+
+Exemplo:
+    python fatura_cli.py extrato_jan.txt extrato_fev.txt --pessoa Maria \\
+        --base familia.json --json familia.json --txt relatorio.txt
+"""
+import argparse
+import os
+import sys
+
+from fatura_engine import Pessoa, Pessoas, carregar_arquivo, salvar_arquivo, exportar_relatorio
+from fatura_importadores import FORMATOS, importar_arquivo
+from fatura_exportacao import EXPORTADORES, exportar, exportar_por_pessoa
+
+
+def criar_parser():
+    parser = argparse.ArgumentParser(description="Calculadora de Faturas - processamento em lote")
+    parser.add_argument("arquivos", nargs="+", help="arquivos de fatura (texto com um item por linha, CSV ou OFX/QFX)")
+    parser.add_argument("-f", "--formato", choices=FORMATOS,
+                        help="formato dos arquivos (padrão: detectado pela extensão)")
+    parser.add_argument("-p", "--pessoa", required=True, help="nome da pessoa dona das faturas")
+    parser.add_argument("-b", "--base", help="arquivo JSON existente com as demais pessoas")
+    parser.add_argument("-j", "--json", help="arquivo JSON de saída")
+    parser.add_argument("-t", "--txt", help="relatório TXT de saída")
+    parser.add_argument("-e", "--exportar", action="append", default=[],
+                        help="exporta para este arquivo (TXT, CSV ou JSON Lines, pela extensão); pode repetir")
+    parser.add_argument("--por-pessoa", metavar="PASTA", help="exporta um arquivo por pessoa nesta pasta")
+    parser.add_argument("--formato-por-pessoa", choices=EXPORTADORES, default="txt",
+                        help="formato dos arquivos de --por-pessoa (padrão: txt)")
+    parser.add_argument("-a", "--acrescentar", action="store_true",
+                        help="mantém as despesas já existentes da pessoa em vez de redefini-las")
+    return parser
+
+
+def main(argv=None):
+    args = criar_parser().parse_args(argv)
+    nome_pessoa = args.pessoa.strip()
+    if not nome_pessoa:
+        print("Erro: nome da pessoa inválido.", file=sys.stderr)
+        return 2
+
+    pessoas = Pessoas()
+    if args.base and os.path.exists(args.base):
+        pessoas, _ = carregar_arquivo(args.base)
+
+    # Mesma regra de processar_faturas: reprocessar uma pessoa redefine as suas faturas
+    if nome_pessoa not in pessoas:
+        pessoas[nome_pessoa] = Pessoa(nome_pessoa)
+    elif not args.acrescentar:
+        pessoas[nome_pessoa].limpar_despesas()
+    pessoa = pessoas[nome_pessoa]
+
+    total_processado = 0
+    for caminho in args.arquivos:
+        total_processado += importar_arquivo(caminho, pessoa, args.formato)[1]
+
+    if args.json:
+        salvar_arquivo(args.json, pessoas)
+    if args.txt:
+        exportar_relatorio(args.txt, pessoas)
+    for destino in args.exportar:
+        exportar(destino, pessoas)
+    if args.por_pessoa:
+        exportar_por_pessoa(args.por_pessoa, pessoas, args.formato_por_pessoa)
+
+    print(f"{nome_pessoa}: {len(args.arquivos)} arquivo(s), R$ {total_processado / 100:.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+"""Conversão de arquivos antigos para o formato atual.
+
+Lê arquivos salvos pela v2.0 (Calculadora de Fatura.py, despesas com
+"descricao"/"valor" e lista "historico") ou pela v2.1 sem índice e grava no
+formato indexado atual. Uma pasta inteira é convertida em paralelo, um
+processo por núcleo.
+
+Exemplo:
+    python fatura_conversao.py arquivo_2019/ convertidos/ --extensao .json.gz
+"""
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from fatura_engine import carregar_arquivo, salvar_arquivo
+
+
+EXTENSOES_ORIGEM = (".json", ".json.gz", ".json.xz")
+
+
+def converter_arquivo(origem, destino):
+    # Retorna a quantidade de pessoas convertidas
+    pessoas, _ = carregar_arquivo(origem)
+    salvar_arquivo(destino, pessoas)
+    return len(pessoas)
+
+
+def _converter(origem, destino):
+    # Executado nos processos de trabalho: um arquivo com problema não interrompe os demais
+    try:
+        return converter_arquivo(origem, destino), None
+    except Exception as e:
+        return 0, str(e)
+
+
+def converter_pasta(pasta_origem, pasta_destino, extensao=".json", processos=None):
+    # Converte os arquivos da pasta para pasta_destino (mesmo nome, com a extensão escolhida).
+    # Retorna [(nome do arquivo, pessoas convertidas, erro ou None)] em ordem alfabética.
+    if os.path.abspath(pasta_origem) == os.path.abspath(pasta_destino):
+        raise ValueError("A pasta de destino deve ser diferente da pasta de origem.")
+    os.makedirs(pasta_destino, exist_ok=True)
+    tarefas = []
+    for nome in sorted(os.listdir(pasta_origem)):
+        sufixo = next((s for s in EXTENSOES_ORIGEM if nome.lower().endswith(s)), None)
+        if sufixo is None:
+            continue
+        tarefas.append((nome, os.path.join(pasta_origem, nome),
+                        os.path.join(pasta_destino, nome[:-len(sufixo)] + extensao)))
+    if not tarefas:
+        return []
+    processos = min(processos or os.cpu_count() or 1, len(tarefas))
+    if processos <= 1:
+        resultados = [_converter(origem, destino) for _, origem, destino in tarefas]
+    else:
+        with ProcessPoolExecutor(max_workers=processos) as executor:
+            resultados = list(executor.map(_converter, [t[1] for t in tarefas], [t[2] for t in tarefas]))
+    return [(nome, pessoas, erro) for (nome, _, _), (pessoas, erro) in zip(tarefas, resultados)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Calculadora de Faturas - conversão de arquivos antigos")
+    parser.add_argument("origem", help="pasta com os arquivos antigos")
+    parser.add_argument("destino", help="pasta onde os arquivos convertidos serão gravados")
+    parser.add_argument("-e", "--extensao", default=".json", choices=(".json", ".json.gz", ".json.xz"),
+                        help="extensão (e compressão) dos arquivos convertidos")
+    parser.add_argument("-p", "--processos", type=int, help="processos em paralelo (padrão: um por núcleo)")
+    args = parser.parse_args(argv)
+
+    resultados = converter_pasta(args.origem, args.destino, args.extensao, args.processos)
+    falhas = 0
+    for nome, pessoas, erro in resultados:
+        if erro:
+            falhas += 1
+            print(f"{nome}: erro - {erro}", file=sys.stderr)
+        else:
+            print(f"{nome}: {pessoas} pessoa(s)")
+    print(f"{len(resultados) - falhas} de {len(resultados)} arquivo(s) convertido(s) para {args.destino}")
+    return 1 if falhas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
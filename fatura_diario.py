@@ -0,0 +1,180 @@
+"""Diário de operações (append-only) gravado ao lado do arquivo aberto.
+
+Cada alteração feita na interface é registrada como uma linha JSON em
+"<arquivo>.diario", com um número de sequência ("seq") que só cresce. O diário
+é sincronizado em disco (fsync) em lotes e compactado quando um salvamento
+completo grava um novo instantâneo do arquivo.
+
+O instantâneo guarda o número da última operação que ele já inclui (a marca,
+veja salvar_arquivo/marca_do_diario). Ao abrir um arquivo, só as operações do
+diário depois da marca são reaplicadas: se o programa cair entre a troca do
+arquivo e a compactação do diário, as operações já gravadas não são aplicadas
+de novo (importar, por exemplo, não é idempotente).
+"""
+import json
+import os
+
+from fatura_engine import Pessoa, processar_linhas_centavos
+
+
+EXTENSAO_DIARIO = ".diario"
+
+
+def caminho_diario(arquivo):
+    return arquivo + EXTENSAO_DIARIO
+
+
+def _acrescentar(pessoas, ordem, nome, linhas):
+    if nome not in pessoas:
+        pessoas[nome] = Pessoa(nome)
+        ordem.append(nome)
+    processar_linhas_centavos(pessoas[nome], linhas)
+
+
+def aplicar_operacao(pessoas, ordem, operacao):
+    # Aplica uma operação registrada sobre pessoas/ordem (alterados no lugar).
+    # Operações que não fazem mais sentido (pessoa inexistente etc.) são ignoradas.
+    tipo = operacao["op"]
+    nome = operacao.get("pessoa")
+    if tipo == "processar":
+        if nome not in pessoas:
+            pessoas[nome] = Pessoa(nome)
+            ordem.append(nome)
+        else:
+            pessoas[nome].limpar_despesas()
+        processar_linhas_centavos(pessoas[nome], operacao["linhas"])
+    elif tipo == "importar":
+        # Extrato importado: as linhas são acrescentadas às já existentes
+        _acrescentar(pessoas, ordem, nome, operacao["linhas"])
+    elif tipo == "importar_pasta":
+        # Vários extratos de uma vez: {pessoa: linhas}
+        for nome, linhas in operacao["pessoas"].items():
+            _acrescentar(pessoas, ordem, nome, linhas)
+    elif tipo == "adicionar_pessoa":
+        if nome not in pessoas:
+            pessoas[nome] = Pessoa(nome)
+            ordem.append(nome)
+    elif tipo == "deletar_pessoa":
+        pessoas.pop(nome, None)
+        if nome in ordem:
+            ordem.remove(nome)
+    elif tipo == "pagamento":
+        if nome in pessoas:
+            pessoas[nome].pago = operacao["pago"]
+    elif tipo == "renomear":
+        novo_nome = operacao["novo_nome"]
+        if nome in pessoas and novo_nome not in pessoas:
+            pessoa = pessoas.pop(nome)
+            pessoa.nome = novo_nome
+            pessoas[novo_nome] = pessoa
+            if nome in ordem:
+                ordem[ordem.index(nome)] = novo_nome
+    elif tipo == "ordem":
+        ordem[:] = operacao["ordem"]
+
+
+def _ler(caminho):
+    # Retorna (operações, bytes válidos). Uma última linha incompleta (queda no meio
+    # da gravação) é descartada.
+    operacoes = []
+    validos = 0
+    if not os.path.exists(caminho):
+        return operacoes, validos
+    with open(caminho, 'rb') as f:
+        for linha in f:
+            if not linha.endswith(b"\n"):
+                break
+            try:
+                operacoes.append(json.loads(linha.decode('utf-8')))
+            except ValueError:
+                break
+            validos += len(linha)
+    return operacoes, validos
+
+
+def ler_diario(caminho):
+    return _ler(caminho)[0]
+
+
+def _ja_incluida(operacao, marca):
+    # Operações de diários sem "seq" (versões anteriores) são sempre reaplicadas
+    seq = operacao.get("seq")
+    return seq is not None and seq <= marca
+
+
+def reaplicar_diario(arquivo, pessoas, ordem, marca=0):
+    # Reaplica sobre os dados recém-carregados as operações do diário posteriores à marca do
+    # arquivo; retorna quantas foram aplicadas
+    aplicadas = 0
+    for operacao in ler_diario(caminho_diario(arquivo)):
+        if not _ja_incluida(operacao, marca):
+            aplicar_operacao(pessoas, ordem, operacao)
+            aplicadas += 1
+    return aplicadas
+
+
+class Diario:
+    def __init__(self, arquivo, novo=False, lote=50, marca=0):
+        # novo=True descarta um diário antigo (o arquivo acabou de ser gravado por inteiro);
+        # marca é a do arquivo aberto, para a numeração continuar depois dela
+        self.caminho = caminho_diario(arquivo)
+        # Quantas operações podem ficar sem fsync antes de forçar a sincronização
+        self.lote = lote
+        self.pendentes = 0
+        if novo:
+            operacoes, validos = [], 0
+        else:
+            operacoes, validos = _ler(self.caminho)
+        # Operações registradas desde o último instantâneo (salvamento completo)
+        self.operacoes = len(operacoes)
+        # Número da última operação registrada
+        self.seq = max([marca] + [operacao["seq"] for operacao in operacoes if "seq" in operacao])
+        self.arquivo = open(self.caminho, 'ab')
+        # Remove uma linha incompleta no final, para não emendar novas operações nela
+        self.arquivo.truncate(validos)
+        self.arquivo.seek(validos)
+
+    def registrar(self, operacao):
+        self.seq += 1
+        linha = json.dumps(dict(operacao, seq=self.seq), ensure_ascii=False) + "\n"
+        self.arquivo.write(linha.encode('utf-8'))
+        self.operacoes += 1
+        self.pendentes += 1
+        if self.pendentes >= self.lote:
+            self.sincronizar()
+
+    def sincronizar(self):
+        if not self.pendentes:
+            return
+        self.arquivo.flush()
+        os.fsync(self.arquivo.fileno())
+        self.pendentes = 0
+
+    def posicao(self):
+        # Posição atual do diário; usada para marcar o ponto de um instantâneo. O último elemento
+        # (seq) é a marca gravada no instantâneo
+        self.arquivo.flush()
+        return self.arquivo.tell(), self.operacoes, self.seq
+
+    def compactar(self, posicao):
+        # Depois que um instantâneo com os dados até `posicao` foi gravado, descarta essas
+        # operações e mantém só as registradas depois (durante o salvamento)
+        deslocamento, operacoes, _ = posicao
+        self.arquivo.flush()
+        with open(self.caminho, 'rb') as f:
+            f.seek(deslocamento)
+            restante = f.read()
+        temporario = self.caminho + ".tmp"
+        with open(temporario, 'wb') as f:
+            f.write(restante)
+            f.flush()
+            os.fsync(f.fileno())
+        self.arquivo.close()
+        os.replace(temporario, self.caminho)
+        self.arquivo = open(self.caminho, 'ab')
+        self.operacoes -= operacoes
+        self.pendentes = 0
+
+    def fechar(self):
+        self.sincronizar()
+        self.arquivo.close()
@@ -0,0 +1,1046 @@
+"""Motor de cálculo das faturas (sem dependência de tkinter).
+
+Concentra o modelo (Pessoa), o parser de linhas, os totais e a leitura/gravação
+dos arquivos JSON, para que possa ser usado tanto pela interface gráfica
+(Teste V08.py) quanto por scripts e pelo modo em lote (fatura_cli.py).
+"""
+import codecs
+import gzip
+import json
+import lzma
+import os
+import re
+import sys
+import threading
+import zlib
+from array import array
+from datetime import datetime
+
+
+# Caracteres aceitos na parte inteira de um valor ("1.234" -> dígitos e separador de milhar)
+_DIGITOS = "0123456789"
+_PARTE_INTEIRA = "0123456789."
+# Finais do texto antes do número que indicam um valor negativo
+_FINAIS_COM_SINAL = ("-", "-R$", "-R$ ")
+# Marcadores depois do valor, já em maiúsculas -> se é crédito (negativo) ou débito
+_MARCADORES = {"CR": True, "C": True, "DB": False, "D": False}
+# Espaços entre os valores de um documento JSON
+_ESPACOS = re.compile(r"[ \t\r\n]*")
+# Resto de um número JSON que termina junto com o texto lido até agora
+_FIM_DE_NUMERO = re.compile(r"[0-9.eE+-]*\Z")
+# Tamanho dos blocos lidos/gravados por vez, para reportar o progresso em bytes
+TAMANHO_BLOCO = 1 << 20
+# Versão do formato com cabeçalho de resumo e seções por pessoa (veja salvar_arquivo).
+# Formato 2: seções {"despesas": [{"raw_line", "valor"}]}; formato 3: seções compactas
+# {"linhas": [...], "centavos": [...]}, sem espaços. Os dois são lidos.
+FORMATO_INDEXADO = 3
+_INICIO_INDEXADO = b'{"formato"'
+_FIM_CABECALHO = b',"pessoas":[\n'
+# Compressão escolhida pela extensão (.json.gz, .json.xz). O cabeçalho é um membro gzip/stream xz
+# e as seções vêm agrupadas em quadros de pelo menos QUADRO_MINIMO bytes (descomprimidos), um
+# membro cada: o arquivo continua válido para gzip/xz, a compressão aproveita a repetição entre
+# pessoas e uma seção é lida descomprimindo só o seu quadro
+COMPRESSOES = {".gz": "gzip", ".xz": "xz"}
+QUADRO_MINIMO = 1 << 18
+_ASSINATURAS = ((b"\x1f\x8b", "gzip"), (b"\xfd7zXZ\x00", "xz"))
+
+
+class OperacaoCancelada(Exception):
+    pass
+
+
+def compressao_do_arquivo(filename):
+    return COMPRESSOES.get(os.path.splitext(filename)[1].lower())
+
+
+def comprimir(dados, compressao):
+    if compressao == "gzip":
+        return gzip.compress(dados, compresslevel=6, mtime=0)
+    if compressao == "xz":
+        return lzma.compress(dados, preset=1)
+    return dados
+
+
+def descomprimir(dados, compressao):
+    if compressao == "gzip":
+        return gzip.decompress(dados)
+    if compressao == "xz":
+        return lzma.decompress(dados)
+    return dados
+
+
+def _descompressor(compressao):
+    # Descompressor incremental que para no fim do primeiro membro/stream (o resto fica em unused_data)
+    return zlib.decompressobj(wbits=31) if compressao == "gzip" else lzma.LZMADecompressor()
+
+
+class FonteSecoes:
+    # Arquivo aberto no formato indexado: as despesas de cada pessoa ficam numa seção lida só
+    # quando a pessoa é usada. secoes[i] = (quadro, inicio, tamanho): sem compressão o quadro é
+    # None e (inicio, tamanho) são bytes a partir de base; comprimido, (inicio, tamanho) são bytes
+    # dentro do quadro descomprimido e quadros[q] = (inicio, tamanho a partir de base, membros),
+    # com membros os índices das seções do quadro em ordem (None se não forem conhecidos)
+    def __init__(self, caminho, base, secoes, compressao=None, quadros=()):
+        self.caminho = caminho
+        self.base = base
+        self.secoes = secoes
+        self.compressao = compressao
+        self.quadros = list(quadros)
+        # Último quadro descomprimido (pessoas vizinhas costumam ser lidas em sequência)
+        self._quadro = (None, b"")
+        # Serializa as leituras com a troca do arquivo num salvamento (veja salvar_arquivo)
+        self.trava = threading.Lock()
+
+    def _ler(self, inicio, tamanho):
+        with open(self.caminho, 'rb') as f:
+            f.seek(self.base + inicio)
+            return f.read(tamanho)
+
+    def ler_quadro(self, quadro):
+        # Bytes comprimidos do quadro; chamar com a trava adquirida
+        inicio, tamanho, _ = self.quadros[quadro]
+        return self._ler(inicio, tamanho)
+
+    def ler_secao(self, indice):
+        # Bytes da seção, já descomprimidos; chamar com a trava adquirida
+        quadro, inicio, tamanho = self.secoes[indice]
+        if quadro is None:
+            return self._ler(inicio, tamanho)
+        if self._quadro[0] != quadro:
+            self._quadro = (quadro, descomprimir(self.ler_quadro(quadro), self.compressao))
+        dados = self._quadro[1]
+        return dados if tamanho is None else dados[inicio:inicio + tamanho]
+
+    def reposicionar(self, base, compressao, quadros):
+        # O arquivo foi substituído por um salvamento; chamar com a trava adquirida
+        self.base = base
+        self.compressao = compressao
+        self.quadros = quadros
+        self._quadro = (None, b"")
+
+
+def para_centavos(valor):
+    # Converte um valor em reais (float) para centavos inteiros
+    return int(round(valor * 100))
+
+
+def formatar_centavos(centavos):
+    # 123456 -> "1.234,56" (formato aceito por extrair_centavos)
+    reais, resto = divmod(abs(centavos), 100)
+    texto = f"{reais:,}".replace(",", ".") + f",{resto:02d}"
+    return "-" + texto if centavos < 0 else texto
+
+
+class Pessoa:
+    def __init__(self, nome):
+        self.nome = nome
+        # Armazenamento compacto: os valores ficam em centavos num array tipado e as linhas
+        # digitadas numa lista paralela (strings internadas, então linhas repetidas são compartilhadas)
+        self._linhas = []
+        self._centavos = array("q")
+        # Total acumulado em centavos, atualizado a cada inclusão/substituição/remoção
+        self._total = 0
+        # Incrementada quando despesas já existentes mudam (inclusões no final não contam);
+        # permite que os armazenamentos gravem só o que mudou desde o último salvamento
+        self.revisao = 0
+        # Conjunto de Pessoas ao qual esta pessoa pertence (mantém o total geral)
+        self._grupo = None
+        self.pago = 0.0
+        # Aberta de um arquivo indexado: despesas ainda não lidas (FonteSecoes e índice da seção)
+        self._fonte = None
+        self._secao = None
+
+    @classmethod
+    def pendente(cls, nome, total_centavos, pago, fonte, secao):
+        # Pessoa com total e pago do cabeçalho; as despesas são lidas da fonte no primeiro uso
+        pessoa = cls(nome)
+        pessoa._total = total_centavos
+        pessoa.pago = pago
+        pessoa._fonte = fonte
+        pessoa._secao = secao
+        return pessoa
+
+    def carregada(self):
+        return self._fonte is None
+
+    def _carregar(self):
+        fonte = self._fonte
+        if fonte is None:
+            return
+        with fonte.trava:
+            if self._fonte is None:
+                return
+            dados = fonte.ler_secao(self._secao)
+            self._linhas, self._centavos = _listas_da_secao(json.loads(dados.decode('utf-8')))
+            self._fonte = None
+
+    def _secao_json(self):
+        # Seção desta pessoa no formato indexado (sem compressão); se as despesas não foram lidas
+        # (e portanto não mudaram), os bytes vêm do arquivo de origem sem decodificar o JSON
+        fonte = self._fonte
+        if fonte is not None:
+            with fonte.trava:
+                if self._fonte is not None:
+                    return fonte.ler_secao(self._secao)
+        return json.dumps({"linhas": self._linhas, "centavos": self._centavos.tolist()},
+                          ensure_ascii=False, separators=(",", ":")).encode('utf-8')
+
+    @property
+    def linhas(self):
+        # Somente leitura: alterações devem passar pelos métodos abaixo para manter o total
+        self._carregar()
+        return self._linhas
+
+    @property
+    def centavos(self):
+        # Somente leitura: valores em centavos, paralelos a linhas
+        self._carregar()
+        return self._centavos
+
+    @property
+    def despesas(self):
+        # Visão no formato antigo ({"raw_line", "valor"}), gerada sob demanda
+        self._carregar()
+        return [{"raw_line": linha, "valor": centavos / 100}
+                for linha, centavos in zip(self._linhas, self._centavos)]
+
+    @despesas.setter
+    def despesas(self, novas_despesas):
+        self._fonte = None
+        self._linhas = []
+        self._centavos = array("q")
+        for d in novas_despesas:
+            self._linhas.append(sys.intern(d["raw_line"]))
+            self._centavos.append(para_centavos(d["valor"]))
+        self.revisao += 1
+        self._atualizar_total(sum(self._centavos))
+
+    def adicionar_despesa(self, raw_line, valor):
+        self.adicionar_despesa_centavos(raw_line, para_centavos(valor))
+
+    def adicionar_despesa_centavos(self, raw_line, centavos):
+        if self._fonte is not None:
+            self._carregar()
+        self._linhas.append(sys.intern(raw_line))
+        self._centavos.append(centavos)
+        self._atualizar_total(self._total + centavos)
+
+    def substituir_despesa(self, indice, raw_line, valor):
+        centavos = para_centavos(valor)
+        self._carregar()
+        antigo = self._centavos[indice]
+        self._linhas[indice] = sys.intern(raw_line)
+        self._centavos[indice] = centavos
+        self.revisao += 1
+        self._atualizar_total(self._total - antigo + centavos)
+
+    def remover_despesa(self, indice):
+        self._carregar()
+        linha = self._linhas.pop(indice)
+        centavos = self._centavos.pop(indice)
+        self.revisao += 1
+        self._atualizar_total(self._total - centavos)
+        return {"raw_line": linha, "valor": centavos / 100}
+
+    def limpar_despesas(self):
+        self._fonte = None
+        self._linhas = []
+        self._centavos = array("q")
+        self.revisao += 1
+        self._atualizar_total(0)
+
+    def _atualizar_total(self, novo_total):
+        delta = novo_total - self._total
+        self._total = novo_total
+        if self._grupo is not None:
+            self._grupo._ajustar_total(delta)
+
+    def total_centavos(self):
+        return self._total
+
+    def total(self):
+        return self._total / 100
+
+    def copiar(self):
+        # Cópia independente (usada para salvar em segundo plano enquanto a edição continua)
+        if self._fonte is not None:
+            # Ainda não lida: a cópia também lê da mesma fonte quando precisar
+            return Pessoa.pendente(self.nome, self._total, self.pago, self._fonte, self._secao)
+        copia = Pessoa(self.nome)
+        copia._linhas = list(self._linhas)
+        copia._centavos = array("q", self._centavos)
+        copia._total = self._total
+        copia.pago = self.pago
+        return copia
+
+    def to_dict(self):
+        return {
+            "nome": self.nome,
+            "despesas": self.despesas,
+            "total": self.total(),
+            "pago": self.pago
+        }
+
+
+def _listas_da_secao(secao):
+    # (linhas, centavos) de uma seção no formato compacto ou no formato {"despesas": [...]}.
+    # O esquema é verificado em cada despesa: as da v2.0 ({"descricao", "valor"}, sem a linha
+    # original) viram "descrição valor", a mesma linha que o usuário tinha digitado.
+    if "linhas" in secao:
+        return [sys.intern(linha) for linha in secao["linhas"]], array("q", secao["centavos"])
+    linhas = []
+    centavos = array("q")
+    for d in secao.get("despesas", []):
+        valor = para_centavos(d["valor"])
+        linha = d.get("raw_line")
+        if linha is None:
+            linha = f"{d.get('descricao', '')} {formatar_centavos(valor)}".strip()
+        linhas.append(sys.intern(linha))
+        centavos.append(valor)
+    return linhas, centavos
+
+
+class Pessoas(dict):
+    # Dicionário nome -> Pessoa que mantém o total geral em cache.
+    # Cada Pessoa avisa o grupo (em centavos) quando o seu total muda, então total_geral() é O(1).
+    # Todo método que inclui ou retira pessoas passa por __setitem__/_desvincular; uma Pessoa só
+    # avisa um grupo, por isso copy() copia as pessoas também.
+
+    def __init__(self, *args, **kwargs):
+        super().__init__()
+        self._total = 0
+        for nome, pessoa in dict(*args, **kwargs).items():
+            self[nome] = pessoa
+
+    def _ajustar_total(self, delta):
+        self._total += delta
+
+    def _vincular(self, pessoa):
+        pessoa._grupo = self
+        self._total += pessoa.total_centavos()
+
+    def _desvincular(self, pessoa):
+        pessoa._grupo = None
+        self._total -= pessoa.total_centavos()
+
+    def __setitem__(self, nome, pessoa):
+        anterior = self.get(nome)
+        if anterior is pessoa:
+            return
+        super().__setitem__(nome, pessoa)
+        if anterior is not None:
+            self._desvincular(anterior)
+        self._vincular(pessoa)
+
+    def __delitem__(self, nome):
+        pessoa = self[nome]
+        super().__delitem__(nome)
+        self._desvincular(pessoa)
+
+    def pop(self, nome, *default):
+        if nome not in self:
+            return super().pop(nome, *default)
+        pessoa = super().pop(nome)
+        self._desvincular(pessoa)
+        return pessoa
+
+    def popitem(self):
+        nome, pessoa = super().popitem()
+        self._desvincular(pessoa)
+        return nome, pessoa
+
+    def setdefault(self, nome, pessoa=None):
+        if nome not in self:
+            self[nome] = pessoa
+        return self[nome]
+
+    def update(self, *args, **kwargs):
+        for nome, pessoa in dict(*args, **kwargs).items():
+            self[nome] = pessoa
+
+    def __ior__(self, outras):
+        self.update(outras)
+        return self
+
+    def copy(self):
+        return Pessoas((nome, pessoa.copiar()) for nome, pessoa in self.items())
+
+    def clear(self):
+        for pessoa in self.values():
+            pessoa._grupo = None
+        super().clear()
+        self._total = 0
+
+    def total_centavos(self):
+        return self._total
+
+    def total_geral(self):
+        return self._total / 100
+
+
+def _eh_parcela(token):
+    # Marcador de parcela como "03/10" ou "3/12"
+    atual, barra, total = token.partition("/")
+    return (barra and 0 < len(atual) <= 2 and 0 < len(total) <= 2
+            and atual.strip(_DIGITOS) == "" and total.strip(_DIGITOS) == "")
+
+
+def _remover_sufixos(corpo):
+    # Remove o que pode vir depois do valor, em qualquer ordem e cada um no máximo uma vez: parcela
+    # ("150,00 03/10"), crédito ("12,50 C", "12,50CR"), débito ("12,50 D", "12,50DB") e sinal no
+    # final ("10,00-"). Retorna (corpo sem os sufixos, se é negativo: crédito ou sinal)
+    negativo = parcela = marcador = sinal = False
+    # Para quando o texto termina nos centavos (",dd") ou quando nada mais sai
+    while corpo[-3:-2] != ",":
+        if "/" in corpo[-3:]:
+            resto, espaco, ultimo = corpo.rpartition(" ")
+            if parcela or not espaco or not _eh_parcela(ultimo):
+                break
+            parcela = True
+            corpo = resto.rstrip()
+            continue
+        final = corpo[-2:].upper()
+        credito = _MARCADORES.get(final)
+        tamanho = 2
+        if credito is None:
+            credito = _MARCADORES.get(final[-1:])
+            tamanho = 1
+        if credito is not None and not marcador:
+            marcador = True
+            negativo = negativo or credito
+            corpo = corpo[:-tamanho].rstrip()
+        elif final[-1:] == "-" and not sinal:
+            sinal = negativo = True
+            corpo = corpo[:-1].rstrip()
+        else:
+            break
+    return corpo, negativo
+
+
+def extrair_centavos(linha):
+    # Lê o valor no final da linha, de trás para frente, e o retorna em centavos inteiros
+    # (None se a linha não terminar num valor). Aceita "1.234,56", prefixo "R$", valores
+    # negativos ("-12,50" ou "12,50-"), crédito ("12,50 C" ou "12,50CR"), débito ("12,50 D") e
+    # parcela depois do valor ("150,00 03/10"), em qualquer ordem.
+    # Usa só métodos de str (rpartition/rstrip com tabela de caracteres) para não varrer a linha inteira.
+    corpo = linha.rstrip()
+    negativo = False
+    inicio, virgula, decimal = corpo.rpartition(",")
+    if not virgula or len(decimal) != 2:
+        corpo, negativo = _remover_sufixos(corpo)
+        inicio, virgula, decimal = corpo.rpartition(",")
+        if not virgula or len(decimal) != 2:
+            return None
+    if not decimal.isdecimal():
+        return None
+    antes = inicio.rstrip(_PARTE_INTEIRA)
+    tamanho = len(antes)
+    if tamanho == len(inicio):
+        return None
+    centavos = int(inicio[tamanho:].replace(".", "") + decimal)
+    if antes.endswith(_FINAIS_COM_SINAL):
+        # Sinal colado ao número ("-12,50", "R$ -12,50") ou ao prefixo ("-R$ 12,50")
+        sinal = antes.rfind("-")
+        negativo = negativo or antes[sinal - 1:sinal] in ("", " ", "\t", "$")
+    return -centavos if negativo else centavos
+
+
+def extrair_valor(linha):
+    # Retorna o valor numérico no final da linha, ou None se a linha não tiver valor
+    centavos = extrair_centavos(linha)
+    return None if centavos is None else centavos / 100
+
+
+def centavos_do_campo(texto):
+    # Valor de um campo isolado ("1.234,56", "1,234.56", "-12.5", "10,00-", "R$ 10,00", "(10,00)") em centavos;
+    # None se o campo não for um valor
+    texto = texto.strip().replace("R$", "").replace(" ", "")
+    negativo = False
+    if texto.startswith("(") and texto.endswith(")"):
+        negativo, texto = True, texto[1:-1]
+    if texto.startswith("-"):
+        negativo, texto = not negativo, texto[1:]
+    elif texto.endswith("-"):
+        negativo, texto = not negativo, texto[:-1]
+    elif texto.startswith("+"):
+        texto = texto[1:]
+    if not texto or texto.strip("0123456789.,") or not texto.strip(".,"):
+        return None
+    virgula = texto.rfind(",")
+    ponto = texto.rfind(".")
+    separador = max(virgula, ponto)
+    # O separador decimal é o último quando os dois aparecem; quando só um aparece, é decimal
+    # se ocorre uma única vez e não é seguido de exatamente três dígitos ("1.234" é milhar)
+    if virgula >= 0 and ponto >= 0:
+        decimal = separador
+    elif separador >= 0 and texto.count(texto[separador]) == 1 and len(texto) - separador - 1 != 3:
+        decimal = separador
+    else:
+        decimal = -1
+    if decimal >= 0:
+        inteiro, fracao = texto[:decimal], texto[decimal + 1:]
+    else:
+        inteiro, fracao = texto, ""
+    inteiro = inteiro.replace(".", "").replace(",", "")
+    if fracao.strip("0123456789"):
+        return None
+    if len(fracao) <= 2:
+        centavos = int(inteiro or "0") * 100 + int(fracao.ljust(2, "0"))
+    else:
+        centavos = para_centavos(float(f"{inteiro or '0'}.{fracao}"))
+    return -centavos if negativo else centavos
+
+
+def analisar_linhas(linhas):
+    # Retorna [[linha, centavos], ...] das linhas com valor reconhecido; as demais são ignoradas
+    itens = []
+    for linha in linhas:
+        linha = linha.strip()
+        if not linha:
+            continue
+        centavos = extrair_centavos(linha)
+        if centavos is not None:
+            itens.append([linha, centavos])
+    return itens
+
+
+def processar_linhas_centavos(pessoa, itens):
+    # Adiciona à pessoa as linhas já analisadas; retorna o total processado em centavos
+    total_processado = 0
+    for linha, centavos in itens:
+        pessoa.adicionar_despesa_centavos(linha, centavos)
+        total_processado += centavos
+    return total_processado
+
+
+def processar_linhas(pessoa, linhas):
+    # Adiciona à pessoa as linhas com valor reconhecido; retorna o total processado
+    return processar_linhas_centavos(pessoa, analisar_linhas(linhas)) / 100
+
+
+class AnaliseIncremental:
+    # Cache por linha de um texto em edição: (linha sem espaços, centavos ou None se a linha não
+    # tem valor reconhecido), com o subtotal mantido a cada alteração. Só as linhas alteradas são analisadas.
+
+    def __init__(self):
+        # O texto sempre tem ao menos uma linha (vazia)
+        self.linhas = [("", None)]
+        self.centavos = 0
+
+    def substituir(self, inicio, quantidade, novas_linhas):
+        # Troca `quantidade` linhas a partir de `inicio` (base 0) por `novas_linhas`
+        for _, centavos in self.linhas[inicio:inicio + quantidade]:
+            if centavos is not None:
+                self.centavos -= centavos
+        novas = []
+        for linha in novas_linhas:
+            linha = linha.strip()
+            centavos = extrair_centavos(linha) if linha else None
+            if centavos is not None:
+                self.centavos += centavos
+            novas.append((linha, centavos))
+        self.linhas[inicio:inicio + quantidade] = novas
+        return novas
+
+    def itens(self):
+        # Mesmo formato de analisar_linhas
+        return [[linha, centavos] for linha, centavos in self.linhas if centavos is not None]
+
+
+def total_geral(pessoas):
+    if isinstance(pessoas, Pessoas):
+        return pessoas.total_geral()
+    return sum(p.total() for p in pessoas.values())
+
+
+def resumo_por_pessoa(pessoas):
+    # Texto exibido na área de resultados
+    if not pessoas:
+        return "Sem resultados."
+    partes = ["Resumo por pessoa:", "-" * 40]
+    partes.extend(f"{nome}: R$ {p.total():.2f}" for nome, p in pessoas.items())
+    partes.append("-" * 40)
+    partes.append(f"TOTAL GERAL: R$ {total_geral(pessoas):.2f}")
+    return "\n".join(partes)
+
+
+def verificar_cancelamento(cancelar):
+    if cancelar is not None and cancelar.is_set():
+        raise OperacaoCancelada()
+
+
+def pessoas_from_dict(data, cancelar=None):
+    # Reconstrói as pessoas a partir do conteúdo de um arquivo salvo.
+    # Retorna (pessoas, ordem), com a ordem em que aparecem no arquivo.
+    pessoas = Pessoas()
+    ordem = []
+    secoes = data.get("pessoas", [])
+    if "resumo" in data:
+        # Formato indexado lido por inteiro: nome e pago ficam no cabeçalho, as despesas nas seções
+        secoes = [dict(resumo, **secao) for resumo, secao in zip(data["resumo"], secoes)]
+    for pessoa_data in secoes:
+        verificar_cancelamento(cancelar)
+        _adicionar_registro(pessoas, ordem, pessoa_data)
+    return pessoas, ordem
+
+
+def _adicionar_registro(pessoas, ordem, pessoa_data):
+    # Registro de uma pessoa no esquema atual ou no da v2.0 (que não tem "pago")
+    nome = pessoa_data["nome"]
+    pessoa = Pessoa(nome)
+    linhas, centavos = _listas_da_secao(pessoa_data)
+    for linha, valor in zip(linhas, centavos):
+        pessoa.adicionar_despesa_centavos(linha, valor)
+    pessoa.pago = pessoa_data.get("pago", 0.0)
+    if nome not in pessoas:
+        ordem.append(nome)
+    pessoas[nome] = pessoa
+
+
+class _FluxoJSON:
+    # Percorre um documento JSON lido em blocos de texto, decodificando um valor por vez
+    # (raw_decode), para não precisar do arquivo inteiro nem da árvore inteira na memória.
+    # Um objeto/lista maior que o texto em memória (uma pessoa com muitas despesas) é lido
+    # item a item, sem decodificar de novo o que já foi lido a cada bloco acrescentado
+    def __init__(self, blocos):
+        self.blocos = iter(blocos)
+        self.texto = ""
+        self.pos = 0
+        self.decodificador = json.JSONDecoder()
+
+    def _completar(self):
+        bloco = next(self.blocos, None)
+        if bloco is None:
+            return False
+        self.texto = self.texto[self.pos:] + bloco
+        self.pos = 0
+        return True
+
+    def proximo(self):
+        # Próximo caractere que não é espaço, sem consumi-lo
+        while True:
+            self.pos = _ESPACOS.match(self.texto, self.pos).end()
+            if self.pos < len(self.texto):
+                return self.texto[self.pos]
+            if not self._completar():
+                raise ValueError("Arquivo JSON incompleto.")
+
+    def consumir(self, esperado):
+        if self.proximo() != esperado:
+            raise ValueError(f"Arquivo JSON inválido: esperado '{esperado}' na posição {self.pos}.")
+        self.pos += 1
+
+    def separador(self, fechamento):
+        # Consome "," (retorna True) ou o caractere de fechamento (retorna False)
+        if self.proximo() == ",":
+            self.pos += 1
+            return True
+        self.consumir(fechamento)
+        return False
+
+    def valor(self):
+        inicio = self.proximo()
+        while True:
+            try:
+                valor, fim = self.decodificador.raw_decode(self.texto, self.pos)
+            except json.JSONDecodeError:
+                if inicio in "{[":
+                    return self._valor_em_partes()
+                if not self._completar():
+                    raise
+                continue
+            # Um número no fim do bloco pode continuar no próximo ("12" + "3,45", "12." + "50")
+            if _FIM_DE_NUMERO.match(self.texto, fim) and self._completar():
+                continue
+            self.pos = fim
+            return valor
+
+    def _valor_em_partes(self):
+        # Objeto ou lista decodificado item a item; cada item que também não couber no texto em
+        # memória é dividido da mesma forma
+        if self.proximo() == "{":
+            self.consumir("{")
+            objeto = {}
+            if self.proximo() == "}":
+                self.consumir("}")
+                return objeto
+            while True:
+                chave = self.valor()
+                self.consumir(":")
+                objeto[chave] = self.valor()
+                if not self.separador("}"):
+                    return objeto
+        self.consumir("[")
+        lista = []
+        if self.proximo() == "]":
+            self.consumir("]")
+            return lista
+        while True:
+            lista.append(self.valor())
+            if not self.separador("]"):
+                return lista
+
+
+def _pessoas_em_fluxo(blocos, cancelar=None):
+    # Lê {"pessoas": [...], ...} decodificando uma pessoa por vez; chaves que o modelo atual
+    # não usa (como o "historico" da v2.0) são lidas e descartadas
+    fluxo = _FluxoJSON(blocos)
+    pessoas = Pessoas()
+    ordem = []
+    resumo = None
+    fluxo.consumir("{")
+    if fluxo.proximo() == "}":
+        return pessoas, ordem
+    while True:
+        chave = fluxo.valor()
+        fluxo.consumir(":")
+        if chave == "pessoas" and fluxo.proximo() == "[":
+            fluxo.consumir("[")
+            indice = 0
+            if fluxo.proximo() != "]":
+                while True:
+                    verificar_cancelamento(cancelar)
+                    registro = fluxo.valor()
+                    if resumo is not None:
+                        registro = dict(resumo[indice], **registro)
+                    _adicionar_registro(pessoas, ordem, registro)
+                    indice += 1
+                    if not fluxo.separador("]"):
+                        break
+            else:
+                fluxo.consumir("]")
+        elif chave == "resumo":
+            resumo = fluxo.valor()
+        else:
+            fluxo.valor()
+        if not fluxo.separador("}"):
+            return pessoas, ordem
+
+
+def pessoas_to_dict(pessoas):
+    return {
+        "pessoas": [p.to_dict() for p in pessoas.values()],
+        "data_salvamento": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    }
+
+
+def copiar_pessoas(pessoas):
+    return Pessoas((nome, p.copiar()) for nome, p in pessoas.items())
+
+
+def _mesmo_arquivo(a, b):
+    try:
+        return os.path.samefile(a, b)
+    except OSError:
+        return False
+
+
+def _dados_do_cabecalho(cabecalho):
+    # Cabeçalho do formato indexado sem a lista de seções que ele abre ("pessoas":[)
+    fim = cabecalho.rindex(b'"pessoas"')
+    return json.loads(cabecalho[:fim].rstrip(b", ") + b"}")
+
+
+def _abrir_indexado(filename, cabecalho, base, compressao):
+    # Lê só o cabeçalho: cada pessoa já tem total e pago, e as despesas ficam pendentes na fonte
+    dados = _dados_do_cabecalho(cabecalho)
+    resumo = dados["resumo"]
+    quadros = []
+    if compressao is None:
+        secoes = [(None, r["inicio"], r["tamanho"]) for r in resumo]
+    elif "quadros" in dados:
+        secoes = [(r["quadro"], r["inicio"], r["tamanho"]) for r in resumo]
+        membros = [[] for _ in dados["quadros"]]
+        for indice, secao in enumerate(secoes):
+            membros[secao[0]].append(indice)
+        quadros = [(inicio, tamanho, tuple(m)) for (inicio, tamanho), m in zip(dados["quadros"], membros)]
+    else:
+        # Gravado com um membro por seção (sem quadros): cada seção é um quadro inteiro
+        secoes = [(indice, 0, None) for indice in range(len(resumo))]
+        quadros = [(r["inicio"], r["tamanho"], None) for r in resumo]
+    fonte = FonteSecoes(filename, base, secoes, compressao, quadros)
+    pessoas = Pessoas()
+    ordem = []
+    for indice, r in enumerate(resumo):
+        pessoas[r["nome"]] = Pessoa.pendente(r["nome"], r["total_centavos"], r.get("pago", 0.0), fonte, indice)
+        ordem.append(r["nome"])
+    return pessoas, ordem
+
+
+def _ler_cabecalho_comprimido(f, compressao):
+    # Descomprime só o primeiro membro; retorna (texto, bytes comprimidos que ele ocupa), ou
+    # None se o arquivo não estiver no formato indexado (arquivo antigo comprimido por inteiro)
+    descompressor = _descompressor(compressao)
+    texto = b""
+    lidos = 0
+    while not descompressor.eof:
+        bloco = f.read(1 << 16)
+        if not bloco:
+            break
+        lidos += len(bloco)
+        texto += descompressor.decompress(bloco)
+        if len(texto) >= len(_INICIO_INDEXADO) and not texto.startswith(_INICIO_INDEXADO):
+            return None
+    if not descompressor.eof:
+        return None
+    return texto, lidos - len(descompressor.unused_data)
+
+
+def _ler_cabecalho(f):
+    # Retorna (cabeçalho, bytes que ele ocupa no arquivo, compressão); cabeçalho None se o arquivo
+    # não estiver no formato indexado. Deixa f no início do arquivo nesse caso.
+    inicio = f.read(16)
+    f.seek(0)
+    compressao = next((nome for assinatura, nome in _ASSINATURAS if inicio.startswith(assinatura)), None)
+    if compressao is None and inicio.startswith(_INICIO_INDEXADO):
+        cabecalho = f.readline()
+        return cabecalho, len(cabecalho), None
+    if compressao is not None:
+        lido = _ler_cabecalho_comprimido(f, compressao)
+        if lido is not None:
+            return lido[0], lido[1], compressao
+        f.seek(0)
+    return None, 0, compressao
+
+
+def carregar_arquivo(filename, progresso=None, cancelar=None):
+    # progresso(bytes_lidos, bytes_totais) é chamado a cada bloco lido;
+    # cancelar é um threading.Event que interrompe a carga com OperacaoCancelada.
+    # No formato indexado só o cabeçalho é lido aqui. Arquivos .gz/.xz são reconhecidos pelo conteúdo.
+    tamanho = os.path.getsize(filename)
+    with open(filename, 'rb') as f:
+        cabecalho, base, compressao = _ler_cabecalho(f)
+        if cabecalho is not None:
+            if progresso:
+                progresso(tamanho, tamanho)
+            return _abrir_indexado(filename, cabecalho, base, compressao)
+        # Arquivo da v2.0 ou da v2.1 sem índice: lido e decodificado em um único passe, pessoa a pessoa
+        return _pessoas_em_fluxo(_texto_em_blocos(f, compressao, tamanho, progresso, cancelar), cancelar)
+
+
+def marca_do_diario(filename):
+    # Número da última operação do diário (fatura_diario) já incluída no arquivo; 0 se o arquivo
+    # não tiver a marca (formatos antigos ou gravado sem diário)
+    with open(filename, 'rb') as f:
+        cabecalho = _ler_cabecalho(f)[0]
+    if cabecalho is None:
+        return 0
+    return _dados_do_cabecalho(cabecalho).get("diario", 0)
+
+
+def _texto_em_blocos(f, compressao, tamanho, progresso, cancelar):
+    # Blocos de texto do arquivo (descomprimido se preciso); o progresso é medido no arquivo em disco
+    if compressao == "gzip":
+        leitor = gzip.GzipFile(fileobj=f)
+    elif compressao == "xz":
+        leitor = lzma.LZMAFile(f)
+    else:
+        leitor = f
+    decodificador = codecs.getincrementaldecoder('utf-8-sig')()
+    while True:
+        verificar_cancelamento(cancelar)
+        bloco = leitor.read(TAMANHO_BLOCO)
+        if progresso:
+            progresso(f.tell(), tamanho)
+        texto = decodificador.decode(bloco, final=not bloco)
+        if texto:
+            yield texto
+        if not bloco:
+            break
+
+
+class _SecoesGravadas:
+    # Monta o corpo de um arquivo indexado (tudo depois do cabeçalho). Sem compressão as seções
+    # são gravadas em sequência; com compressão elas são juntadas em quadros de pelo menos
+    # QUADRO_MINIMO bytes, cada quadro comprimido como um membro, com um membro ",\n" entre quadros
+    def __init__(self, compressao):
+        self.compressao = compressao
+        self.partes = []
+        self.gravados = 0
+        # (inicio, tamanho) dos quadros gravados e os índices (no resumo novo) das suas seções
+        self.quadros = []
+        self.membros = []
+        # Quadro em montagem: seções descomprimidas e índices delas
+        self.secoes = []
+        self.indices = []
+        self.tamanho = 0
+
+    def _gravar(self, dados):
+        self.partes.append(dados)
+        self.gravados += len(dados)
+
+    def acrescentar(self, secao, indice):
+        # Retorna a posição da seção para o resumo
+        if self.compressao is None:
+            if self.partes:
+                self._gravar(b",\n")
+            posicao = {"inicio": self.gravados, "tamanho": len(secao)}
+            self._gravar(secao)
+            return posicao
+        if self.secoes:
+            self.secoes.append(b",\n")
+            self.tamanho += 2
+        posicao = {"quadro": len(self.quadros), "inicio": self.tamanho, "tamanho": len(secao)}
+        self.secoes.append(secao)
+        self.indices.append(indice)
+        self.tamanho += len(secao)
+        if self.tamanho >= QUADRO_MINIMO:
+            self.fechar_quadro()
+        return posicao
+
+    def copiar_quadro(self, fonte, quadro, indice):
+        # Copia um quadro inteiro do arquivo de origem sem descomprimir; as seções dele entram no
+        # resumo a partir de indice. Retorna as posições delas
+        self.fechar_quadro()
+        with fonte.trava:
+            dados = fonte.ler_quadro(quadro)
+            secoes = [fonte.secoes[membro] for membro in fonte.quadros[quadro][2]]
+        posicoes = [{"quadro": len(self.quadros), "inicio": inicio, "tamanho": tamanho}
+                    for _, inicio, tamanho in secoes]
+        self._gravar_quadro(dados, list(range(indice, indice + len(secoes))))
+        return posicoes
+
+    def fechar_quadro(self):
+        if self.secoes:
+            self._gravar_quadro(comprimir(b"".join(self.secoes), self.compressao), self.indices)
+            self.secoes = []
+            self.indices = []
+            self.tamanho = 0
+
+    def _gravar_quadro(self, dados, indices):
+        if self.quadros:
+            self._gravar(comprimir(b",\n", self.compressao))
+        self.quadros.append((self.gravados, len(dados)))
+        self.membros.append(indices)
+        self._gravar(dados)
+
+    def finalizar(self):
+        self.fechar_quadro()
+        self._gravar(comprimir(b"\n]}\n", self.compressao))
+        return b"".join(self.partes)
+
+
+def _quadro_reaproveitavel(itens, indice, compressao):
+    # (fonte, quadro) se as pessoas a partir de itens[indice] são, na mesma ordem, todas as seções
+    # de um quadro do arquivo de origem ainda não lidas (o quadro pode ser copiado como está)
+    pessoa = itens[indice][1]
+    fonte = pessoa._fonte
+    if compressao is None or fonte is None or fonte.compressao != compressao:
+        return None
+    with fonte.trava:
+        if pessoa._fonte is None:
+            return None
+        quadro = fonte.secoes[pessoa._secao][0]
+        membros = fonte.quadros[quadro][2]
+    if not membros or membros[0] != pessoa._secao:
+        return None
+    seguintes = itens[indice:indice + len(membros)]
+    if len(seguintes) < len(membros):
+        return None
+    if all(p._fonte is fonte and p._secao == membro for (_, p), membro in zip(seguintes, membros)):
+        return fonte, quadro
+    return None
+
+
+def salvar_arquivo(filename, pessoas, progresso=None, marca_diario=None):
+    # Grava no formato indexado: a primeira linha é o cabeçalho, com nome, total em centavos, pago
+    # e a posição da seção de despesas de cada pessoa; depois vêm as seções, uma por linha, no
+    # formato compacto. O arquivo inteiro (descomprimido) continua sendo um JSON válido.
+    # Com extensão .gz/.xz o cabeçalho é comprimido sozinho e as seções em quadros (veja
+    # _SecoesGravadas); quadros do arquivo de origem sem nenhuma pessoa lida são copiados.
+    # progresso(bytes_gravados, bytes_totais) é chamado a cada bloco gravado. marca_diario é o
+    # número da última operação do diário que os dados já incluem (veja marca_do_diario)
+    compressao = compressao_do_arquivo(filename)
+    corpo = _SecoesGravadas(compressao)
+    itens = list(pessoas.items())
+    resumo = []
+    # Pessoas cujas despesas não foram lidas: a seção é copiada do arquivo de origem
+    pendentes = []
+    while len(resumo) < len(itens):
+        indice = len(resumo)
+        reaproveitavel = _quadro_reaproveitavel(itens, indice, compressao)
+        if reaproveitavel is not None:
+            posicoes = corpo.copiar_quadro(*reaproveitavel, indice)
+        else:
+            posicoes = [corpo.acrescentar(itens[indice][1]._secao_json(), indice)]
+        for (nome, pessoa), posicao in zip(itens[indice:], posicoes):
+            if not pessoa.carregada():
+                pendentes.append((pessoa, len(resumo)))
+            resumo.append(dict({"nome": nome, "total_centavos": pessoa.total_centavos(), "pago": pessoa.pago},
+                               **posicao))
+    partes = corpo.finalizar()
+    dados = {"formato": FORMATO_INDEXADO, "data_salvamento": datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+    if marca_diario is not None:
+        dados["diario"] = marca_diario
+    if compressao is not None:
+        dados["quadros"] = corpo.quadros
+    dados["resumo"] = resumo
+    cabecalho = json.dumps(dados, ensure_ascii=False, separators=(",", ":")).encode('utf-8')
+    cabecalho = comprimir(cabecalho[:-1] + _FIM_CABECALHO, compressao)
+    conteudo = cabecalho + partes
+    # Grava num arquivo temporário e troca pelo definitivo só no final, para que uma
+    # queda no meio da gravação não corrompa o arquivo existente
+    temporario = filename + ".tmp"
+    with open(temporario, 'wb') as f:
+        for inicio in range(0, len(conteudo), TAMANHO_BLOCO):
+            f.write(conteudo[inicio:inicio + TAMANHO_BLOCO])
+            if progresso:
+                progresso(min(inicio + TAMANHO_BLOCO, len(conteudo)), len(conteudo))
+        f.flush()
+        os.fsync(f.fileno())
+    # Pessoas ainda não lidas do próprio arquivo que está sendo substituído passam a apontar
+    # para as novas posições; a troca acontece com a trava da fonte para não haver leitura no meio
+    fontes = {pessoa._fonte for pessoa, _ in pendentes if _mesmo_arquivo(pessoa._fonte.caminho, filename)}
+    for fonte in fontes:
+        fonte.trava.acquire()
+    try:
+        os.replace(temporario, filename)
+        secao_na_fonte = {}
+        for pessoa, indice in pendentes:
+            if pessoa._fonte in fontes:
+                r = resumo[indice]
+                pessoa._fonte.secoes[pessoa._secao] = (r.get("quadro"), r["inicio"], r["tamanho"])
+                secao_na_fonte[indice] = (pessoa._fonte, pessoa._secao)
+        for fonte in fontes:
+            # Os membros de um quadro só são conhecidos (e o quadro pode ser copiado de novo) se
+            # todas as seções dele continuam pendentes nesta fonte
+            quadros = []
+            for (inicio, tamanho), indices in zip(corpo.quadros, corpo.membros):
+                membros = [secao_na_fonte.get(i, (None, None)) for i in indices]
+                conhecidos = all(dona is fonte for dona, _ in membros)
+                quadros.append((inicio, tamanho, tuple(s for _, s in membros) if conhecidos else None))
+            fonte.reposicionar(len(cabecalho), compressao, quadros)
+    finally:
+        for fonte in fontes:
+            fonte.trava.release()
+    return len(conteudo)
+
+
+# Relatório em texto usado por "Exportar Resultados", em três partes para poder ser gravado
+# em fluxo (uma seção por pessoa) por fatura_exportacao
+def cabecalho_relatorio():
+    return f"RELATÓRIO DE DESPESAS\n{'=' * 50}\nData: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}\n\n"
+
+
+def secao_relatorio(nome, pessoa):
+    return "\n".join([f"Despesas de {nome}:", "-" * 50, *pessoa.linhas, "-" * 50,
+                      f"TOTAL: R$ {pessoa.total():.2f}", "", ""])
+
+
+def rodape_relatorio(pessoas):
+    return f"{'=' * 50}\nTOTAL GERAL: R$ {total_geral(pessoas):.2f}\n"
+
+
+def gerar_relatorio(pessoas):
+    partes = [cabecalho_relatorio()]
+    partes.extend(secao_relatorio(nome, pessoa) for nome, pessoa in pessoas.items())
+    partes.append(rodape_relatorio(pessoas))
+    return "".join(partes)
+
+
+def exportar_relatorio(filename, pessoas):
+    with open(filename, 'w', encoding='utf-8', buffering=TAMANHO_BLOCO) as f:
+        f.write(cabecalho_relatorio())
+        for nome, pessoa in pessoas.items():
+            f.write(secao_relatorio(nome, pessoa))
+        f.write(rodape_relatorio(pessoas))
@@ -0,0 +1,136 @@
+"""Exportação dos resultados em TXT, CSV, JSON Lines ou um arquivo por pessoa.
+
+Cada formato é descrito em EXPORTADORES por três funções que devolvem texto:
+cabeçalho, seção de uma pessoa e rodapé. exportar() grava as seções em fluxo,
+uma pessoa por vez, num arquivo com buffer grande, então o custo fica no
+volume de bytes e não no número de chamadas a write. exportar_por_pessoa()
+grava um arquivo por pessoa, em paralelo.
+
+Para um formato novo, basta acrescentar uma entrada em EXPORTADORES.
+"""
+import csv
+import io
+import os
+import re
+from itertools import repeat
+from json.encoder import encode_basestring
+
+from fatura_engine import (TAMANHO_BLOCO, OperacaoCancelada, cabecalho_relatorio, secao_relatorio,
+                           rodape_relatorio)
+
+
+_CARACTERES_INVALIDOS = re.compile(r'[<>:"/\\|?*\x00-\x1f]')
+
+
+def _cabecalho_csv():
+    return "pessoa,linha,valor\r\n"
+
+
+def _secao_csv(nome, pessoa):
+    # Valor com ponto decimal, sem separador de milhar ("1234.56"); centavos / 100 formatado com
+    # duas casas é exato para qualquer valor de fatura
+    saida = io.StringIO()
+    csv.writer(saida).writerows(zip(repeat(nome), pessoa.linhas, [f"{c / 100:.2f}" for c in pessoa.centavos]))
+    return saida.getvalue()
+
+
+def _secao_jsonl(nome, pessoa):
+    # Uma despesa por linha: {"pessoa": ..., "linha": ..., "centavos": ...}; encode_basestring é o
+    # codificador de strings do json (como json.dumps(..., ensure_ascii=False)), sem o custo por chamada
+    prefixo = '{"pessoa":' + encode_basestring(nome) + ',"linha":'
+    return "".join([f'{prefixo}{encode_basestring(linha)},"centavos":{centavos}}}\n'
+                    for linha, centavos in zip(pessoa.linhas, pessoa.centavos)])
+
+
+def _vazio(*args):
+    return ""
+
+
+# formato -> (extensão, cabeçalho(), seção(nome, pessoa), rodapé(pessoas), newline do open)
+EXPORTADORES = {
+    "txt": (".txt", cabecalho_relatorio, secao_relatorio, rodape_relatorio, None),
+    "csv": (".csv", _cabecalho_csv, _secao_csv, _vazio, ""),
+    "jsonl": (".jsonl", _vazio, _secao_jsonl, _vazio, ""),
+}
+
+
+def formato_do_arquivo(caminho):
+    extensao = os.path.splitext(caminho)[1].lower()
+    for formato, (extensao_formato, *_) in EXPORTADORES.items():
+        if extensao == extensao_formato:
+            return formato
+    return "txt"
+
+
+def _gravar(caminho, partes, newline, cancelar=None):
+    # Grava os pedaços num temporário e só troca pelo destino no final: um cancelamento ou
+    # erro no meio não deixa um arquivo pela metade
+    temporario = caminho + ".tmp"
+    try:
+        with open(temporario, "w", encoding="utf-8", newline=newline, buffering=TAMANHO_BLOCO) as f:
+            for parte in partes:
+                if cancelar is not None and cancelar.is_set():
+                    raise OperacaoCancelada()
+                f.write(parte)
+        os.replace(temporario, caminho)
+    except BaseException:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        raise
+
+
+def exportar(caminho, pessoas, formato=None, progresso=None, cancelar=None):
+    # Exporta todas as pessoas num arquivo; progresso(pessoas feitas, total) é chamado a cada pessoa
+    _, cabecalho, secao, rodape, newline = EXPORTADORES[formato or formato_do_arquivo(caminho)]
+
+    def partes():
+        yield cabecalho()
+        for feitas, (nome, pessoa) in enumerate(pessoas.items(), 1):
+            yield secao(nome, pessoa)
+            if progresso:
+                progresso(feitas, len(pessoas))
+        yield rodape(pessoas)
+
+    _gravar(caminho, partes(), newline, cancelar)
+    return len(pessoas)
+
+
+def _nomes_de_arquivo(nomes, extensao):
+    # Nome da pessoa -> nome de arquivo válido e único (também em sistemas que não diferenciam
+    # maiúsculas de minúsculas)
+    usados = set()
+    resultado = {}
+    for nome in nomes:
+        base = _CARACTERES_INVALIDOS.sub("_", nome).strip(" .") or "pessoa"
+        candidato = base
+        contador = 2
+        while candidato.casefold() in usados:
+            candidato = f"{base} ({contador})"
+            contador += 1
+        usados.add(candidato.casefold())
+        resultado[nome] = candidato + extensao
+    return resultado
+
+
+def exportar_por_pessoa(pasta, pessoas, formato="txt", progresso=None, cancelar=None, threads=None):
+    # Um arquivo por pessoa em `pasta`, gravados em paralelo; retorna a quantidade de arquivos
+    # (concurrent.futures é importado só aqui, para não pesar na abertura do app)
+    from concurrent.futures import ThreadPoolExecutor
+    extensao, cabecalho, secao, _, newline = EXPORTADORES[formato]
+    os.makedirs(pasta, exist_ok=True)
+    arquivos = _nomes_de_arquivo(pessoas, extensao)
+    feitas = 0
+
+    def gravar_pessoa(nome):
+        _gravar(os.path.join(pasta, arquivos[nome]), (cabecalho(), secao(nome, pessoas[nome])), newline, cancelar)
+
+    with ThreadPoolExecutor(max_workers=threads or min(8, os.cpu_count() or 1)) as executor:
+        try:
+            for _ in executor.map(gravar_pessoa, pessoas):
+                feitas += 1
+                if progresso:
+                    progresso(feitas, len(pessoas))
+        except BaseException:
+            executor.shutdown(cancel_futures=True)
+            raise
+    return feitas
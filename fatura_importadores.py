@@ -0,0 +1,475 @@
+"""Importação de extratos bancários (CSV, OFX/QFX e texto) sem passar pela tela.
+
+Os arquivos são lidos em blocos de TAMANHO_BLOCO e analisados transação a
+transação, sem carregar o arquivo inteiro na memória. Cada transação vira uma
+despesa (linha, centavos):
+
+- texto: uma despesa por linha, no mesmo formato aceito em "Processar Fatura";
+- CSV: o valor vem da coluna "Valor" (ou "Amount"), ou do último campo numérico
+  quando não há cabeçalho; a linha vira "dd/mm/aaaa descrição valor", como no
+  OFX, para que extrair_centavos leia dela o mesmo valor;
+- OFX/QFX: cada <STMTTRN> vira "dd/mm/aaaa descrição valor". No OFX os débitos
+  são negativos, então o sinal é invertido (compra = despesa positiva).
+
+importar_pasta() lê todos os extratos de uma pasta em paralelo (um processo por
+núcleo) e devolve as despesas agrupadas por pessoa. A pessoa de cada arquivo vem
+do arquivo "mapeamento.txt" da pasta (linhas "padrão = Pessoa", com curingas
+como *.ofx) ou, sem correspondência, do início do nome do arquivo até o
+primeiro "_", "-" ou espaço ("Maria_nubank_jan.csv" -> Maria).
+
+CaixaDeEntrada observa uma pasta por varredura periódica e devolve só as
+transações novas dos extratos novos ou alterados desde a última varredura.
+"""
+import codecs
+import csv
+import fnmatch
+import html
+import json
+import os
+import re
+import threading
+import unicodedata
+from collections import Counter
+from itertools import chain
+
+from fatura_engine import TAMANHO_BLOCO, centavos_do_campo, extrair_centavos, formatar_centavos, verificar_cancelamento
+
+
+FORMATOS = ("texto", "csv", "ofx")
+EXTENSOES = {".csv": "csv", ".ofx": "ofx", ".qfx": "ofx"}
+# Arquivos considerados extratos ao importar uma pasta
+EXTENSOES_PASTA = (".csv", ".ofx", ".qfx", ".txt")
+ARQUIVO_MAPEAMENTO = "mapeamento.txt"
+# Índice dos arquivos já importados de uma caixa de entrada (CaixaDeEntrada)
+ARQUIVO_INDICE = ".importados.json"
+# Separadores de CSV tentados, na ordem de preferência em caso de empate
+_SEPARADORES = ";,\t|"
+# Nomes (sem acento, minúsculos) das colunas de descrição e de valor no cabeçalho do CSV
+_COLUNAS_DESCRICAO = ("descricao", "historico", "lancamento", "estabelecimento", "description", "memo", "name")
+_COLUNAS_VALOR = ("valor", "amount", "value", "quantia")
+# Datas aceitas num campo de CSV: aaaa-mm-dd, dd/mm/aaaa, dd-mm-aaaa, dd.mm.aaaa (ano com 2 ou 4 dígitos)
+_DATA_ISO = re.compile(r"^(\d{4})-(\d{1,2})-(\d{1,2})(?:[T ].*)?$")
+_DATA_BR = re.compile(r"^(\d{1,2})[/.-](\d{1,2})[/.-](\d{2}|\d{4})$")
+
+
+def detectar_formato(caminho):
+    return EXTENSOES.get(os.path.splitext(caminho)[1].lower(), "texto")
+
+
+def _detectar_codificacao(caminho):
+    # Extratos de banco costumam vir em UTF-8 ou em Windows-1252
+    with open(caminho, 'rb') as f:
+        inicio = f.read(TAMANHO_BLOCO)
+    if inicio.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    try:
+        codecs.getincrementaldecoder('utf-8')().decode(inicio, final=False)
+    except UnicodeDecodeError:
+        return 'cp1252'
+    return 'utf-8'
+
+
+def _blocos_de_texto(caminho, progresso=None, cancelar=None):
+    # Lê o arquivo em blocos e devolve o texto decodificado de cada bloco.
+    # progresso(bytes_lidos, bytes_totais) e cancelar funcionam como em carregar_arquivo.
+    tamanho = os.path.getsize(caminho)
+    decodificador = codecs.getincrementaldecoder(_detectar_codificacao(caminho))(errors='replace')
+    lidos = 0
+    with open(caminho, 'rb') as f:
+        while True:
+            verificar_cancelamento(cancelar)
+            bloco = f.read(TAMANHO_BLOCO)
+            lidos += len(bloco)
+            texto = decodificador.decode(bloco, final=not bloco)
+            if texto:
+                yield texto
+            if progresso:
+                progresso(lidos, tamanho)
+            if not bloco:
+                break
+
+
+def _linhas(caminho, progresso=None, cancelar=None):
+    # Devolve as linhas do arquivo uma a uma, com o "\n" final (o módulo csv precisa dele)
+    resto = ""
+    for texto in _blocos_de_texto(caminho, progresso, cancelar):
+        partes = (resto + texto).split("\n")
+        resto = partes.pop()
+        for parte in partes:
+            yield parte + "\n"
+    if resto:
+        yield resto
+
+
+def _sem_acento(texto):
+    return "".join(c for c in unicodedata.normalize("NFKD", texto) if not unicodedata.combining(c)).lower().strip()
+
+
+def _indice_coluna(cabecalho, nomes):
+    for indice, coluna in enumerate(cabecalho):
+        if coluna.startswith(nomes):
+            return indice
+    return None
+
+
+def ler_texto(caminho, progresso=None, cancelar=None):
+    for linha in _linhas(caminho, progresso, cancelar):
+        linha = linha.strip()
+        if linha:
+            centavos = extrair_centavos(linha)
+            if centavos is not None:
+                yield linha, centavos
+
+
+def _data_do_campo(texto):
+    # "2024-01-31", "31/01/2024", "31-01-24"... -> "31/01/2024"; None se o campo não for uma data
+    iso = _DATA_ISO.match(texto)
+    if iso:
+        ano, mes, dia = iso.groups()
+    else:
+        br = _DATA_BR.match(texto)
+        if not br:
+            return None
+        dia, mes, ano = br.groups()
+        if len(ano) == 2:
+            ano = "20" + ano
+    if not (1 <= int(dia) <= 31 and 1 <= int(mes) <= 12):
+        return None
+    return f"{int(dia):02d}/{int(mes):02d}/{ano}"
+
+
+def _linha_csv(campos, coluna_valor, centavos, colunas_descricao=None):
+    # "dd/mm/aaaa descrição valor": a primeira data vai para o início, seguida das colunas de
+    # descrição do cabeçalho (sem elas, dos campos que não são números: saldo, documento etc.
+    # ficam de fora) e do valor reescrito no formato de extrair_centavos
+    data = None
+    partes = []
+    for indice, campo in enumerate(campos):
+        campo = " ".join(campo.split())
+        if indice == coluna_valor or not campo:
+            continue
+        if data is None:
+            data = _data_do_campo(campo)
+            if data is not None:
+                continue
+        if colunas_descricao is not None:
+            if indice in colunas_descricao:
+                partes.append(campo)
+        elif centavos_do_campo(campo) is None:
+            partes.append(campo)
+    if data is not None:
+        partes.insert(0, data)
+    partes.append(formatar_centavos(centavos))
+    return " ".join(partes)
+
+
+def ler_csv(caminho, progresso=None, cancelar=None):
+    linhas = _linhas(caminho, progresso, cancelar)
+    primeira = next(linhas, "")
+    separador = max(_SEPARADORES, key=primeira.count)
+    coluna_valor = None
+    colunas_descricao = None
+    for numero, campos in enumerate(csv.reader(chain([primeira], linhas), delimiter=separador)):
+        if not any(campo.strip() for campo in campos):
+            continue
+        if numero == 0:
+            cabecalho = [_sem_acento(campo) for campo in campos]
+            coluna_valor = _indice_coluna(cabecalho, _COLUNAS_VALOR)
+            colunas_descricao = {indice for indice, coluna in enumerate(cabecalho)
+                                 if coluna.startswith(_COLUNAS_DESCRICAO)} or None
+            if coluna_valor is not None or colunas_descricao is not None:
+                continue
+        if coluna_valor is not None:
+            coluna = coluna_valor
+            centavos = centavos_do_campo(campos[coluna]) if coluna < len(campos) else None
+        else:
+            # Sem cabeçalho: o valor é o último campo numérico da linha
+            centavos = None
+            for coluna in range(len(campos) - 1, -1, -1):
+                centavos = centavos_do_campo(campos[coluna])
+                if centavos is not None:
+                    break
+        if centavos is not None:
+            yield _linha_csv(campos, coluna, centavos, colunas_descricao), centavos
+
+
+def ler_ofx(caminho, progresso=None, cancelar=None):
+    # Funciona com OFX 1.x (SGML, sem tags de fechamento e às vezes tudo numa linha só) e
+    # OFX 2.x (XML): o texto é quebrado em "<TAG>valor" e cada </STMTTRN> fecha uma transação
+    transacao = None
+    resto = ""
+    for texto in _blocos_de_texto(caminho, progresso, cancelar):
+        partes = (resto + texto).split("<")
+        resto = partes.pop()
+        for parte in partes:
+            tag, _, valor = parte.partition(">")
+            tag = tag.strip().upper()
+            if tag == "STMTTRN":
+                transacao = {}
+            elif tag == "/STMTTRN":
+                if transacao is not None:
+                    despesa = _despesa_ofx(transacao)
+                    if despesa is not None:
+                        yield despesa
+                transacao = None
+            elif transacao is not None and not tag.startswith("/"):
+                transacao[tag] = html.unescape(valor.strip())
+
+
+def _despesa_ofx(transacao):
+    centavos = centavos_do_campo(transacao.get("TRNAMT", ""))
+    if centavos is None:
+        return None
+    centavos = -centavos
+    data = transacao.get("DTPOSTED", "")[:8]
+    if len(data) == 8 and data.isdigit():
+        data = f"{data[6:8]}/{data[4:6]}/{data[:4]}"
+    descricao = transacao.get("NAME") or transacao.get("MEMO") or ""
+    memo = transacao.get("MEMO", "")
+    if memo and memo != descricao:
+        descricao = f"{descricao} {memo}".strip()
+    return " ".join(p for p in (data, descricao, formatar_centavos(centavos)) if p), centavos
+
+
+_LEITORES = {"texto": ler_texto, "csv": ler_csv, "ofx": ler_ofx}
+
+
+def ler_transacoes(caminho, formato=None, progresso=None, cancelar=None):
+    # Gerador de (linha, centavos) das transações do arquivo, com extrair_centavos(linha) == centavos;
+    # formato None detecta pela extensão
+    formato = formato or detectar_formato(caminho)
+    if formato not in _LEITORES:
+        raise ValueError(f"Formato de extrato desconhecido: {formato}")
+    return _LEITORES[formato](caminho, progresso, cancelar)
+
+
+def importar_arquivo(caminho, pessoa, formato=None, progresso=None, cancelar=None):
+    # Acrescenta à pessoa as transações do arquivo; retorna (quantidade, total em centavos)
+    quantidade = 0
+    total = 0
+    for linha, centavos in ler_transacoes(caminho, formato, progresso, cancelar):
+        pessoa.adicionar_despesa_centavos(linha, centavos)
+        quantidade += 1
+        total += centavos
+    return quantidade, total
+
+
+def ler_mapeamento(caminho):
+    # Lê "padrão = Pessoa" por linha (linhas vazias e iniciadas por # são ignoradas); retorna [(padrão, pessoa)]
+    mapeamento = []
+    with open(caminho, 'r', encoding='utf-8') as f:
+        for numero, linha in enumerate(f, 1):
+            linha = linha.strip()
+            if not linha or linha.startswith("#"):
+                continue
+            padrao, igual, nome = linha.partition("=")
+            if not igual or not padrao.strip() or not nome.strip():
+                raise ValueError(f"{caminho}, linha {numero}: use o formato 'padrão = Pessoa'.")
+            mapeamento.append((padrao.strip(), nome.strip()))
+    return mapeamento
+
+
+def pessoa_do_arquivo(nome_arquivo, mapeamento=()):
+    # O primeiro padrão do mapeamento que casa com o nome decide; senão, o prefixo do nome do arquivo
+    for padrao, pessoa in mapeamento:
+        if fnmatch.fnmatch(nome_arquivo.lower(), padrao.lower()):
+            return pessoa
+    prefixo = re.split(r"[_\- ]", os.path.splitext(nome_arquivo)[0], maxsplit=1)[0].strip()
+    return prefixo or None
+
+
+def rotear_pasta(pasta, mapeamento=None):
+    # Retorna [(caminho, pessoa)] dos extratos da pasta, em ordem alfabética. mapeamento None usa o
+    # mapeamento.txt da pasta, se existir.
+    if mapeamento is None:
+        caminho_mapeamento = os.path.join(pasta, ARQUIVO_MAPEAMENTO)
+        mapeamento = ler_mapeamento(caminho_mapeamento) if os.path.exists(caminho_mapeamento) else []
+    rotas = []
+    for nome_arquivo in sorted(os.listdir(pasta)):
+        caminho = os.path.join(pasta, nome_arquivo)
+        if (nome_arquivo.startswith(".") or nome_arquivo == ARQUIVO_MAPEAMENTO
+                or not nome_arquivo.lower().endswith(EXTENSOES_PASTA) or not os.path.isfile(caminho)):
+            continue
+        pessoa = pessoa_do_arquivo(nome_arquivo, mapeamento)
+        if pessoa:
+            rotas.append((caminho, pessoa))
+    return rotas
+
+
+def _ler_arquivo_inteiro(caminho):
+    # Executado nos processos de trabalho (precisa estar no nível do módulo para ser serializado)
+    return list(ler_transacoes(caminho))
+
+
+def ler_arquivos(caminhos, processos=None, progresso=None, cancelar=None):
+    # Lê os extratos em paralelo num ProcessPoolExecutor (processos None = um por núcleo); retorna
+    # {caminho: [(linha, centavos), ...]}. progresso(bytes_lidos, bytes_totais) é chamado a cada
+    # arquivo concluído; cancelar interrompe com OperacaoCancelada.
+    tamanhos = {caminho: os.path.getsize(caminho) for caminho in caminhos}
+    total_bytes = sum(tamanhos.values())
+    resultados = {}
+    lidos = 0
+    processos = min(processos or os.cpu_count() or 1, len(caminhos))
+    if processos <= 1:
+        for caminho in caminhos:
+            resultados[caminho] = list(ler_transacoes(caminho, cancelar=cancelar))
+            lidos += tamanhos[caminho]
+            if progresso:
+                progresso(lidos, total_bytes)
+    else:
+        # Importado aqui: concurrent.futures (multiprocessing) pesa na abertura do app
+        import multiprocessing
+        from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+        # "spawn": com fork, o processo filho copiaria travas seguradas por outras threads do app
+        # (a do Tk, a do salvamento) e poderia ficar preso nelas para sempre
+        executor = ProcessPoolExecutor(max_workers=processos, mp_context=multiprocessing.get_context("spawn"))
+        try:
+            pendentes = {executor.submit(_ler_arquivo_inteiro, caminho): caminho for caminho in caminhos}
+            while pendentes:
+                # Acorda periodicamente para atender ao cancelamento
+                prontos, _ = wait(pendentes, timeout=0.2, return_when=FIRST_COMPLETED)
+                verificar_cancelamento(cancelar)
+                for futuro in prontos:
+                    caminho = pendentes.pop(futuro)
+                    resultados[caminho] = futuro.result()
+                    lidos += tamanhos[caminho]
+                    if progresso:
+                        progresso(lidos, total_bytes)
+        except BaseException:
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        executor.shutdown()
+    verificar_cancelamento(cancelar)
+    return resultados
+
+
+def importar_pasta(pasta, mapeamento=None, processos=None, progresso=None, cancelar=None):
+    # Lê os extratos da pasta em paralelo (veja ler_arquivos). Retorna ({pessoa: [(linha, centavos), ...]},
+    # quantidade de arquivos), com as despesas de cada pessoa na ordem alfabética dos arquivos.
+    rotas = rotear_pasta(pasta, mapeamento)
+    resultados = ler_arquivos([caminho for caminho, _ in rotas], processos, progresso, cancelar)
+    por_pessoa = {}
+    for caminho, pessoa in rotas:
+        por_pessoa.setdefault(pessoa, []).extend(resultados[caminho])
+    return por_pessoa, len(rotas)
+
+
+def _hash_arquivo(caminho):
+    import hashlib
+    resumo = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(TAMANHO_BLOCO), b""):
+            resumo.update(bloco)
+    return resumo.hexdigest()
+
+
+def _chave_transacao(linha, centavos):
+    # Identidade de uma transação no índice da caixa de entrada (hash curto da linha e do valor)
+    import hashlib
+    return hashlib.blake2b(f"{linha}\x00{centavos}".encode('utf-8'), digest_size=8).hexdigest()
+
+
+def _transacoes_novas(itens, anterior):
+    # Transações de `itens` que ainda não foram importadas do arquivo, e as chaves de todas
+    # ({chave: ocorrências}, para que transações repetidas no mesmo extrato contem uma a uma)
+    chaves = Counter(_chave_transacao(linha, centavos) for linha, centavos in itens)
+    if anterior is None:
+        return itens, chaves
+    importadas = anterior.get("transacoes")
+    if isinstance(importadas, int):
+        # Índice gravado por uma versão anterior (só a quantidade): supõe que o arquivo só cresceu
+        return itens[importadas:], chaves
+    restantes = Counter(importadas)
+    novos = []
+    for linha, centavos in itens:
+        chave = _chave_transacao(linha, centavos)
+        if restantes[chave]:
+            restantes[chave] -= 1
+        else:
+            novos.append((linha, centavos))
+    return novos, chaves
+
+
+class CaixaDeEntrada:
+    # Pasta observada por varredura periódica. O índice (gravado na própria pasta) guarda, por
+    # arquivo, mtime, tamanho, hash do conteúdo e as chaves das transações já importadas, para
+    # que cada varredura só leia arquivos novos ou alterados. Um arquivo alterado (extrato
+    # baixado de novo, ou sobrescrito com outro mês) contribui só com as transações que ainda
+    # não tinham sido importadas dele.
+    #
+    # Arquivos aplicados a dados que ainda não estão em disco (família nunca salva) ficam só em
+    # memória (marcar(..., duravel=False)) até confirmar(): se o app fechar antes, eles são
+    # importados de novo na próxima vez.
+
+    def __init__(self, pasta):
+        self.pasta = pasta
+        self.caminho_indice = os.path.join(pasta, ARQUIVO_INDICE)
+        # nome do arquivo -> {"mtime": ns, "tamanho": bytes, "hash": sha256, "transacoes": {chave: ocorrências}}
+        self.indice = {}
+        self.indice_alterado = False
+        # Entradas já aplicadas mas ainda não gravadas no índice em disco
+        self.nao_gravados = {}
+        # A varredura grava o índice na thread de trabalho e parar_caixa_entrada na do Tk
+        self.trava = threading.Lock()
+        if os.path.exists(self.caminho_indice):
+            with open(self.caminho_indice, 'r', encoding='utf-8') as f:
+                self.indice = json.load(f)
+
+    def verificar(self, processos=None, cancelar=None):
+        # Roda na thread de trabalho. Não altera o índice: retorna [(nome do arquivo, pessoa,
+        # nova entrada do índice, transações novas)] para o app aplicar e depois chamar marcar()
+        self.gravar_indice()
+        with self.trava:
+            conhecidos = {**self.indice, **self.nao_gravados}
+        verificados = []
+        a_ler = []
+        for caminho, pessoa in rotear_pasta(self.pasta):
+            nome = os.path.basename(caminho)
+            estado = os.stat(caminho)
+            anterior = conhecidos.get(nome)
+            if anterior and (anterior["mtime"], anterior["tamanho"]) == (estado.st_mtime_ns, estado.st_size):
+                continue
+            entrada = {"mtime": estado.st_mtime_ns, "tamanho": estado.st_size, "hash": _hash_arquivo(caminho),
+                       "transacoes": anterior["transacoes"] if anterior else {}}
+            if anterior and anterior["hash"] == entrada["hash"]:
+                # Só a data mudou: atualiza o índice sem importar nada
+                verificados.append((nome, pessoa, entrada, []))
+            else:
+                a_ler.append((caminho, nome, pessoa, entrada, anterior))
+        resultados = ler_arquivos([caminho for caminho, _, _, _, _ in a_ler], processos, cancelar=cancelar)
+        for caminho, nome, pessoa, entrada, anterior in a_ler:
+            novos, chaves = _transacoes_novas(resultados[caminho], anterior)
+            entrada["transacoes"] = dict(chaves)
+            verificados.append((nome, pessoa, entrada, novos))
+        return verificados
+
+    def marcar(self, verificados, duravel=True):
+        # Registra os arquivos já aplicados; o índice é gravado na próxima varredura. Com
+        # duravel=False as entradas ficam só em memória até confirmar()
+        with self.trava:
+            for nome, _, entrada, _ in verificados:
+                if duravel:
+                    self.indice[nome] = entrada
+                    self.nao_gravados.pop(nome, None)
+                    self.indice_alterado = True
+                else:
+                    self.nao_gravados[nome] = entrada
+
+    def confirmar(self, entradas):
+        # Os dados com as entradas {nome: entrada} (de nao_gravados) foram gravados em disco
+        with self.trava:
+            for nome, entrada in entradas.items():
+                if self.nao_gravados.get(nome) is entrada:
+                    del self.nao_gravados[nome]
+                    self.indice[nome] = entrada
+                    self.indice_alterado = True
+
+    def gravar_indice(self):
+        with self.trava:
+            if not self.indice_alterado:
+                return
+            temporario = self.caminho_indice + ".tmp"
+            with open(temporario, 'w', encoding='utf-8') as f:
+                json.dump(self.indice, f)
+            os.replace(temporario, self.caminho_indice)
+            self.indice_alterado = False
@@ -0,0 +1,150 @@
+"""Medição de latência dos handlers da interface, ligada por variável de ambiente.
+
+    FATURA_MEDIR=1                      mede todos os métodos do app
+    FATURA_PERFIL=processar_faturas     também captura cProfile desse método
+                                        (vários nomes separados por vírgula)
+    FATURA_MEDIR_SAIDA=latencias.txt    onde gravar o relatório ao sair
+                                        (padrão: stderr)
+
+Com a medição ligada, cada método da classe do app é trocado por um envoltório
+que conta chamadas e soma o tempo de relógio num histograma por faixa. A última
+ação da interface que passou de LIMITE_STATUS_MS aparece no fim do status_var.
+Ao sair, o relatório é gravado, e os perfis são salvos em perfil_<método>.prof
+(pstats) com um resumo no relatório.
+
+Desligada (o padrão), a classe não é tocada e não há custo nenhum.
+"""
+import atexit
+import functools
+import io
+import os
+import sys
+import threading
+import time
+import types
+
+
+# Limites superiores das faixas do histograma, em ms
+FAIXAS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, float("inf"))
+ROTULOS_FAIXAS = [f"<{limite}" for limite in FAIXAS_MS[:-1]] + [f">={FAIXAS_MS[-2]}"]
+# Ações mais rápidas que isso não substituem a última latência exibida no status
+LIMITE_STATUS_MS = 1.0
+SEPARADOR_STATUS = "   ·   "
+
+
+class Medidor:
+    def __init__(self, perfis=(), saida=None):
+        # método -> [chamadas, tempo total (s), maior tempo (s), contagem por faixa]
+        self.estatisticas = {}
+        self.perfis = {}
+        if perfis:
+            # cProfile/pstats só são carregados quando algum perfil foi pedido
+            import cProfile
+            self.perfis = {nome: cProfile.Profile() for nome in perfis}
+        self.saida = saida
+        self.thread_principal = threading.get_ident()
+        # Profundidade de handlers na thread do Tk: só a chamada mais externa vai para o status
+        self.profundidade = 0
+        self.perfil_ativo = False
+
+    @classmethod
+    def do_ambiente(cls, ambiente=None):
+        # Medidor configurado pelas variáveis de ambiente, ou None se a medição está desligada
+        ambiente = os.environ if ambiente is None else ambiente
+        perfis = [nome.strip() for nome in ambiente.get("FATURA_PERFIL", "").split(",") if nome.strip()]
+        if ambiente.get("FATURA_MEDIR", "") in ("", "0") and not perfis:
+            return None
+        return cls(perfis, ambiente.get("FATURA_MEDIR_SAIDA") or None)
+
+    def instrumentar(self, classe):
+        # Troca os métodos da classe pelos envoltórios e grava o relatório na saída do programa
+        for nome, funcao in list(vars(classe).items()):
+            if isinstance(funcao, types.FunctionType) and nome != "__init__":
+                setattr(classe, nome, self.envolver(nome, funcao))
+        atexit.register(self.gravar_relatorio)
+
+    def envolver(self, nome, funcao):
+        estatisticas = self.estatisticas.setdefault(nome, [0, 0.0, 0.0, [0] * len(FAIXAS_MS)])
+        perfil = self.perfis.get(nome)
+
+        @functools.wraps(funcao)
+        def envoltorio(app, *args, **kwargs):
+            na_interface = threading.get_ident() == self.thread_principal
+            if na_interface:
+                self.profundidade += 1
+            perfilando = perfil is not None and na_interface and not self.perfil_ativo
+            if perfilando:
+                self.perfil_ativo = True
+                perfil.enable()
+            inicio = time.perf_counter()
+            try:
+                return funcao(app, *args, **kwargs)
+            finally:
+                decorrido = time.perf_counter() - inicio
+                if perfilando:
+                    perfil.disable()
+                    self.perfil_ativo = False
+                self.registrar(estatisticas, decorrido)
+                if na_interface:
+                    self.profundidade -= 1
+                    if self.profundidade == 0 and decorrido * 1000 >= LIMITE_STATUS_MS:
+                        self.exibir(app, nome, decorrido)
+        return envoltorio
+
+    @staticmethod
+    def registrar(estatisticas, decorrido):
+        estatisticas[0] += 1
+        estatisticas[1] += decorrido
+        if decorrido > estatisticas[2]:
+            estatisticas[2] = decorrido
+        milissegundos = decorrido * 1000
+        faixas = estatisticas[3]
+        for indice, limite in enumerate(FAIXAS_MS):
+            if milissegundos < limite:
+                faixas[indice] += 1
+                break
+
+    @staticmethod
+    def exibir(app, nome, decorrido):
+        status_var = getattr(app, "status_var", None)
+        if status_var is None:
+            return
+        try:
+            texto = status_var.get().split(SEPARADOR_STATUS)[0]
+            status_var.set(f"{texto}{SEPARADOR_STATUS}{nome}: {decorrido * 1000:.1f} ms")
+        except Exception:
+            # Janela já destruída (ao_fechar)
+            pass
+
+    def relatorio(self):
+        import pstats
+        cabecalho_faixas = "".join(f"{rotulo:>7}" for rotulo in ROTULOS_FAIXAS)
+        linhas = ["Latência dos handlers (ms)",
+                  f"{'método':<32}{'chamadas':>9}{'total':>10}{'média':>9}{'máximo':>9}{cabecalho_faixas}"]
+        ordenadas = sorted(((nome, e) for nome, e in self.estatisticas.items() if e[0]),
+                           key=lambda item: item[1][1], reverse=True)
+        for nome, (chamadas, total, maximo, faixas) in ordenadas:
+            linhas.append(f"{nome:<32}{chamadas:>9}{total * 1000:>10.1f}{total * 1000 / chamadas:>9.2f}"
+                          f"{maximo * 1000:>9.1f}" + "".join(f"{quantidade:>7}" for quantidade in faixas))
+        for nome, perfil in self.perfis.items():
+            arquivo = f"perfil_{nome}.prof"
+            texto = io.StringIO()
+            try:
+                estatisticas = pstats.Stats(perfil, stream=texto)
+            except TypeError:
+                # O método nunca foi chamado: não há nada no perfil
+                linhas.append(f"\nPerfil de {nome}: nenhuma chamada")
+                continue
+            estatisticas.dump_stats(arquivo)
+            estatisticas.sort_stats("cumulative").print_stats(20)
+            linhas.append(f"\nPerfil de {nome} (gravado em {arquivo}):")
+            linhas.append(texto.getvalue().rstrip())
+        return "\n".join(linhas) + "\n"
+
+    def gravar_relatorio(self):
+        texto = self.relatorio()
+        if self.saida:
+            with open(self.saida, "w", encoding="utf-8") as f:
+                f.write(texto)
+        else:
+            sys.stderr.write(texto)
@@ -0,0 +1,75 @@
+"""Resumo por pessoa exibido na área de resultados (tk.Text) das duas versões do app.
+
+ResumoTexto monta o texto numa única passada (join, sem concatenações em laço)
+e guarda a linha já formatada de cada pessoa. Numa atualização em que só
+valores mudaram, apenas as linhas dessas pessoas e a do total geral são
+reescritas no widget; quando pessoas entram, saem ou mudam de ordem, o texto
+é reescrito de uma vez.
+"""
+
+SEPARADOR = "-" * 40
+
+
+class ResumoTexto:
+    def __init__(self, text):
+        self.text = text
+        self.text.tag_configure("resumo_total", font=("Consolas", 11, "bold"))
+        # nome -> (total, linha formatada)
+        self.linhas = {}
+        # O que está no widget: (prefixo, [nomes na ordem]) ou None
+        self.exibido = None
+
+    def linha(self, nome, total):
+        anterior = self.linhas.get(nome)
+        if anterior is not None and anterior[0] == total:
+            return anterior[1]
+        texto = f"{nome}: R$ {total:.2f}"
+        self.linhas[nome] = (total, texto)
+        return texto
+
+    def exibir(self, totais, total_geral, prefixo=""):
+        # totais: [(nome, total em reais)] na ordem de exibição; prefixo: texto antes do resumo
+        # (terminado em "\n")
+        if not totais and not prefixo:
+            self.escrever("Sem resultados.")
+            self.exibido = None
+            self.linhas.clear()
+            return
+        nomes = [nome for nome, _ in totais]
+        alteradas = [(indice, self.linha(nome, total)) for indice, (nome, total) in enumerate(totais)
+                     if self.linhas.get(nome, (None,))[0] != total]
+        rodape = f"TOTAL GERAL: R$ {total_geral:.2f}"
+        if self.exibido is None or self.exibido != (prefixo, nomes):
+            self.linhas = {nome: self.linhas[nome] for nome in nomes}
+            partes = [prefixo, "Resumo por pessoa:\n", SEPARADOR, "\n"]
+            for nome in nomes:
+                partes.append(self.linhas[nome][1])
+                partes.append("\n")
+            partes.extend((SEPARADOR, "\n", rodape))
+            self.escrever("".join(partes), destacar_total=True)
+            self.exibido = (prefixo, nomes)
+            return
+        if not alteradas:
+            return
+        # Mesmas pessoas na mesma ordem: troca só as linhas que mudaram e o total geral
+        primeira = prefixo.count("\n") + 3
+        self.text.config(state="normal")
+        for indice, texto in alteradas:
+            linha = primeira + indice
+            self.text.replace(f"{linha}.0", f"{linha}.end", texto)
+        rodape_linha = primeira + len(nomes) + 1
+        self.text.replace(f"{rodape_linha}.0", f"{rodape_linha}.end", rodape, "resumo_total")
+        self.text.config(state="disabled")
+
+    def escrever(self, texto, destacar_total=False):
+        self.text.config(state="normal")
+        self.text.delete("1.0", "end")
+        self.text.insert("1.0", texto)
+        if destacar_total:
+            self.text.tag_add("resumo_total", "end-1c linestart", "end-1c")
+        self.text.config(state="disabled")
+
+    def limpar(self):
+        self.escrever("")
+        self.exibido = None
+        self.linhas.clear()
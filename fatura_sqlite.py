@@ -0,0 +1,224 @@
+"""Armazenamento das faturas em SQLite (módulo sqlite3 da biblioteca padrão).
+
+Alternativa ao arquivo JSON para famílias com muitas despesas: cada salvamento
+grava, numa única transação, só as pessoas, linhas e pagamentos que mudaram
+desde a última leitura/gravação.
+
+Importar um arquivo JSON existente:
+    python fatura_sqlite.py familia.json familia.db
+"""
+import os
+import sqlite3
+import sys
+from datetime import datetime
+
+from fatura_diario import caminho_diario, reaplicar_diario
+from fatura_engine import Pessoa, Pessoas, carregar_arquivo, marca_do_diario
+
+
+EXTENSOES_SQLITE = (".db", ".sqlite", ".sqlite3")
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS pessoas (
+    id INTEGER PRIMARY KEY,
+    nome TEXT NOT NULL,
+    posicao INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS despesas (
+    id INTEGER PRIMARY KEY,
+    pessoa_id INTEGER NOT NULL REFERENCES pessoas(id) ON DELETE CASCADE,
+    posicao INTEGER NOT NULL,
+    raw_line TEXT NOT NULL,
+    centavos INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS pagamentos (
+    id INTEGER PRIMARY KEY,
+    pessoa_id INTEGER NOT NULL REFERENCES pessoas(id) ON DELETE CASCADE,
+    valor REAL NOT NULL,
+    data TEXT NOT NULL
+);
+-- Valores avulsos do arquivo, como a marca do diário (veja fatura_diario)
+CREATE TABLE IF NOT EXISTS estado (
+    chave TEXT PRIMARY KEY,
+    valor INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_pessoas_nome ON pessoas(nome);
+CREATE INDEX IF NOT EXISTS idx_despesas_pessoa ON despesas(pessoa_id, posicao);
+CREATE INDEX IF NOT EXISTS idx_despesas_data ON despesas(data);
+CREATE INDEX IF NOT EXISTS idx_pagamentos_pessoa ON pagamentos(pessoa_id, data);
+"""
+
+
+def eh_arquivo_sqlite(filename):
+    return filename.lower().endswith(EXTENSOES_SQLITE)
+
+
+def _agora():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+class ArmazenamentoSQLite:
+    def __init__(self, caminho):
+        self.caminho = caminho
+        # A gravação pode acontecer na thread de salvamento da interface; o app garante
+        # que só um salvamento roda por vez
+        self.conexao = sqlite3.connect(caminho, check_same_thread=False)
+        self.conexao.execute("PRAGMA foreign_keys = ON")
+        self.conexao.executescript(ESQUEMA)
+        # Estado já gravado de cada Pessoa: pessoa -> (id, nome, posicao, revisao, quantidade, pago)
+        self.gravado = {}
+        # O próximo salvamento apaga o que o banco já tinha (veja substituir_conteudo)
+        self.substituir = False
+
+    def fechar(self):
+        self.conexao.close()
+
+    def carregar(self):
+        pessoas = Pessoas()
+        ordem = []
+        por_id = {}
+        for pessoa_id, nome, posicao in self.conexao.execute(
+                "SELECT id, nome, posicao FROM pessoas ORDER BY posicao, id"):
+            pessoa = Pessoa(nome)
+            por_id[pessoa_id] = (pessoa, posicao)
+            pessoas[nome] = pessoa
+            ordem.append(nome)
+        for pessoa_id, raw_line, centavos in self.conexao.execute(
+                "SELECT pessoa_id, raw_line, centavos FROM despesas ORDER BY pessoa_id, posicao"):
+            por_id[pessoa_id][0].adicionar_despesa_centavos(raw_line, centavos)
+        # O valor pago é o último pagamento registrado para a pessoa
+        for pessoa_id, valor in self.conexao.execute(
+                "SELECT pessoa_id, valor FROM pagamentos WHERE id IN "
+                "(SELECT MAX(id) FROM pagamentos GROUP BY pessoa_id)"):
+            por_id[pessoa_id][0].pago = valor
+        self.gravado = {}
+        for pessoa_id, (pessoa, posicao) in por_id.items():
+            self.gravado[pessoa] = (pessoa_id, pessoa.nome, posicao, pessoa.revisao,
+                                    len(pessoa.linhas), pessoa.pago)
+        return pessoas, ordem
+
+    def substituir_conteudo(self):
+        # "Salvar Como" sobre um banco que pode já ter dados: o próximo salvamento apaga o conteúdo
+        # anterior na mesma transação em que grava o novo (se falhar, o banco antigo fica intacto)
+        self.gravado = {}
+        self.substituir = True
+
+    def marca_do_diario(self):
+        # Última operação do diário já incluída no banco (0 se nunca foi gravada)
+        linha = self.conexao.execute("SELECT valor FROM estado WHERE chave = 'diario'").fetchone()
+        return linha[0] if linha else 0
+
+    def preparar_salvamento(self, pessoas, ordem):
+        # Compara os dados com o estado gravado e devolve as operações necessárias, já com
+        # cópia das linhas novas. Não toca no banco: pode rodar na thread do Tk e o plano
+        # ser executado em outra thread com executar().
+        posicoes = {nome: indice for indice, nome in enumerate(ordem)}
+        plano = [("limpar",)] if self.substituir else []
+        vistas = set()
+        for nome, pessoa in pessoas.items():
+            vistas.add(pessoa)
+            posicao = posicoes.get(nome, len(posicoes))
+            quantidade = len(pessoa.linhas)
+            anterior = self.gravado.get(pessoa)
+            if anterior is None:
+                plano.append(("inserir", pessoa, nome, posicao, pessoa.revisao, 0,
+                              pessoa.linhas[:], pessoa.centavos.tolist(), pessoa.pago))
+                continue
+            pessoa_id, nome_gravado, posicao_gravada, revisao, quantidade_gravada, pago = anterior
+            # Se linhas existentes mudaram, regrava as linhas da pessoa; senão grava só as incluídas no final
+            reescrever = pessoa.revisao != revisao or quantidade < quantidade_gravada
+            inicio = 0 if reescrever else quantidade_gravada
+            if not reescrever and (nome, posicao, quantidade, pessoa.pago) == (
+                    nome_gravado, posicao_gravada, quantidade_gravada, pago):
+                continue
+            plano.append(("atualizar", pessoa, nome, posicao, pessoa.revisao, inicio,
+                          pessoa.linhas[inicio:], pessoa.centavos[inicio:].tolist(), pessoa.pago))
+        for pessoa, anterior in self.gravado.items():
+            if pessoa not in vistas:
+                plano.append(("remover", pessoa, anterior[0]))
+        return plano
+
+    def executar(self, plano, marca_diario=None):
+        # Aplica o plano numa única transação (junto com a marca do diário, se informada);
+        # retorna a quantidade de linhas gravadas
+        data = _agora()
+        gravadas = 0
+        novo_estado = {}
+        removidas = []
+        with self.conexao:
+            for operacao in plano:
+                if operacao[0] == "limpar":
+                    # Despesas e pagamentos saem junto com as pessoas (ON DELETE CASCADE)
+                    self.conexao.execute("DELETE FROM pessoas")
+                    self.conexao.execute("DELETE FROM estado")
+                    continue
+                if operacao[0] == "remover":
+                    self.conexao.execute("DELETE FROM pessoas WHERE id = ?", (operacao[2],))
+                    removidas.append(operacao[1])
+                    gravadas += 1
+                    continue
+                tipo, pessoa, nome, posicao, revisao, inicio, linhas, centavos, pago = operacao
+                if tipo == "inserir":
+                    pessoa_id = self.conexao.execute(
+                        "INSERT INTO pessoas (nome, posicao) VALUES (?, ?)", (nome, posicao)).lastrowid
+                    pago_gravado = 0.0
+                else:
+                    pessoa_id, nome_gravado, posicao_gravada, _, _, pago_gravado = self.gravado[pessoa]
+                    if (nome, posicao) != (nome_gravado, posicao_gravada):
+                        self.conexao.execute("UPDATE pessoas SET nome = ?, posicao = ? WHERE id = ?",
+                                             (nome, posicao, pessoa_id))
+                        gravadas += 1
+                    if inicio == 0:
+                        self.conexao.execute("DELETE FROM despesas WHERE pessoa_id = ?", (pessoa_id,))
+                self.conexao.executemany(
+                    "INSERT INTO despesas (pessoa_id, posicao, raw_line, centavos, data) VALUES (?, ?, ?, ?, ?)",
+                    ((pessoa_id, inicio + i, linha, valor, data)
+                     for i, (linha, valor) in enumerate(zip(linhas, centavos))))
+                gravadas += len(linhas)
+                if pago != pago_gravado:
+                    self.conexao.execute("INSERT INTO pagamentos (pessoa_id, valor, data) VALUES (?, ?, ?)",
+                                         (pessoa_id, pago, data))
+                    gravadas += 1
+                novo_estado[pessoa] = (pessoa_id, nome, posicao, revisao, inicio + len(linhas), pago)
+            if marca_diario is not None:
+                self.conexao.execute("INSERT OR REPLACE INTO estado (chave, valor) VALUES ('diario', ?)",
+                                     (marca_diario,))
+        # Só atualiza o estado depois do commit; se a transação falhar, o próximo salvamento refaz tudo
+        if plano and plano[0][0] == "limpar":
+            self.substituir = False
+        for pessoa in removidas:
+            self.gravado.pop(pessoa, None)
+        self.gravado.update(novo_estado)
+        return gravadas
+
+    def salvar(self, pessoas, ordem):
+        return self.executar(self.preparar_salvamento(pessoas, ordem))
+
+
+def importar_json(caminho_json, caminho_sqlite):
+    # Grava o conteúdo de um arquivo .json (com as operações do diário dele ainda não salvas)
+    # num banco SQLite; retorna a quantidade de pessoas
+    pessoas, ordem = carregar_arquivo(caminho_json)
+    reaplicar_diario(caminho_json, pessoas, ordem, marca_do_diario(caminho_json))
+    armazenamento = ArmazenamentoSQLite(caminho_sqlite)
+    try:
+        armazenamento.carregar()
+        if armazenamento.gravado:
+            raise ValueError(f"O banco {caminho_sqlite} já contém dados.")
+        # Um diário que tenha sobrado ao lado do banco é de outros dados: seria reaplicado
+        # sobre os importados ao abrir o banco
+        if os.path.exists(caminho_diario(caminho_sqlite)):
+            os.remove(caminho_diario(caminho_sqlite))
+        armazenamento.salvar(pessoas, ordem)
+    finally:
+        armazenamento.fechar()
+    return len(pessoas)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Uso: python fatura_sqlite.py <arquivo.json> <arquivo.db>", file=sys.stderr)
+        sys.exit(2)
+    quantidade = importar_json(sys.argv[1], sys.argv[2])
+    print(f"{quantidade} pessoa(s) importada(s) para {sys.argv[2]}")
@@ -0,0 +1,290 @@
+"""Ida e volta dos arquivos salvos: formato indexado (.json, .gz, .xz), seções pendentes,
+gravação por cima do próprio arquivo de origem e leitura dos formatos antigos (v2.0 e
+v2.1 sem índice) em blocos.
+
+Uso:
+    python -m pytest tests
+    python -m unittest discover tests
+"""
+import gzip
+import json
+import lzma
+import os
+import random
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fatura_engine  # noqa: E402
+from fatura_engine import (Pessoa, Pessoas, carregar_arquivo, formatar_centavos, marca_do_diario,  # noqa: E402
+                           pessoas_to_dict, salvar_arquivo)
+
+
+def familia():
+    # Pessoas com despesas acentuadas, negativas, repetidas e uma pessoa sem despesas
+    pessoas = Pessoas()
+    for nome, linhas in (("Ana", [("NETFLIX.COM 55,90", 5590), ("Padaria São João 12,50", 1250),
+                                  ("ESTORNO -30,00", -3000)]),
+                         ("Bruno", [("UBER *TRIP 1.234,56", 123456)] * 3),
+                         ("Carla", [])):
+        pessoa = Pessoa(nome)
+        for linha, centavos in linhas:
+            pessoa.adicionar_despesa_centavos(linha, centavos)
+        pessoa.pago = 10.5 if nome == "Ana" else 0.0
+        pessoas[nome] = pessoa
+    return pessoas
+
+
+def conteudo(pessoas):
+    return [(nome, p.total_centavos(), p.pago, list(p.linhas), list(p.centavos)) for nome, p in pessoas.items()]
+
+
+def familia_grande(quantidade, linhas, semente=7):
+    # Descrições que se repetem entre pessoas, como numa fatura real
+    rnd = random.Random(semente)
+    descricoes = ["NETFLIX.COM", "UBER *TRIP", "SUPERMERCADO EXTRA", "POSTO SHELL", "IFOOD *RESTAURANTE",
+                  "FARMACIA PAGUE MENOS", "AMAZON MARKETPLACE", "PADARIA PAO QUENTE"]
+    pessoas = Pessoas()
+    for indice in range(quantidade):
+        pessoa = Pessoa(f"Pessoa {indice}")
+        for _ in range(linhas):
+            centavos = rnd.randint(100, 90000)
+            pessoa.adicionar_despesa_centavos(f"{rnd.choice(descricoes)} {formatar_centavos(centavos)}", centavos)
+        pessoas[pessoa.nome] = pessoa
+    return pessoas
+
+
+class TesteFormatoIndexado(unittest.TestCase):
+    def setUp(self):
+        self.pasta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.pasta)
+
+    def caminho(self, nome):
+        return os.path.join(self.pasta, nome)
+
+    def test_ida_e_volta(self):
+        for extensao in (".json", ".gz", ".xz"):
+            with self.subTest(extensao=extensao):
+                caminho = self.caminho("fatura" + extensao)
+                pessoas = familia()
+                salvar_arquivo(caminho, pessoas)
+                carregadas, ordem = carregar_arquivo(caminho)
+                self.assertEqual(ordem, ["Ana", "Bruno", "Carla"])
+                # Total e pago vêm do cabeçalho, sem ler as seções
+                self.assertFalse(any(p.carregada() for p in carregadas.values()))
+                self.assertEqual(carregadas.total_centavos(), pessoas.total_centavos())
+                self.assertEqual(conteudo(carregadas), conteudo(pessoas))
+
+    def test_arquivo_descomprimido_e_json_valido(self):
+        salvar_arquivo(self.caminho("fatura.json"), familia())
+        salvar_arquivo(self.caminho("fatura.gz"), familia())
+        salvar_arquivo(self.caminho("fatura.xz"), familia())
+        with open(self.caminho("fatura.json"), encoding="utf-8") as f:
+            esperado = json.load(f)
+        # Cabeçalho, quadros e separadores são membros separados; descomprimidos em sequência formam um documento com as
+        # mesmas seções (só as posições no resumo mudam, porque contam bytes comprimidos)
+        for caminho, abrir in ((self.caminho("fatura.gz"), gzip.open), (self.caminho("fatura.xz"), lzma.open)):
+            with abrir(caminho, "rt", encoding="utf-8") as f:
+                dados = json.load(f)
+            self.assertEqual(dados["pessoas"], esperado["pessoas"])
+            self.assertEqual([(r["nome"], r["total_centavos"], r["pago"]) for r in dados["resumo"]],
+                             [(r["nome"], r["total_centavos"], r["pago"]) for r in esperado["resumo"]])
+
+    def test_converter_entre_compressoes_com_pessoas_pendentes(self):
+        anterior = self.caminho("fatura.gz")
+        salvar_arquivo(anterior, familia())
+        for extensao in (".xz", ".json", ".gz"):
+            with self.subTest(extensao=extensao):
+                pessoas, _ = carregar_arquivo(anterior)
+                destino = self.caminho("convertida" + extensao)
+                salvar_arquivo(destino, pessoas)
+                self.assertEqual(conteudo(carregar_arquivo(destino)[0]), conteudo(familia()))
+                anterior = destino
+
+    def test_salvar_por_cima_da_origem_com_pessoas_pendentes(self):
+        for extensao in (".json", ".gz", ".xz"):
+            with self.subTest(extensao=extensao):
+                caminho = self.caminho("fatura" + extensao)
+                salvar_arquivo(caminho, familia())
+                pessoas, _ = carregar_arquivo(caminho)
+                # Ana muda de tamanho e desloca as seções de Bruno e Carla, que continuam pendentes
+                pessoas["Ana"].adicionar_despesa_centavos("MERCADO LIVRE 999,99", 99999)
+                pessoas["Ana"].remover_despesa(0)
+                salvar_arquivo(caminho, pessoas)
+                self.assertFalse(pessoas["Bruno"].carregada())
+                self.assertFalse(pessoas["Carla"].carregada())
+                # As pendentes leem das posições atualizadas no arquivo novo
+                esperado = familia()
+                esperado["Ana"].adicionar_despesa_centavos("MERCADO LIVRE 999,99", 99999)
+                esperado["Ana"].remover_despesa(0)
+                self.assertEqual(conteudo(pessoas), conteudo(esperado))
+                self.assertEqual(conteudo(carregar_arquivo(caminho)[0]), conteudo(esperado))
+
+    def test_salvar_duas_vezes_por_cima_sem_ler(self):
+        caminho = self.caminho("fatura.xz")
+        salvar_arquivo(caminho, familia())
+        pessoas, _ = carregar_arquivo(caminho)
+        del pessoas["Ana"]
+        salvar_arquivo(caminho, pessoas)
+        pessoas["Dora"] = Pessoa("Dora")
+        salvar_arquivo(caminho, pessoas)
+        esperado = familia()
+        del esperado["Ana"]
+        esperado["Dora"] = Pessoa("Dora")
+        self.assertEqual(conteudo(pessoas), conteudo(esperado))
+        self.assertEqual(conteudo(carregar_arquivo(caminho)[0]), conteudo(esperado))
+
+    def test_marca_do_diario(self):
+        caminho = self.caminho("fatura.gz")
+        salvar_arquivo(caminho, familia())
+        self.assertEqual(marca_do_diario(caminho), 0)
+        salvar_arquivo(caminho, familia(), marca_diario=7)
+        self.assertEqual(marca_do_diario(caminho), 7)
+        self.assertEqual(conteudo(carregar_arquivo(caminho)[0]), conteudo(familia()))
+
+
+class TesteQuadros(unittest.TestCase):
+    def setUp(self):
+        self.pasta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.pasta)
+
+    def caminho(self, nome):
+        return os.path.join(self.pasta, nome)
+
+    def test_tamanho_proximo_do_arquivo_comprimido_inteiro(self):
+        pessoas = familia_grande(400, 60)
+        salvar_arquivo(self.caminho("fatura.json"), pessoas)
+        with open(self.caminho("fatura.json"), "rb") as f:
+            bruto = f.read()
+        for extensao, inteiro in ((".gz", len(gzip.compress(bruto, compresslevel=6))),
+                                  (".xz", len(lzma.compress(bruto, preset=1)))):
+            with self.subTest(extensao=extensao):
+                salvar_arquivo(self.caminho("fatura" + extensao), pessoas)
+                self.assertLess(os.path.getsize(self.caminho("fatura" + extensao)), inteiro * 1.05)
+
+    def test_quadros_copiados_e_refeitos_ao_salvar_por_cima(self):
+        esperado = familia_grande(30, 20)
+        for extensao in (".gz", ".xz"):
+            with self.subTest(extensao=extensao), mock.patch.object(fatura_engine, "QUADRO_MINIMO", 4096):
+                caminho = self.caminho("fatura" + extensao)
+                salvar_arquivo(caminho, familia_grande(30, 20))
+                pessoas, _ = carregar_arquivo(caminho)
+                self.assertGreater(len(pessoas["Pessoa 0"]._fonte.quadros), 3)
+                # Uma pessoa lida e alterada no meio: o quadro dela é refeito, os outros são copiados
+                for copia in (pessoas, esperado):
+                    copia["Pessoa 12"].adicionar_despesa_centavos("MERCADO LIVRE 999,99", 99999)
+                    del copia["Pessoa 20"]
+                    copia["Nova"] = Pessoa("Nova")
+                with mock.patch.object(fatura_engine, "comprimir", wraps=fatura_engine.comprimir) as comprimir:
+                    salvar_arquivo(caminho, pessoas)
+                comprimidos = [c.args[0] for c in comprimir.call_args_list if len(c.args[0]) > 100]
+                self.assertLess(len(comprimidos), len(pessoas["Pessoa 0"]._fonte.quadros))
+                self.assertEqual(conteudo(pessoas), conteudo(esperado))
+                # As posições atualizadas continuam valendo para um segundo salvamento por cima
+                salvar_arquivo(caminho, pessoas)
+                self.assertEqual(conteudo(pessoas), conteudo(esperado))
+                self.assertEqual(conteudo(carregar_arquivo(caminho)[0]), conteudo(esperado))
+                esperado = familia_grande(30, 20)
+
+    def test_arquivo_com_um_membro_por_secao(self):
+        # Arquivos .gz/.xz gravados antes dos quadros: cabeçalho, cada seção e cada separador eram
+        # membros separados, e o resumo tinha a posição comprimida de cada seção
+        pessoas = familia()
+        for extensao, compressao in ((".gz", "gzip"), (".xz", "xz")):
+            with self.subTest(extensao=extensao):
+                corpo = b""
+                resumo = []
+                for nome, pessoa in pessoas.items():
+                    if corpo:
+                        corpo += fatura_engine.comprimir(b",\n", compressao)
+                    secao = fatura_engine.comprimir(pessoa._secao_json(), compressao)
+                    resumo.append({"nome": nome, "total_centavos": pessoa.total_centavos(), "pago": pessoa.pago,
+                                   "inicio": len(corpo), "tamanho": len(secao)})
+                    corpo += secao
+                corpo += fatura_engine.comprimir(b"\n]}\n", compressao)
+                cabecalho = json.dumps({"formato": 3, "resumo": resumo}, separators=(",", ":")).encode("utf-8")
+                cabecalho = fatura_engine.comprimir(cabecalho[:-1] + b',"pessoas":[\n', compressao)
+                caminho = self.caminho("antigo" + extensao)
+                with open(caminho, "wb") as f:
+                    f.write(cabecalho + corpo)
+                carregadas, _ = carregar_arquivo(caminho)
+                self.assertEqual(conteudo(carregadas), conteudo(pessoas))
+                carregadas, _ = carregar_arquivo(caminho)
+                salvar_arquivo(caminho, carregadas)
+                self.assertEqual(conteudo(carregar_arquivo(caminho)[0]), conteudo(pessoas))
+
+
+class TesteFormatosAntigos(unittest.TestCase):
+    def setUp(self):
+        self.pasta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.pasta)
+
+    def gravar(self, nome, dados, compressao=None, indent=None):
+        caminho = os.path.join(self.pasta, nome)
+        texto = json.dumps(dados, ensure_ascii=False, indent=indent).encode("utf-8")
+        if compressao == "gzip":
+            texto = gzip.compress(texto)
+        elif compressao == "xz":
+            texto = lzma.compress(texto)
+        with open(caminho, "wb") as f:
+            f.write(texto)
+        return caminho
+
+    def test_v2_1_sem_indice(self):
+        dados = pessoas_to_dict(familia())
+        for nome, compressao in (("antigo.json", None), ("antigo.gz", "gzip"), ("antigo.xz", "xz")):
+            with self.subTest(arquivo=nome):
+                pessoas, ordem = carregar_arquivo(self.gravar(nome, dados, compressao))
+                self.assertEqual(ordem, ["Ana", "Bruno", "Carla"])
+                self.assertEqual(conteudo(pessoas), conteudo(familia()))
+
+    def test_registros_da_v2_0(self):
+        # Sem "pago" nem "raw_line" (só descrição e valor) e com chaves que o modelo atual não usa
+        dados = {
+            "historico": [{"data": "2020-01-01", "total": 10.0}],
+            "pessoas": [
+                {"nome": "Ana", "despesas": [{"descricao": "NETFLIX.COM", "valor": 55.9},
+                                             {"descricao": "ESTORNO", "valor": -30.0}], "total": 25.9},
+                {"nome": "Bruno", "despesas": [{"raw_line": "UBER *TRIP 1.234,56", "valor": 1234.56}]},
+            ],
+        }
+        pessoas, ordem = carregar_arquivo(self.gravar("v20.json", dados))
+        self.assertEqual(ordem, ["Ana", "Bruno"])
+        self.assertEqual(list(pessoas["Ana"].linhas), ["NETFLIX.COM 55,90", "ESTORNO -30,00"])
+        self.assertEqual(list(pessoas["Ana"].centavos), [5590, -3000])
+        self.assertEqual(pessoas["Ana"].pago, 0.0)
+        self.assertEqual(list(pessoas["Bruno"].linhas), ["UBER *TRIP 1.234,56"])
+        self.assertEqual(pessoas.total_centavos(), 2590 + 123456)
+
+    def test_divisao_em_qualquer_ponto_dos_blocos(self):
+        # Blocos pequenos cortam chaves, strings e números ("12." + "50") em todos os pontos;
+        # com uma pessoa só, o registro inteiro é maior que o bloco e é lido item a item
+        uma_pessoa = Pessoas()
+        uma_pessoa["Ana"] = Pessoa("Ana")
+        for indice in range(40):
+            uma_pessoa["Ana"].adicionar_despesa_centavos(f"COMPRA {indice} 1{indice},50", 1000 + indice * 100 + 50)
+        for dados, indent in ((pessoas_to_dict(familia()), None), (pessoas_to_dict(familia()), 2),
+                              (pessoas_to_dict(uma_pessoa), None)):
+            esperado = conteudo(fatura_engine.pessoas_from_dict(dados)[0])
+            caminho = self.gravar("blocos.json", dados, indent=indent)
+            for tamanho in (1, 2, 3, 5, 7, 13, 64):
+                with self.subTest(tamanho=tamanho, indent=indent, pessoas=len(dados["pessoas"])):
+                    with mock.patch.object(fatura_engine, "TAMANHO_BLOCO", tamanho):
+                        pessoas, _ = carregar_arquivo(caminho)
+                    self.assertEqual(conteudo(pessoas), esperado)
+
+    def test_indexado_lido_por_inteiro(self):
+        # O formato indexado continua sendo JSON: pessoas_from_dict o lê com o json da biblioteca
+        caminho = os.path.join(self.pasta, "fatura.json")
+        salvar_arquivo(caminho, familia())
+        with open(caminho, encoding="utf-8") as f:
+            pessoas, _ = fatura_engine.pessoas_from_dict(json.load(f))
+        self.assertEqual(conteudo(pessoas), conteudo(familia()))
+
+
+if __name__ == "__main__":
+    unittest.main()
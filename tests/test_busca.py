@@ -0,0 +1,93 @@
+"""Busca (fatura_busca): os resultados do índice, com os totais e valores em ordem guardados
+entre buscas, conferem com uma varredura direta de todas as linhas, também depois de
+inclusões, edições e remoções.
+"""
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fatura_busca import IndiceBusca, analisar_consulta, tokens  # noqa: E402
+from fatura_engine import Pessoa, Pessoas, formatar_centavos  # noqa: E402
+
+
+CONSULTAS = ["netflix", "uber trip", "su", "p", "99 pop", "<50", ">100", "10..20", "uber >30",
+             "padaria <=5,00", "inexistente", "1"]
+
+
+def varredura(pessoas, consulta):
+    # (quantidade, centavos, por pessoa) lendo todas as linhas
+    termos, minimo, maximo = analisar_consulta(consulta)
+    por_pessoa = {}
+    for pessoa in pessoas.values():
+        for linha, valor in zip(pessoa.linhas, pessoa.centavos):
+            if minimo is not None and valor < minimo or maximo is not None and valor > maximo:
+                continue
+            presentes = tokens(linha)
+            if all(any(token.startswith(termo) for token in presentes) for termo in termos):
+                quantidade, soma = por_pessoa.get(pessoa.nome, (0, 0))
+                por_pessoa[pessoa.nome] = [quantidade + 1, soma + valor]
+    return (sum(q for q, _ in por_pessoa.values()), sum(s for _, s in por_pessoa.values()), por_pessoa)
+
+
+def familia(semente=3):
+    rnd = random.Random(semente)
+    descricoes = ["NETFLIX.COM", "UBER *TRIP", "99 POP", "SUPERMERCADO EXTRA", "Padaria São João", "SPOTIFY"]
+    pessoas = Pessoas()
+    for indice in range(12):
+        pessoa = Pessoa(f"Pessoa {indice}")
+        for _ in range(rnd.randint(0, 60)):
+            centavos = rnd.randint(-2000, 15000)
+            pessoa.adicionar_despesa_centavos(f"{rnd.choice(descricoes)} {formatar_centavos(centavos)}", centavos)
+        pessoas[pessoa.nome] = pessoa
+    return pessoas
+
+
+class TesteBusca(unittest.TestCase):
+    def conferir(self, indice, pessoas, limite=500):
+        for consulta in CONSULTAS:
+            with self.subTest(consulta=consulta):
+                resultado = indice.buscar(consulta, limite)
+                esperado = varredura(pessoas, consulta)
+                self.assertEqual((resultado.quantidade, resultado.centavos, resultado.por_pessoa), esperado)
+                self.assertEqual(len(resultado.linhas), min(limite, esperado[0]))
+                for pessoa, i, linha, valor in resultado.linhas:
+                    self.assertEqual((pessoa.linhas[i], pessoa.centavos[i]), (linha, valor))
+
+    def test_resultados_conferem_com_varredura(self):
+        pessoas = familia()
+        indice = IndiceBusca()
+        indice.sincronizar(pessoas)
+        self.conferir(indice, pessoas)
+        # De novo, agora com os resultados guardados da primeira vez
+        self.conferir(indice, pessoas, limite=7)
+
+    def test_resultados_depois_de_alteracoes(self):
+        pessoas = familia()
+        indice = IndiceBusca()
+        indice.sincronizar(pessoas)
+        self.conferir(indice, pessoas)
+        pessoas["Pessoa 1"].adicionar_despesa_centavos("UBER *TRIP 45,00", 4500)
+        pessoas["Pessoa 2"].adicionar_despesa_centavos("NETFLIX.COM 0,10", 10)
+        indice.sincronizar(pessoas, ["Pessoa 1", "Pessoa 2"])
+        self.conferir(indice, pessoas)
+        if pessoas["Pessoa 3"].linhas:
+            pessoas["Pessoa 3"].substituir_despesa(0, "99 POP 1.000,00", 1000.0)
+        pessoas["Pessoa 4"].limpar_despesas()
+        del pessoas["Pessoa 5"]
+        indice.sincronizar(pessoas, ["Pessoa 3", "Pessoa 4"])
+        self.conferir(indice, pessoas)
+
+    def test_indexacao_em_fatias(self):
+        pessoas = familia()
+        indice = IndiceBusca()
+        indice.sincronizar(pessoas)
+        while not indice.indexar(limite_linhas=17):
+            pass
+        self.conferir(indice, pessoas)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+"""Reaplicação do diário (fatura_diario) sobre o arquivo salvo: só as operações depois
+da marca do instantâneo são aplicadas, inclusive depois de uma queda entre a troca do
+arquivo e a compactação do diário.
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fatura_diario import Diario, caminho_diario, ler_diario, reaplicar_diario  # noqa: E402
+from fatura_engine import Pessoa, Pessoas, carregar_arquivo, marca_do_diario, salvar_arquivo  # noqa: E402
+
+
+def abrir(caminho):
+    # Como a interface abre um arquivo: carrega o instantâneo e reaplica o diário depois da marca
+    pessoas, ordem = carregar_arquivo(caminho)
+    marca = marca_do_diario(caminho)
+    aplicadas = reaplicar_diario(caminho, pessoas, ordem, marca)
+    return pessoas, ordem, aplicadas
+
+
+class TesteDiario(unittest.TestCase):
+    def setUp(self):
+        self.pasta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.pasta)
+        self.caminho = os.path.join(self.pasta, "fatura.gz")
+        pessoas = Pessoas()
+        pessoas["Ana"] = Pessoa("Ana")
+        pessoas["Ana"].adicionar_despesa_centavos("NETFLIX.COM 55,90", 5590)
+        salvar_arquivo(self.caminho, pessoas)
+
+    def diario(self, **kwargs):
+        diario = Diario(self.caminho, **kwargs)
+        self.addCleanup(diario.arquivo.close)
+        return diario
+
+    def test_reaplica_operacoes_depois_do_instantaneo(self):
+        diario = self.diario()
+        diario.registrar({"op": "importar", "pessoa": "Ana", "linhas": [["UBER *TRIP 20,00", 2000]]})
+        diario.registrar({"op": "adicionar_pessoa", "pessoa": "Bruno"})
+        diario.registrar({"op": "pagamento", "pessoa": "Ana", "pago": 30.0})
+        diario.registrar({"op": "renomear", "pessoa": "Bruno", "novo_nome": "Beto"})
+        diario.fechar()
+        pessoas, ordem, aplicadas = abrir(self.caminho)
+        self.assertEqual(aplicadas, 4)
+        self.assertEqual(ordem, ["Ana", "Beto"])
+        self.assertEqual(list(pessoas["Ana"].linhas), ["NETFLIX.COM 55,90", "UBER *TRIP 20,00"])
+        self.assertEqual(pessoas["Ana"].pago, 30.0)
+        self.assertEqual(pessoas.total_centavos(), 7590)
+
+    def test_queda_entre_salvar_e_compactar(self):
+        diario = self.diario()
+        diario.registrar({"op": "importar", "pessoa": "Ana", "linhas": [["UBER *TRIP 20,00", 2000]]})
+        diario.sincronizar()
+        pessoas, _, _ = abrir(self.caminho)
+        # Salvamento completo com a marca da posição atual; o diário não chega a ser compactado
+        posicao = diario.posicao()
+        salvar_arquivo(self.caminho, pessoas, marca_diario=posicao[2])
+        diario.registrar({"op": "importar", "pessoa": "Ana", "linhas": [["IFOOD 35,00", 3500]]})
+        diario.fechar()
+        self.assertEqual(len(ler_diario(caminho_diario(self.caminho))), 2)
+        # A importação já gravada no instantâneo não é aplicada de novo
+        pessoas, _, aplicadas = abrir(self.caminho)
+        self.assertEqual(aplicadas, 1)
+        self.assertEqual(list(pessoas["Ana"].linhas), ["NETFLIX.COM 55,90", "UBER *TRIP 20,00", "IFOOD 35,00"])
+        self.assertEqual(pessoas.total_centavos(), 5590 + 2000 + 3500)
+
+    def test_compactar_mantem_a_numeracao(self):
+        diario = self.diario()
+        diario.registrar({"op": "adicionar_pessoa", "pessoa": "Bruno"})
+        diario.sincronizar()
+        posicao = diario.posicao()
+        pessoas, _, _ = abrir(self.caminho)
+        salvar_arquivo(self.caminho, pessoas, marca_diario=posicao[2])
+        # Registrada durante o salvamento: fica no diário depois da compactação
+        diario.registrar({"op": "adicionar_pessoa", "pessoa": "Carla"})
+        diario.compactar(posicao)
+        diario.fechar()
+        operacoes = ler_diario(caminho_diario(self.caminho))
+        self.assertEqual([(op["pessoa"], op["seq"]) for op in operacoes], [("Carla", 2)])
+        # Ao reabrir, a numeração continua depois da marca e da última operação
+        novo = self.diario(marca=marca_do_diario(self.caminho))
+        novo.registrar({"op": "adicionar_pessoa", "pessoa": "Dora"})
+        novo.fechar()
+        _, ordem, aplicadas = abrir(self.caminho)
+        self.assertEqual(aplicadas, 2)
+        self.assertEqual(ordem, ["Ana", "Bruno", "Carla", "Dora"])
+
+    def test_linha_incompleta_no_final(self):
+        diario = self.diario()
+        diario.registrar({"op": "adicionar_pessoa", "pessoa": "Bruno"})
+        diario.fechar()
+        # Queda no meio da gravação de uma operação
+        with open(caminho_diario(self.caminho), "ab") as f:
+            f.write(b'{"op": "adicionar_pessoa", "pess')
+        _, ordem, aplicadas = abrir(self.caminho)
+        self.assertEqual((aplicadas, ordem), (1, ["Ana", "Bruno"]))
+        # O próximo registro não é emendado na linha incompleta
+        diario = self.diario()
+        diario.registrar({"op": "adicionar_pessoa", "pessoa": "Carla"})
+        diario.fechar()
+        _, ordem, _ = abrir(self.caminho)
+        self.assertEqual(ordem, ["Ana", "Bruno", "Carla"])
+
+    def test_diario_sem_numeracao_e_sempre_reaplicado(self):
+        # Diário gravado por uma versão anterior, sem "seq"
+        with open(caminho_diario(self.caminho), "w", encoding="utf-8") as f:
+            f.write('{"op": "adicionar_pessoa", "pessoa": "Bruno"}\n')
+        salvar_arquivo(self.caminho, carregar_arquivo(self.caminho)[0], marca_diario=5)
+        _, ordem, aplicadas = abrir(self.caminho)
+        self.assertEqual((aplicadas, ordem), (1, ["Ana", "Bruno"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+"""Exportação (fatura_exportacao): cada formato de EXPORTADORES, num arquivo só e em um
+arquivo por pessoa (gravados em paralelo), com o conteúdo esperado de cada arquivo.
+"""
+import csv
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fatura_engine import OperacaoCancelada, Pessoa, Pessoas  # noqa: E402
+from fatura_exportacao import EXPORTADORES, exportar, exportar_por_pessoa  # noqa: E402
+
+
+DESPESAS = {
+    "Ana": [("NETFLIX.COM 55,90", 5590), ("ESTORNO -10,00", -1000)],
+    # Mesmo nome em minúsculas e caracteres especiais de CSV e JSON
+    "ana": [('UBER, "TRIP" 20,00', 2000)],
+    # Nome inválido para arquivo e nenhuma despesa
+    "Bruno/Filho": [],
+}
+ARQUIVOS = {"Ana": "Ana", "ana": "ana (2)", "Bruno/Filho": "Bruno_Filho"}
+
+
+def familia():
+    pessoas = Pessoas()
+    for nome, despesas in DESPESAS.items():
+        pessoas[nome] = Pessoa(nome)
+        for linha, centavos in despesas:
+            pessoas[nome].adicionar_despesa_centavos(linha, centavos)
+    return pessoas
+
+
+def ler(caminho, formato):
+    # Conteúdo do arquivo como [(pessoa, linha, centavos)]; no TXT, as linhas de despesa e os totais
+    with open(caminho, encoding="utf-8", newline="") as f:
+        texto = f.read()
+    if formato == "csv":
+        cabecalho, *linhas = csv.reader(texto.splitlines())
+        assert cabecalho == ["pessoa", "linha", "valor"], cabecalho
+        return [(pessoa, linha, round(float(valor) * 100)) for pessoa, linha, valor in linhas]
+    if formato == "jsonl":
+        return [(d["pessoa"], d["linha"], d["centavos"]) for d in map(json.loads, texto.splitlines())]
+    relevantes = ("Despesas de", "TOTAL") + tuple(linha for d in DESPESAS.values() for linha, _ in d)
+    return [linha for linha in texto.split("\n") if linha.startswith(relevantes)]
+
+
+def esperado(formato, nomes):
+    if formato != "txt":
+        return [(nome, linha, centavos) for nome in nomes for linha, centavos in DESPESAS[nome]]
+    linhas = []
+    for nome in nomes:
+        linhas.append(f"Despesas de {nome}:")
+        linhas.extend(linha for linha, _ in DESPESAS[nome])
+        linhas.append(f"TOTAL: R$ {sum(c for _, c in DESPESAS[nome]) / 100:.2f}")
+    return linhas
+
+
+class TesteExportacao(unittest.TestCase):
+    def setUp(self):
+        self.pasta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.pasta)
+
+    def test_um_arquivo(self):
+        pessoas = familia()
+        for formato, (extensao, *_) in EXPORTADORES.items():
+            with self.subTest(formato=formato):
+                caminho = os.path.join(self.pasta, "fatura" + extensao)
+                chamadas = []
+                # Formato deduzido da extensão
+                self.assertEqual(exportar(caminho, pessoas, progresso=lambda *a: chamadas.append(a)), 3)
+                self.assertEqual(chamadas, [(1, 3), (2, 3), (3, 3)])
+                conteudo = ler(caminho, formato)
+                if formato == "txt":
+                    conteudo, rodape = conteudo[:-1], conteudo[-1]
+                    self.assertEqual(rodape, "TOTAL GERAL: R$ 65.90")
+                self.assertEqual(conteudo, esperado(formato, DESPESAS))
+
+    def test_um_arquivo_por_pessoa(self):
+        pessoas = familia()
+        for formato, (extensao, *_) in EXPORTADORES.items():
+            with self.subTest(formato=formato):
+                pasta = os.path.join(self.pasta, formato)
+                self.assertEqual(exportar_por_pessoa(pasta, pessoas, formato, threads=3), 3)
+                self.assertEqual(sorted(os.listdir(pasta)), sorted(nome + extensao for nome in ARQUIVOS.values()))
+                for nome, arquivo in ARQUIVOS.items():
+                    self.assertEqual(ler(os.path.join(pasta, arquivo + extensao), formato), esperado(formato, [nome]))
+
+    def test_cancelamento_nao_deixa_arquivo(self):
+        cancelar = threading.Event()
+        cancelar.set()
+        caminho = os.path.join(self.pasta, "fatura.csv")
+        with self.assertRaises(OperacaoCancelada):
+            exportar(caminho, familia(), cancelar=cancelar)
+        with self.assertRaises(OperacaoCancelada):
+            exportar_por_pessoa(os.path.join(self.pasta, "pessoas"), familia(), cancelar=cancelar)
+        self.assertEqual(os.listdir(self.pasta), ["pessoas"])
+        self.assertEqual(os.listdir(os.path.join(self.pasta, "pessoas")), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
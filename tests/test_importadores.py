@@ -0,0 +1,183 @@
+"""Importação de extratos (fatura_importadores): texto, CSV e OFX viram (linha, centavos),
+com extrair_centavos(linha) == centavos; a caixa de entrada importa cada transação de um
+arquivo uma vez só, mesmo com o arquivo reescrito, aumentado ou o app reaberto.
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fatura_engine import extrair_centavos  # noqa: E402
+from fatura_importadores import ARQUIVO_INDICE, CaixaDeEntrada, ler_transacoes  # noqa: E402
+
+
+CSV_COM_CABECALHO = (
+    "Data;Descrição;Valor;Saldo\r\n"
+    "01/01/2024;UBER *TRIP;-12,50;1.000,00\r\n"
+    '2024-01-02;"PADARIA; CAFÉ";3,00;997,00\r\n'
+    ";;;\r\n"
+)
+CSV_SO_VALOR = (
+    "Data,Documento,Amount,Balance\n"
+    "01/01/2024,000123,12.50,1000.00\n"
+)
+CSV_SEM_CABECALHO = (
+    "2024-01-01,UBER,0001,12.50\n"
+    "02/01/2024,99 POP,7.00\n"
+)
+OFX_SGML = (
+    "OFXHEADER:100\nDATA:OFXSGML\n"
+    "<OFX><BANKTRANLIST><STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20240105120000[-3:BRT]<TRNAMT>-55.90"
+    "<NAME>NETFLIX.COM<MEMO>Assinatura</STMTTRN><STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20240106"
+    "<TRNAMT>30.00<NAME>ESTORNO &amp; AJUSTE<MEMO>ESTORNO &amp; AJUSTE</STMTTRN>"
+    "<STMTTRN><TRNAMT>abc<NAME>SEM VALOR</STMTTRN></BANKTRANLIST></OFX>"
+)
+OFX_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<OFX>
+  <BANKTRANLIST>
+    <STMTTRN>
+      <TRNTYPE>DEBIT</TRNTYPE>
+      <DTPOSTED>20240110</DTPOSTED>
+      <TRNAMT>-1234.56</TRNAMT>
+      <NAME>SUPERMERCADO</NAME>
+    </STMTTRN>
+  </BANKTRANLIST>
+</OFX>
+"""
+
+
+class TesteImportadores(unittest.TestCase):
+    def setUp(self):
+        self.pasta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.pasta)
+
+    def ler(self, nome, conteudo, codificacao="utf-8", formato=None):
+        caminho = os.path.join(self.pasta, nome)
+        with open(caminho, "w", encoding=codificacao, newline="") as f:
+            f.write(conteudo)
+        transacoes = list(ler_transacoes(caminho, formato))
+        for linha, centavos in transacoes:
+            self.assertEqual(extrair_centavos(linha), centavos)
+        return transacoes
+
+    def test_texto(self):
+        conteudo = "NETFLIX.COM 55,90\nSEM VALOR\n\n  PADARIA SÃO JOÃO 12,50 C  \nLOJA 150,00 03/10"
+        esperado = [("NETFLIX.COM 55,90", 5590), ("PADARIA SÃO JOÃO 12,50 C", -1250), ("LOJA 150,00 03/10", 15000)]
+        for codificacao in ("utf-8", "utf-8-sig", "cp1252"):
+            with self.subTest(codificacao=codificacao):
+                self.assertEqual(self.ler("extrato.txt", conteudo, codificacao), esperado)
+
+    def test_csv(self):
+        casos = [
+            # Saldo fora do texto; separador dentro de aspas; linha vazia ignorada
+            ("com_cabecalho.csv", CSV_COM_CABECALHO,
+             [("01/01/2024 UBER *TRIP -12,50", -1250), ("02/01/2024 PADARIA; CAFÉ 3,00", 300)]),
+            # Sem coluna de descrição: os outros campos numéricos (documento, saldo) ficam de fora
+            ("so_valor.csv", CSV_SO_VALOR, [("01/01/2024 12,50", 1250)]),
+            # Sem cabeçalho: o valor é o último campo numérico
+            ("sem_cabecalho.csv", CSV_SEM_CABECALHO,
+             [("01/01/2024 UBER 12,50", 1250), ("02/01/2024 99 POP 7,00", 700)]),
+        ]
+        for nome, conteudo, esperado in casos:
+            with self.subTest(arquivo=nome):
+                self.assertEqual(self.ler(nome, conteudo), esperado)
+
+    def test_ofx(self):
+        casos = [
+            # Débito vira despesa positiva; MEMO repetido não é duplicado; sem valor é ignorada
+            ("extrato.ofx", OFX_SGML,
+             [("05/01/2024 NETFLIX.COM Assinatura 55,90", 5590), ("06/01/2024 ESTORNO & AJUSTE -30,00", -3000)]),
+            ("extrato.qfx", OFX_XML, [("10/01/2024 SUPERMERCADO 1.234,56", 123456)]),
+        ]
+        for nome, conteudo, esperado in casos:
+            with self.subTest(arquivo=nome):
+                self.assertEqual(self.ler(nome, conteudo), esperado)
+
+    def test_formato_desconhecido(self):
+        with self.assertRaises(ValueError):
+            self.ler("extrato.txt", "X 1,00", formato="pdf")
+
+
+class TesteCaixaDeEntrada(unittest.TestCase):
+    def setUp(self):
+        self.pasta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.pasta)
+        self.gravacoes = 0
+
+    def gravar(self, nome, *linhas):
+        caminho = os.path.join(self.pasta, nome)
+        with open(caminho, "w", encoding="utf-8") as f:
+            f.write("".join(linha + "\n" for linha in linhas))
+        # mtime sempre diferente, mesmo com duas gravações no mesmo instante
+        self.gravacoes += 1
+        os.utime(caminho, ns=(self.gravacoes * 10**9, self.gravacoes * 10**9))
+
+    def novas(self, caixa, duravel=True):
+        # Uma varredura como a do app: aplica as transações novas e marca os arquivos
+        verificados = caixa.verificar(processos=1)
+        caixa.marcar(verificados, duravel)
+        return {nome: (pessoa, novos) for nome, pessoa, _, novos in verificados if novos}
+
+    def test_arquivo_reescrito_nao_importa_de_novo(self):
+        caixa = CaixaDeEntrada(self.pasta)
+        self.gravar("Ana_nubank.txt", "NETFLIX.COM 55,90", "UBER *TRIP 20,00")
+        self.assertEqual(self.novas(caixa),
+                         {"Ana_nubank.txt": ("Ana", [("NETFLIX.COM 55,90", 5590), ("UBER *TRIP 20,00", 2000)])})
+        # Mesmo conteúdo com outra data, e depois as mesmas transações em outra ordem
+        self.gravar("Ana_nubank.txt", "NETFLIX.COM 55,90", "UBER *TRIP 20,00")
+        self.assertEqual(self.novas(caixa), {})
+        self.gravar("Ana_nubank.txt", "UBER *TRIP 20,00", "NETFLIX.COM 55,90")
+        self.assertEqual(self.novas(caixa), {})
+        # Sem alteração nenhuma, o arquivo nem é lido
+        self.assertEqual(caixa.verificar(processos=1), [])
+
+    def test_arquivo_aumentado_importa_so_as_novas(self):
+        caixa = CaixaDeEntrada(self.pasta)
+        self.gravar("Ana.txt", "UBER *TRIP 20,00", "UBER *TRIP 20,00")
+        self.gravar("Bruno.txt", "IFOOD 35,00")
+        self.assertEqual(len(self.novas(caixa)), 2)
+        # Uma terceira corrida igual às duas primeiras conta como nova
+        self.gravar("Ana.txt", "UBER *TRIP 20,00", "UBER *TRIP 20,00", "UBER *TRIP 20,00", "99 POP 7,00")
+        self.assertEqual(self.novas(caixa), {"Ana.txt": ("Ana", [("UBER *TRIP 20,00", 2000), ("99 POP 7,00", 700)])})
+
+    def test_confirmacao_parcial(self):
+        caixa = CaixaDeEntrada(self.pasta)
+        self.gravar("Ana.txt", "NETFLIX.COM 55,90")
+        self.gravar("Bruno.txt", "IFOOD 35,00")
+        verificados = caixa.verificar(processos=1)
+        caixa.marcar(verificados, duravel=False)
+        # Só os dados de Ana foram salvos; uma entrada que não é a marcada não confirma nada
+        entradas = {nome: entrada for nome, _, entrada, _ in verificados}
+        caixa.confirmar({"Ana.txt": entradas["Ana.txt"], "Bruno.txt": dict(entradas["Bruno.txt"])})
+        self.assertEqual(set(caixa.indice), {"Ana.txt"})
+        self.assertEqual(set(caixa.nao_gravados), {"Bruno.txt"})
+        # Nesta sessão nada é importado de novo
+        self.assertEqual(self.novas(caixa), {})
+        # Ao reabrir o app, só o que não foi confirmado volta
+        self.assertEqual(self.novas(CaixaDeEntrada(self.pasta)), {"Bruno.txt": ("Bruno", [("IFOOD 35,00", 3500)])})
+
+    def test_indice_recarregado(self):
+        caixa = CaixaDeEntrada(self.pasta)
+        self.gravar("Ana.txt", "NETFLIX.COM 55,90")
+        self.novas(caixa)
+        caixa.gravar_indice()
+        self.assertTrue(os.path.exists(os.path.join(self.pasta, ARQUIVO_INDICE)))
+        reaberta = CaixaDeEntrada(self.pasta)
+        self.assertEqual(reaberta.indice, caixa.indice)
+        self.assertEqual(reaberta.verificar(processos=1), [])
+        self.gravar("Ana.txt", "NETFLIX.COM 55,90", "SPOTIFY 21,90")
+        self.assertEqual(self.novas(reaberta), {"Ana.txt": ("Ana", [("SPOTIFY 21,90", 2190)])})
+
+    def test_indice_de_versao_anterior(self):
+        # Índice antigo, só com a quantidade de transações: supõe que o arquivo só cresceu
+        self.gravar("Ana.txt", "NETFLIX.COM 55,90", "SPOTIFY 21,90")
+        with open(os.path.join(self.pasta, ARQUIVO_INDICE), "w", encoding="utf-8") as f:
+            f.write('{"Ana.txt": {"mtime": 0, "tamanho": 0, "hash": "", "transacoes": 1}}')
+        self.assertEqual(self.novas(CaixaDeEntrada(self.pasta)), {"Ana.txt": ("Ana", [("SPOTIFY 21,90", 2190)])})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+"""Total geral em cache de Pessoas: depois de qualquer operação do dicionário ou das
+pessoas, total_centavos() é a soma dos totais das pessoas que estão nele.
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fatura_engine import Pessoa, Pessoas, copiar_pessoas  # noqa: E402
+
+
+def pessoa(nome, *centavos):
+    nova = Pessoa(nome)
+    for valor in centavos:
+        nova.adicionar_despesa_centavos(f"COMPRA {valor}", valor)
+    return nova
+
+
+class TesteTotalEmCache(unittest.TestCase):
+    def assertCacheCorreto(self, pessoas):
+        self.assertEqual(pessoas.total_centavos(), sum(p.total_centavos() for p in pessoas.values()))
+        for p in pessoas.values():
+            self.assertIs(p._grupo, pessoas)
+
+    def test_operacoes_do_dicionario(self):
+        pessoas = Pessoas({"Ana": pessoa("Ana", 100)}, Bruno=pessoa("Bruno", 250))
+        self.assertEqual(pessoas.total_centavos(), 350)
+        operacoes = [
+            lambda: pessoas.__setitem__("Carla", pessoa("Carla", 40)),
+            lambda: pessoas.__setitem__("Ana", pessoa("Ana", 7)),
+            lambda: pessoas.update({"Dora": pessoa("Dora", 1000)}, Edu=pessoa("Edu", 3)),
+            lambda: pessoas.update([("Dora", pessoa("Dora", 5))]),
+            lambda: pessoas.setdefault("Fabi", pessoa("Fabi", 60)),
+            lambda: pessoas.setdefault("Fabi", pessoa("Fabi", 99999)),
+            lambda: pessoas.__ior__({"Gil": pessoa("Gil", 8)}),
+            lambda: pessoas.pop("Bruno"),
+            lambda: pessoas.pop("ninguém", None),
+            lambda: pessoas.popitem(),
+            lambda: pessoas.__delitem__("Carla"),
+        ]
+        for operacao in operacoes:
+            operacao()
+            self.assertCacheCorreto(pessoas)
+        pessoas |= {"Hugo": pessoa("Hugo", 2)}
+        self.assertIsInstance(pessoas, Pessoas)
+        self.assertCacheCorreto(pessoas)
+        pessoas.clear()
+        self.assertEqual(pessoas.total_centavos(), 0)
+
+    def test_pessoa_retirada_nao_altera_mais_o_total(self):
+        pessoas = Pessoas()
+        pessoas.update({"Ana": pessoa("Ana", 100), "Bruno": pessoa("Bruno", 200)})
+        nome, retirada = pessoas.popitem()
+        retirada.adicionar_despesa_centavos("EXTRA", 50)
+        self.assertIsNone(retirada._grupo)
+        self.assertCacheCorreto(pessoas)
+        substituida = pessoas[next(iter(pessoas))]
+        pessoas.update({substituida.nome: pessoa(substituida.nome, 1)})
+        substituida.adicionar_despesa_centavos("EXTRA", 50)
+        self.assertEqual(pessoas.total_centavos(), 1)
+
+    def test_alteracoes_nas_pessoas(self):
+        pessoas = Pessoas()
+        pessoas.setdefault("Ana", pessoa("Ana", 100, 200))
+        ana = pessoas["Ana"]
+        ana.adicionar_despesa_centavos("UBER", 30)
+        ana.substituir_despesa(0, "NETFLIX", 1.5)
+        ana.remover_despesa(1)
+        self.assertCacheCorreto(pessoas)
+        ana.despesas = [{"raw_line": "X", "valor": 2.0}, {"raw_line": "Y", "valor": -0.5}]
+        self.assertEqual(pessoas.total_centavos(), 150)
+        ana.limpar_despesas()
+        self.assertEqual(pessoas.total_centavos(), 0)
+
+    def test_copia_independente(self):
+        pessoas = Pessoas({"Ana": pessoa("Ana", 100), "Bruno": pessoa("Bruno", 200)})
+        for copia in (pessoas.copy(), copiar_pessoas(pessoas)):
+            self.assertIsInstance(copia, Pessoas)
+            copia["Ana"].adicionar_despesa_centavos("EXTRA", 5)
+            pessoas["Bruno"].adicionar_despesa_centavos("EXTRA", 7)
+            self.assertCacheCorreto(copia)
+            self.assertCacheCorreto(pessoas)
+        self.assertEqual(pessoas.total_centavos(), 314)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+"""Ida e volta do armazenamento SQLite (fatura_sqlite): salvamentos incrementais,
+"Salvar Como" sobre um banco que já tem dados e importação de um arquivo JSON.
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fatura_diario import Diario, reaplicar_diario  # noqa: E402
+from fatura_engine import Pessoa, Pessoas, salvar_arquivo  # noqa: E402
+from fatura_sqlite import ArmazenamentoSQLite, importar_json  # noqa: E402
+
+
+def pessoas_com(linhas_por_nome):
+    pessoas = Pessoas()
+    for nome, linhas in linhas_por_nome.items():
+        pessoas[nome] = Pessoa(nome)
+        for linha, centavos in linhas:
+            pessoas[nome].adicionar_despesa_centavos(linha, centavos)
+    return pessoas, list(linhas_por_nome)
+
+
+def ler(caminho):
+    # Como a interface abre o banco: carrega e reaplica o diário depois da marca
+    armazenamento = ArmazenamentoSQLite(caminho)
+    try:
+        pessoas, ordem = armazenamento.carregar()
+        reaplicar_diario(caminho, pessoas, ordem, armazenamento.marca_do_diario())
+        return ordem, {nome: (list(p.linhas), list(p.centavos), p.pago) for nome, p in pessoas.items()}
+    finally:
+        armazenamento.fechar()
+
+
+class TesteArmazenamentoSQLite(unittest.TestCase):
+    def setUp(self):
+        self.pasta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.pasta)
+        self.caminho = os.path.join(self.pasta, "familia.db")
+
+    def salvar(self, pessoas, ordem, substituir=False):
+        armazenamento = ArmazenamentoSQLite(self.caminho)
+        try:
+            if substituir:
+                armazenamento.substituir_conteudo()
+            armazenamento.salvar(pessoas, ordem)
+        finally:
+            armazenamento.fechar()
+
+    def test_salvamentos_incrementais(self):
+        armazenamento = ArmazenamentoSQLite(self.caminho)
+        self.addCleanup(armazenamento.fechar)
+        pessoas, ordem = pessoas_com({"Ana": [("NETFLIX.COM 55,90", 5590)], "Bruno": []})
+        armazenamento.salvar(pessoas, ordem)
+        pessoas["Ana"].adicionar_despesa_centavos("UBER *TRIP 20,00", 2000)
+        pessoas["Bruno"].pago = 15.0
+        del pessoas["Ana"]
+        ordem.remove("Ana")
+        pessoas["Carla"] = Pessoa("Carla")
+        ordem.append("Carla")
+        armazenamento.salvar(pessoas, ordem)
+        self.assertEqual(ler(self.caminho), (["Bruno", "Carla"], {"Bruno": ([], [], 15.0), "Carla": ([], [], 0.0)}))
+
+    def test_salvar_como_sobre_banco_existente(self):
+        self.salvar(*pessoas_com({"Ana": [("NETFLIX.COM 55,90", 5590)], "Bruno": [("IFOOD 35,00", 3500)]}))
+        pessoas, ordem = pessoas_com({"Ana": [("UBER *TRIP 20,00", 2000)]})
+        pessoas["Ana"].pago = 5.0
+        self.salvar(pessoas, ordem, substituir=True)
+        self.assertEqual(ler(self.caminho), (["Ana"], {"Ana": (["UBER *TRIP 20,00"], [2000], 5.0)}))
+
+    def test_substituicao_feita_uma_vez(self):
+        armazenamento = ArmazenamentoSQLite(self.caminho)
+        self.addCleanup(armazenamento.fechar)
+        armazenamento.substituir_conteudo()
+        pessoas, ordem = pessoas_com({"Ana": [("NETFLIX.COM 55,90", 5590)]})
+        armazenamento.salvar(pessoas, ordem)
+        # Os salvamentos seguintes voltam a gravar só o que mudou
+        pessoas["Ana"].adicionar_despesa_centavos("UBER *TRIP 20,00", 2000)
+        plano = armazenamento.preparar_salvamento(pessoas, ordem)
+        self.assertEqual([operacao[0] for operacao in plano], ["atualizar"])
+        armazenamento.executar(plano)
+        self.assertEqual(ler(self.caminho)[1]["Ana"][0], ["NETFLIX.COM 55,90", "UBER *TRIP 20,00"])
+
+    def registrar(self, arquivo, *operacoes):
+        diario = Diario(arquivo)
+        for operacao in operacoes:
+            diario.registrar(operacao)
+        diario.fechar()
+
+    def test_importar_json(self):
+        caminho_json = os.path.join(self.pasta, "familia.json")
+        salvar_arquivo(caminho_json, pessoas_com({"Ana": [("NETFLIX.COM 55,90", 5590)]})[0])
+        # Alteração ainda não salva no JSON: vai junto para o banco
+        self.registrar(caminho_json, {"op": "importar", "pessoa": "Ana", "linhas": [["IFOOD 35,00", 3500]]})
+        # Diário que sobrou de um banco apagado com o mesmo nome: não pode ser reaplicado
+        self.registrar(self.caminho, {"op": "importar", "pessoa": "Ana", "linhas": [["UBER *TRIP 20,00", 2000]]},
+                       {"op": "adicionar_pessoa", "pessoa": "Bruno"})
+        self.assertEqual(importar_json(caminho_json, self.caminho), 1)
+        self.assertEqual(ler(self.caminho),
+                         (["Ana"], {"Ana": (["NETFLIX.COM 55,90", "IFOOD 35,00"], [5590, 3500], 0.0)}))
+        # Um banco com dados não é sobrescrito
+        with self.assertRaises(ValueError):
+            importar_json(caminho_json, self.caminho)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+"""Leitura de valores: extrair_centavos (valor no final de uma linha digitada ou de um
+extrato) e centavos_do_campo (campo isolado de CSV/OFX).
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fatura_engine import centavos_do_campo, extrair_centavos, formatar_centavos  # noqa: E402
+
+
+LINHAS = [
+    # Formato simples e separador de milhar
+    ("NETFLIX.COM 55,90", 5590),
+    ("SUPERMERCADO 1.234,56", 123456),
+    ("IMOVEL 1.234.567,89", 123456789),
+    ("SEM MILHAR 1234,56", 123456),
+    ("CENTAVOS 0,99", 99),
+    ("  ESPACOS NAS PONTAS 12,50   ", 1250),
+    ("DATA 2024-01 12,50", 1250),
+    # R$ e sinais
+    ("POSTO R$ 80,00", 8000),
+    ("POSTO R$80,00", 8000),
+    ("ESTORNO -30,00", -3000),
+    ("ESTORNO R$ -30,00", -3000),
+    ("ESTORNO -R$ 30,00", -3000),
+    ("PIX 10,00-", -1000),
+    ("PIX R$ 10,00 -", -1000),
+    ("TRACO-NO-MEIO 10,00", 1000),
+    # Crédito, débito e parcela, em qualquer ordem
+    ("ESTORNO 12,50 C", -1250),
+    ("ESTORNO 12,50CR", -1250),
+    ("ESTORNO 12,50 cr", -1250),
+    ("COMPRA 12,50 D", 1250),
+    ("COMPRA 12,50DB", 1250),
+    ("LOJA 150,00 03/10", 15000),
+    ("LOJA 150,00 3/12", 15000),
+    ("LOJA 12,50 C 03/10", -1250),
+    ("LOJA 12,50 03/10 C", -1250),
+    ("LOJA 1.250,00 D 01/02", 125000),
+    ("LOJA 12,50- 03/10", -1250),
+    ("ESTORNO -12,50 C", -1250),
+    # Sem valor no final
+    ("SEM VALOR", None),
+    ("", None),
+    ("UM DECIMAL 12,5", None),
+    ("TRES DECIMAIS 12,505", None),
+    ("LETRAS 12,AB", None),
+    ("PARCELA SEM VALOR 03/10", None),
+    ("PARCELA LONGA 12,50 003/10", None),
+    ("PARCELA REPETIDA 12,50 03/10 03/10", None),
+    ("DOIS MARCADORES 12,50 DC", None),
+    ("SUFIXO DESCONHECIDO 12,50 X", None),
+]
+
+CAMPOS = [
+    ("1.234,56", 123456),
+    ("1,234.56", 123456),
+    ("1.234.567,89", 123456789),
+    ("1,234,567.89", 123456789),
+    ("1234.56", 123456),
+    ("12,5", 1250),
+    ("-12.5", -1250),
+    ("+5", 500),
+    (" 7 ", 700),
+    ("1.234", 123400),
+    ("1,234", 123400),
+    ("R$ 10,00", 1000),
+    ("R$-1.000,00", -100000),
+    ("(10,00)", -1000),
+    ("10,00-", -1000),
+    ("abc", None),
+    ("", None),
+    (".", None),
+    ("12a", None),
+]
+
+
+class TesteValores(unittest.TestCase):
+    def test_extrair_centavos(self):
+        for linha, esperado in LINHAS:
+            with self.subTest(linha=linha):
+                self.assertEqual(extrair_centavos(linha), esperado)
+
+    def test_centavos_do_campo(self):
+        for campo, esperado in CAMPOS:
+            with self.subTest(campo=campo):
+                self.assertEqual(centavos_do_campo(campo), esperado)
+
+    def test_formatar_e_ler_de_volta(self):
+        for centavos in (0, 1, 99, 100, 123456, 123456789, -1, -3000, -123456):
+            with self.subTest(centavos=centavos):
+                texto = formatar_centavos(centavos)
+                self.assertEqual(extrair_centavos(f"DESCRICAO {texto}"), centavos)
+                self.assertEqual(centavos_do_campo(texto), centavos)
+
+
+if __name__ == "__main__":
+    unittest.main()